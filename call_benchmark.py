@@ -0,0 +1,47 @@
+
+import numpy as np
+from povray_bench import benchmark_mesh2_params, benchmark_decimation
+from povray_bench import benchmark_precision, benchmark_render_modes
+from povray_bench import benchmark_mesh_backends
+
+##### Benchmark settings #####
+
+# mesh2 formatting
+num_triangles = 500000
+repeat = 3
+
+# Isosurface benchmarks use a field stored as a 3D numpy array
+field_file = "e_mag.npy"
+cutoff = 1.0
+
+# Decimation targets (None is the undecimated isosurface)
+decimation_targets = [None, 200000, 50000, 10000]
+
+# Meshing backends to compare (None is every available backend)
+meshers = None
+
+# mesh2 vs df3 density file isosurfaces
+render_cutoffs = [0.5, 1.0, 1.5]
+render_size = 200
+
+# Single vs double precision uses a raw simulation archive
+np_data = "field_data.npy"
+sim_index = 0
+precision_cutoffs = [0.5, 1.0, 1.5]
+
+##### Run benchmarks #####
+
+benchmark_mesh2_params(num_triangles=num_triangles, repeat=repeat)
+
+field = np.load(field_file)
+
+benchmark_decimation(field, cutoff, targets=decimation_targets)
+
+benchmark_mesh_backends(field, cutoff, meshers=meshers, repeat=repeat)
+
+benchmark_render_modes(field, render_cutoffs, height=render_size, 
+        width=render_size)
+
+field_array = np.load(np_data, mmap_mode="r")[sim_index]
+
+benchmark_precision(field_array, precision_cutoffs)
@@ -2,12 +2,18 @@
 
 from os import system
 import numpy as np
-from skimage.measure import marching_cubes_lewiner
 
 import signac
 from util import deep_access
+from itertools import chain
 from util_iso import create_mesh2, slice_isosurface, process_field_array
-from util_iso import extract_e_field, calc_field_mag
+from util_iso import iter_mesh2, iter_slice_isosurface
+from util_iso import create_mesh2_chunked, iter_mesh2_chunked
+from util_iso import create_isosurface_df3, create_field_media
+from util_iso import process_field_component, calc_field_mag
+from util_iso import render_isosurface_frames, lod_step_sizes
+from util_iso import quantile_cutoffs, create_mesh2_tiled
+from util_iso import create_mesh2_symmetric, create_mesh2_colored
 from util_pov import write_header_and_camera, write_pov_file, render_pov
 from util_shapes import create_device_layer, isosurface_unit_cell
 from util_shapes import add_slab, set_color_and_finish 
@@ -18,17 +24,31 @@ from util_shapes import add_slab, set_color_and_finish
 
 np_data = "silo_contour.npy"
 
-all_sims = np.load(np_data)
+# Mesh |E| block by block straight from the file instead of loading
+# the whole simulation (for fields that don't fit in memory)
+use_chunks = False
+chunk_size = 64
+
+# Single precision halves the memory used by the field, which is
+# plenty accurate for placing isosurfaces (None keeps double precision)
+field_dtype = None    # or np.complex64
+
+# Memory-mapped, so only the simulation that is used gets read
+all_sims = np.load(np_data, mmap_mode="r")
 num_sims = len(all_sims)    # the number of simulations
 
 # Grab a single simulation
 field_array = all_sims[1]
-field_array, nx, ny, nz = process_field_array(field_array, center=True)
 
-# Choose the field type to plot
-# Extract E-field, E-field magnitude
-e_field, ex, ey, ez = extract_e_field(field_array)
-e_mag = calc_field_mag(e_field)
+if use_chunks == True:
+    nz, ny, nx = field_array.shape[:3]
+    e_mag = None    # never loaded as a whole
+else:
+    # Choose the field type to plot
+    # Extract E-field (without copying H), E-field magnitude
+    e_field, nx, ny, nz = process_field_component(field_array, "E", 
+            center=True, dtype=field_dtype)
+    e_mag = calc_field_mag(e_field)
 
 ########################
 # Isosurface variables #
@@ -41,6 +61,12 @@ field = e_mag
 cutoffs = [0.15, 0.5, 1.0, 1.5, 2.0, 2.5]
 #cutoffs = [0.03, 0.3, 0.6, 0.9, 1.2, 1.5, 1.8, 2.1, 2.4, 2.7]
 
+# Or place the isosurfaces at quantiles of the field (not with chunks)
+use_quantiles = False
+quantiles = [0.5, 0.9, 0.95, 0.99]
+if use_quantiles == True:
+    cutoffs = quantile_cutoffs(field, quantiles)
+
 # Colormap and isosurface transparency
 colormap = "hot"
 transmit = 0.0
@@ -59,6 +85,13 @@ subtract_box = True
 # Fraction of unit cell to use for intersection/difference
 # Entries are x(min,max), y(min,max), z(min,max)
 cut_at=[[0.5, 1], [0.5, 1], [0, 1]]
+# Cut the isosurfaces in Python instead of with POV-Ray's CSG (smaller
+# .pov file, faster render); only for the plain mesh2 isosurfaces
+clip_slice = False
+# Close the cut surfaces when clipping
+clip_caps = True
+# Only run marching cubes on the part of the field the slice keeps
+roi_slice = True
 
 # UNIT CELL
 add_unit_cell = True
@@ -68,6 +101,20 @@ use_slice_UC = True
 subtract_box_UC = True
 substrate_thickness = 25
 
+# Let POV-Ray find the isosurfaces in a density file instead of
+# meshing them here (much smaller .pov file, slower render)
+use_df3 = False
+df3_name = "mesh_test.df3"
+
+# Render the whole field as a glowing volume instead of isosurfaces
+# (also uses df3_name); cutoffs are ignored
+use_media = False
+media_intensity = 1.0
+
+# Stream the isosurfaces straight into the .pov file instead of
+# building the whole scene as one string (recommended for big fields)
+stream_mesh = True
+
 # RENDERING PARAMETERS
 height = 800
 width = height
@@ -80,28 +127,189 @@ num_threads = 4
 open_png = True
 render = True
 
+# TILING
+# Repeat the isosurfaces over several unit cells (the field must be
+# periodic in x and y); the isosurfaces are only stored once
+num_UC_x = 1
+num_UC_y = 1
+
+# SYMMETRY
+# Only mesh the fundamental domain of a mirror symmetric field and 
+# place mirrored copies of it; symmetry is "auto" or a list out of 
+# "x", "y" and "xy" (swapping x and y)
+use_symmetry = False
+symmetry = "auto"
+
+# VERTEX COLORS
+# Color the isosurfaces of the E field by the magnitude of the H field
+# at every vertex instead of one color per isosurface (not with 
+# chunks); a single cutoff is usually enough
+use_vertex_colors = False
+num_colors = 64
+
+# LEVEL OF DETAIL
+# Mesh coarser when the image can't resolve the full grid anyway;
+# outer_coarsening > 0 gives the outer shells fewer triangles
+use_lod = False
+outer_coarsening = 1.0
+
+# PARALLEL MESHING
+# Mesh the cutoffs on num_mesh_workers processes, or with num_slabs
+# > 1 split every isosurface into z-slabs meshed on those processes
+# instead (faster for a few isosurfaces of a big field)
+num_mesh_workers = 1
+num_slabs = 1
+
+# ANIMATION
+# Also render every simulation in np_data as a frame, with the same
+# header and unit cell (frames are output_dir/frame_0000.png, ...)
+animate = False
+frame_dir = "Frames/"
+num_frame_workers = 4
+
 #### Isosurface creation ####
 
-# Generate povray mesh2 string
-mesh = create_mesh2(
-        field=e_mag, 
-        cutoffs = cutoffs, 
-        colormap = colormap, 
-        transmit = transmit,
-        cmap_limits = cmap_limits)
+# Section to clip from the mesh2 isosurfaces (only the plain mesh2
+# branches below clip, the other modes are still sliced by POV-Ray)
+clip_cut_at = None
+if use_slice == True and clip_slice == True:
+    clip_cut_at = cut_at
+
+# Section of the field to mesh (the rest is removed by the slice)
+roi_cut_at = None
+if use_slice == True and roi_slice == True:
+    roi_cut_at = cut_at
+
+# Marching cubes step size for every cutoff
+step_size = 1
+if use_lod == True:
+    step_size = lod_step_sizes([nx, ny, nz], cutoffs, height=height,
+            width=width, camera_rotate=35, 
+            outer_coarsening=outer_coarsening)
+
+# Generate povray mesh2 string (or a generator of chunks if streaming)
+clipped = False
+if use_media == True:
+    mesh = create_field_media(
+            field=e_mag, 
+            df3_name = df3_name,
+            colormap = colormap, 
+            cmap_limits = cmap_limits,
+            intensity = media_intensity)
+    if stream_mesh == True:
+        mesh = [mesh]
+elif num_UC_x * num_UC_y > 1:
+    mesh = create_mesh2_tiled(
+            field=e_mag, 
+            cutoffs = cutoffs, 
+            num_UC_x = num_UC_x,
+            num_UC_y = num_UC_y,
+            colormap = colormap, 
+            transmit = transmit,
+            cmap_limits = cmap_limits)
+    if stream_mesh == True:
+        mesh = [mesh]
+elif use_symmetry == True:
+    mesh = create_mesh2_symmetric(
+            field=e_mag, 
+            cutoffs = cutoffs, 
+            symmetry = symmetry,
+            colormap = colormap, 
+            transmit = transmit,
+            cmap_limits = cmap_limits)
+    if stream_mesh == True:
+        mesh = [mesh]
+elif use_vertex_colors == True:
+    h_field, nx, ny, nz = process_field_component(field_array, "H", 
+            center=True, dtype=field_dtype)
+    mesh = create_mesh2_colored(
+            field=e_mag, 
+            cutoffs = cutoffs, 
+            color_field = calc_field_mag(h_field),
+            colormap = colormap, 
+            transmit = transmit,
+            num_colors = num_colors)
+    del h_field
+    if stream_mesh == True:
+        mesh = [mesh]
+elif use_df3 == True:
+    mesh = create_isosurface_df3(
+            field=e_mag, 
+            cutoffs = cutoffs, 
+            df3_name = df3_name,
+            colormap = colormap, 
+            transmit = transmit,
+            cmap_limits = cmap_limits)
+    if stream_mesh == True:
+        mesh = [mesh]
+elif use_chunks == True and stream_mesh == True:
+    mesh = iter_mesh2_chunked(
+            field_array, 
+            cutoffs = cutoffs, 
+            chunk_size = chunk_size,
+            dtype = field_dtype,
+            colormap = colormap, 
+            transmit = transmit,
+            cmap_limits = cmap_limits)
+elif use_chunks == True:
+    mesh = create_mesh2_chunked(
+            field_array, 
+            cutoffs = cutoffs, 
+            chunk_size = chunk_size,
+            dtype = field_dtype,
+            colormap = colormap, 
+            transmit = transmit,
+            cmap_limits = cmap_limits)
+elif stream_mesh == True:
+    clipped = clip_cut_at is not None
+    mesh = iter_mesh2(
+            field=e_mag, 
+            cutoffs = cutoffs, 
+            colormap = colormap, 
+            transmit = transmit,
+            cmap_limits = cmap_limits,
+            step_size = step_size,
+            num_workers = num_mesh_workers,
+            num_slabs = num_slabs,
+            clip_cut_at = clip_cut_at,
+            clip_subtract_box = subtract_box,
+            clip_caps = clip_caps,
+            roi_cut_at = roi_cut_at,
+            roi_subtract_box = subtract_box)
+else:
+    clipped = clip_cut_at is not None
+    mesh = create_mesh2(
+            field=e_mag, 
+            cutoffs = cutoffs, 
+            colormap = colormap, 
+            transmit = transmit,
+            cmap_limits = cmap_limits,
+            step_size = step_size,
+            num_workers = num_mesh_workers,
+            num_slabs = num_slabs,
+            clip_cut_at = clip_cut_at,
+            clip_subtract_box = subtract_box,
+            clip_caps = clip_caps,
+            roi_cut_at = roi_cut_at,
+            roi_subtract_box = subtract_box)
 
 # Use a box to slice the isosurface; modifies the mesh string 
-if use_slice == True:
-    mesh = slice_isosurface(mesh, n, cut_at=cut_at,
-        subtract_box=substract_box)
+if use_slice == True and clipped == False:
+    if stream_mesh == True:
+        mesh = iter_slice_isosurface(mesh, [nx, ny, nz], cut_at=cut_at,
+            subtract_box=subtract_box)
+    else:
+        mesh = slice_isosurface(mesh, [nx, ny, nz], cut_at=cut_at,
+            subtract_box=subtract_box)
 
 # Add unit cell
+unit_cell = ""
 if add_unit_cell == True:
     with signac.Collection.open(json_file, compresslevel=1) as d_index:
         device_dict = list(d_index.find(filter={"_id": device_id}))[0]
 
-    mesh = isosurface_unit_cell(
-            mesh, 
+    unit_cell = isosurface_unit_cell(
+            "", 
             device_dict, 
             n = [nx, ny, nz], 
             cut_at = cut_at,
@@ -113,9 +321,35 @@ header = write_header_and_camera(device_dims=[nx, ny, nz],
         camera_rotate=35, 
         isosurface=True)
 
-write_pov_file(pov_name, header+mesh)
+# When streaming, the isosurfaces are only created while being written
+if stream_mesh == True:
+    write_pov_file(pov_name, chain([header], mesh, [unit_cell]))
+else:
+    write_pov_file(pov_name, header+mesh+unit_cell)
 
 # Render
 render_pov(pov_name, image_name, height, width, display,
     transparent, antialias, num_threads, open_png, render)
 
+# Render all simulations as animation frames
+if animate == True:
+    frames = render_isosurface_frames(
+            np_data, 
+            cutoffs = cutoffs, 
+            header = header, 
+            unit_cell = unit_cell,
+            output_dir = frame_dir,
+            num_workers = num_frame_workers,
+            dtype = field_dtype,
+            colormap = colormap, 
+            transmit = transmit,
+            cmap_limits = cmap_limits,
+            use_slice = use_slice,
+            cut_at = cut_at,
+            subtract_box = subtract_box,
+            height = height,
+            width = width,
+            transparent = transparent,
+            antialias = antialias,
+            num_threads = num_threads,
+            render = render)
@@ -0,0 +1,500 @@
+"""Benchmark the isosurface and .pov generation tools.
+
+These functions are never needed to create a rendering. They exist to
+check that the faster code paths still produce the same output as the
+original implementations, and to measure how much faster they are.
+
+A quick summary:
+  * write_mesh2_params_loop is the original, one-vector-at-a-time
+    mesh2 formatter, kept as a reference implementation
+  * random_mesh generates a synthetic triangle mesh of a given size
+  * benchmark_mesh2_params compares write_mesh2_params against
+    write_mesh2_params_loop and reports triangles/second
+  * time_pov_parse measures how long POV-Ray needs to parse a scene
+  * benchmark_decimation reports triangle counts, mesh2 size, and
+    POV-Ray parse times for several decimation targets
+  * time_pov_render measures how long POV-Ray needs to render a scene
+  * benchmark_render_modes compares mesh2 isosurfaces with POV-Ray's
+    own isosurfaces of a df3 density file (scene size, parse and 
+    render times)
+  * benchmark_precision compares the single and double precision
+    field pipelines (memory used and isosurface vertex deviation),
+    matching vertices between meshes with mesh_edge_keys
+  * benchmark_mesh_backends reports the time, triangle count and 
+    memory of every meshing backend on a field
+"""
+import numpy as np
+
+
+def write_mesh2_params_loop(parameter, values, values_per_line=2):
+    """Convert isosurface parameters to the POV-Ray mesh2 format.
+
+    This is the original implementation of ``write_mesh2_params``,
+    which appends one vector at a time to the output string. It is
+    kept as the reference for byte-identical output and for timing.
+
+    Args:
+      parameter (string): One of the mesh2 specifications, e.g.
+          "vertex_vectors", "normal_vectors", "face_indices"
+      values (list): The values for the parameter variable, each
+          element must be a list with three values
+      values_per_line (int, optional): Only place this many values on
+          a line for readability, defaults to 2
+
+    Returns:
+      string: Parameter data in POV-Ray mesh2 format
+
+    """
+    param_string = f"\n\t{parameter} {{"
+    param_string += f"\n\t\t{len(values)}"
+
+    for j in range(len(values)):
+        if j % 2 == 0:
+            param_string += "\n\t\t"
+        param_string += f"<{values[j][0]:.5f}, {values[j][1]:.5f}, "
+        param_string += f"{values[j][2]:.5f}>"
+        if j != (len(values) - 1):
+            param_string += ", "
+    param_string += f"\n\t\t}}"
+
+    return param_string
+
+
+def random_mesh(num_triangles, seed=0):
+    """Generate a synthetic mesh with marching-cubes-like arrays.
+
+    Roughly matches the marching cubes output: about half as many
+    vertices as faces, float32 coordinates and normals, and int32
+    face indices.
+
+    Args:
+      num_triangles (int): Number of faces to generate
+      seed (int, optional): Random seed (default 0)
+
+    Returns:
+      tuple: corners, faces, and normals as numpy arrays
+
+    """
+    rng = np.random.default_rng(seed)
+    num_vertices = max(3, num_triangles // 2)
+
+    corners = (256 * rng.random((num_vertices, 3))).astype(np.float32)
+    normals = rng.standard_normal((num_vertices, 3)).astype(np.float32)
+    normals /= np.linalg.norm(normals, axis=1)[:, np.newaxis]
+    faces = rng.integers(0, num_vertices, size=(num_triangles, 3),
+            dtype=np.int32)
+
+    return corners, faces, normals
+
+
+def benchmark_mesh2_params(num_triangles=200000, repeat=3, seed=0):
+    """Compare the bulk and loop-based mesh2 formatters.
+
+    Both formatters are run on the same synthetic mesh. The output of
+    each is checked for byte-identical results and the best time of
+    ``repeat`` runs is reported as triangles/second.
+
+    Args:
+      num_triangles (int, optional): Size of the synthetic mesh
+          (default 200000)
+      repeat (int, optional): Number of timed runs per formatter; the
+          fastest is reported (default 3)
+      seed (int, optional): Random seed (default 0)
+
+    Returns:
+      dict: Timing (s) and throughput (triangles/s) of each formatter,
+          keyed by "loop" and "bulk", plus the speedup
+
+    """
+    from time import perf_counter
+    from povray_iso import write_mesh2_params
+
+    corners, faces, normals = random_mesh(num_triangles, seed=seed)
+
+    def format_mesh(formatter):
+        return (formatter("vertex_vectors", corners)
+                + formatter("normal_vectors", normals)
+                + formatter("face_indices", faces, values_per_line=3))
+
+    results = {}
+    outputs = {}
+    for name, formatter in [["loop", write_mesh2_params_loop],
+            ["bulk", write_mesh2_params]]:
+        times = []
+        for i in range(repeat):
+            start = perf_counter()
+            outputs[name] = format_mesh(formatter)
+            times.append(perf_counter() - start)
+        results[name] = {"time": min(times),
+                "triangles_per_s": num_triangles / min(times)}
+
+    assert outputs["loop"] == outputs["bulk"],\
+            "Error: bulk mesh2 output differs from the loop output"
+
+    results["speedup"] = results["loop"]["time"] / results["bulk"]["time"]
+
+    print(f"mesh2 formatting, {num_triangles} triangles:")
+    for name in ["loop", "bulk"]:
+        print(f"  {name:>4s}: {results[name]['time']:.3f} s, "
+              + f"{results[name]['triangles_per_s']:.3e} triangles/s")
+    print(f"  speedup: {results['speedup']:.1f}x")
+
+    return results
+
+
+def time_pov_parse(pov_name, num_threads=0):
+    """Measure how long POV-Ray takes to parse and prepare a scene.
+
+    Renders a single pixel without writing an image, so the time is
+    dominated by parsing the file and building the bounding hierarchy.
+
+    Args:
+      pov_name (str): Name of the .pov file
+      num_threads (int, optional): Number of POV-Ray threads, 0 uses
+          all available (default 0)
+
+    Returns:
+      float: Wall time in seconds, or None if POV-Ray isn't installed
+
+    """
+    import shutil
+    import subprocess
+    from time import perf_counter
+
+    if shutil.which("povray") is None:
+        print("WARNING: povray not found, skipping parse timing")
+        return None
+
+    command = ["povray", f"+I{pov_name}", "-F", "-D", "+W1", "+H1"]
+    if num_threads != 0:
+        command.append(f"+WT{num_threads}")
+
+    start = perf_counter()
+    subprocess.run(command, stdout=subprocess.DEVNULL, 
+            stderr=subprocess.DEVNULL)
+    return perf_counter() - start
+
+
+def time_pov_render(pov_name, height=200, width=200, num_threads=0):
+    """Measure how long POV-Ray takes to parse and render a scene.
+
+    The image is rendered but not written to a file.
+
+    Args:
+      pov_name (str): Name of the .pov file
+      height (int, optional): Image height (default 200)
+      width (int, optional): Image width (default 200)
+      num_threads (int, optional): Number of POV-Ray threads, 0 uses
+          all available (default 0)
+
+    Returns:
+      float: Wall time in seconds, or None if POV-Ray isn't installed
+
+    """
+    import shutil
+    import subprocess
+    from time import perf_counter
+
+    if shutil.which("povray") is None:
+        print("WARNING: povray not found, skipping render timing")
+        return None
+
+    command = ["povray", f"+I{pov_name}", "-F", "-D", f"+W{width}", 
+            f"+H{height}"]
+    if num_threads != 0:
+        command.append(f"+WT{num_threads}")
+
+    start = perf_counter()
+    subprocess.run(command, stdout=subprocess.DEVNULL, 
+            stderr=subprocess.DEVNULL)
+    return perf_counter() - start
+
+
+def benchmark_decimation(field, cutoff, targets=[None, 100000, 20000], 
+        pov_name="bench_decimation.pov"):
+    """Compare isosurfaces decimated to different triangle budgets.
+
+    For every target, the isosurface is decimated, written to a .pov 
+    file with a default header, and timed with ``time_pov_parse``.
+
+    Args:
+      field (numpy array): Field values to turn into isosurface
+      cutoff (float): Isosurface value
+      targets (list, optional): Triangle budgets to try; None means no
+          decimation (default [None, 100000, 20000])
+      pov_name (str, optional): Name of the temporary .pov file 
+          (default "bench_decimation.pov")
+
+    Returns:
+      list: One dict per target with the triangle count, decimation
+          time (s), mesh2 size (bytes), and parse time (s)
+
+    """
+    from time import perf_counter
+    from povray_iso import mesh_isosurface, decimate_mesh, iter_mesh2_object
+    from povray_pov import write_header_and_camera, write_pov_file
+
+    nx, ny, nz = field.shape
+    header = write_header_and_camera(device_dims=[nx, ny, nz],
+            isosurface=True)
+
+    mesh = mesh_isosurface(field, cutoff)
+
+    results = []
+    for target in targets:
+        start = perf_counter()
+        decimated = decimate_mesh(*mesh, target_triangles=target)
+        decimate_time = perf_counter() - start
+
+        corners, faces, normals, values = decimated
+        mesh2 = "".join(iter_mesh2_object(corners, faces, normals, 
+                [1, 0, 0], 0))
+        write_pov_file(pov_name, header + mesh2)
+
+        results.append({"target": target, "triangles": len(faces),
+                "decimate_time": decimate_time, "mesh2_bytes": len(mesh2),
+                "parse_time": time_pov_parse(pov_name)})
+
+    print(f"Decimation of isosurface {cutoff}:")
+    for result in results:
+        parse_time = result["parse_time"]
+        parse_time = "n/a" if parse_time is None else f"{parse_time:.2f} s"
+        print(f"  target {str(result['target']):>8s}: "
+              + f"{result['triangles']:>9d} triangles, "
+              + f"{result['mesh2_bytes'] / 2**20:8.1f} MB, "
+              + f"decimate {result['decimate_time']:.2f} s, "
+              + f"parse {parse_time}")
+
+    return results
+
+
+def mesh_edge_keys(corners, shape):
+    """Label marching cubes vertices by the grid edge they lie on.
+
+    Every marching cubes vertex lies on an edge between two grid 
+    points, so two of its coordinates are integers. The key combines 
+    the lower grid point of the edge and the direction of the edge, so
+    that the same vertex can be found in meshes of slightly different
+    fields.
+
+    Args:
+      corners (numpy array): Vertex coordinates in grid units
+      shape (tuple): Shape of the meshed field
+
+    Returns:
+      numpy array: Integer key of every vertex
+
+    """
+    corners = np.asarray(corners, dtype=np.float64)
+    base = np.round(corners)
+
+    axis = np.argmax(np.abs(corners - base), axis=1)
+    rows = np.arange(len(corners))
+    base[rows, axis] = np.floor(corners[rows, axis])
+
+    base = np.clip(base, 0, np.array(shape) - 1).astype(np.int64)
+    return np.ravel_multi_index(base.T, shape) * 3 + axis
+
+
+def benchmark_precision(field_array, cutoffs, field_type="E", 
+        dtype=np.complex64):
+    """Compare the single and double precision field pipelines.
+
+    The field magnitude is calculated from the raw simulation array in 
+    double precision and in ``dtype``, and both are meshed at every 
+    cutoff. Reports the memory used by the field and its magnitude, 
+    and the largest distance (in grid units) between matching 
+    isosurface vertices.
+
+    Args:
+      field_array (numpy array): Raw simulation output array indexed
+          by [z_idx, y_idx, h_idx, E/H, (x, y, z)]
+      cutoffs (list): Isosurface values to compare
+      field_type (str, optional): "E" or "H" (default "E")
+      dtype (numpy dtype, optional): Reduced precision type 
+          (default np.complex64)
+
+    Returns:
+      dict: Memory (bytes) used by each pipeline and the memory saved,
+          plus a list with the vertex counts and maximum vertex 
+          deviation of every cutoff
+
+    """
+    from povray_iso import process_field_component, calc_field_mag
+    from povray_iso import mesh_isosurface
+
+    fields = {}
+    memory = {}
+    for name, field_dtype in [["double", np.complex128], ["single", dtype]]:
+        field, nx, ny, nz = process_field_component(field_array, 
+                field_type, dtype=field_dtype)
+        fields[name] = calc_field_mag(field)
+        memory[name] = field.nbytes + fields[name].nbytes
+        del field
+
+    shape = fields["double"].shape
+    results = {"memory": memory, 
+            "memory_saved": memory["double"] - memory["single"],
+            "cutoffs": []}
+
+    for cutoff in cutoffs:
+        corners = {}
+        for name in ["double", "single"]:
+            corners[name] = mesh_isosurface(fields[name], cutoff)[0]
+
+        keys, double_idx, single_idx = np.intersect1d(
+                mesh_edge_keys(corners["double"], shape),
+                mesh_edge_keys(corners["single"], shape), 
+                return_indices=True)
+
+        deviation = 0.0
+        if len(keys) > 0:
+            difference = (corners["double"][double_idx] 
+                    - corners["single"][single_idx].astype(np.float64))
+            deviation = np.amax(np.linalg.norm(difference, axis=1))
+
+        results["cutoffs"].append({"cutoff": cutoff, 
+                "double_vertices": len(corners["double"]),
+                "single_vertices": len(corners["single"]),
+                "matched_vertices": len(keys),
+                "max_deviation": deviation})
+
+    print(f"Field pipeline precision, {np.dtype(dtype).name}:")
+    print(f"  memory: {memory['double'] / 2**20:.1f} MB -> "
+          + f"{memory['single'] / 2**20:.1f} MB "
+          + f"({results['memory_saved'] / 2**20:.1f} MB saved)")
+    for result in results["cutoffs"]:
+        print(f"  isosurface {result['cutoff']}: "
+              + f"{result['double_vertices']} -> "
+              + f"{result['single_vertices']} vertices, "
+              + f"max deviation {result['max_deviation']:.2e}")
+
+    return results
+
+
+def benchmark_render_modes(field, cutoffs, height=200, width=200,
+        pov_name="bench_render.pov", df3_name="bench_render.df3"):
+    """Compare mesh2 isosurfaces with POV-Ray's df3 isosurfaces.
+
+    The same cutoffs are rendered with ``create_mesh2`` and with
+    ``create_isosurface_df3``, using the same header. Reports the time
+    spent in Python, the size of the scene (the .pov file plus the 
+    .df3 file), and the POV-Ray parse and render times.
+
+    Args:
+      field (numpy array): Field values to turn into isosurface
+      cutoffs (list): Isosurface values
+      height (int, optional): Image height (default 200)
+      width (int, optional): Image width (default 200)
+      pov_name (str, optional): Name of the temporary .pov file 
+          (default "bench_render.pov")
+      df3_name (str, optional): Name of the temporary .df3 file 
+          (default "bench_render.df3")
+
+    Returns:
+      dict: Timing (s) and scene size (bytes) keyed by "mesh2" and 
+          "df3"
+
+    """
+    import os
+    from time import perf_counter
+    from povray_iso import create_mesh2, create_isosurface_df3
+    from povray_pov import write_header_and_camera, write_pov_file
+
+    nx, ny, nz = field.shape
+    header = write_header_and_camera(device_dims=[nx, ny, nz],
+            isosurface=True)
+
+    results = {}
+    for mode in ["mesh2", "df3"]:
+        start = perf_counter()
+        if mode == "mesh2":
+            scene = create_mesh2(field, list(cutoffs))
+            scene_bytes = 0
+        else:
+            scene = create_isosurface_df3(field, list(cutoffs), 
+                    df3_name=df3_name)
+            scene_bytes = os.path.getsize(df3_name)
+        create_time = perf_counter() - start
+
+        write_pov_file(pov_name, header + scene)
+        scene_bytes += os.path.getsize(pov_name)
+
+        results[mode] = {"create_time": create_time, 
+                "scene_bytes": scene_bytes,
+                "parse_time": time_pov_parse(pov_name),
+                "render_time": time_pov_render(pov_name, height=height,
+                    width=width)}
+
+    print(f"Isosurface render modes, {len(cutoffs)} cutoffs, "
+          + f"{nx}x{ny}x{nz} field:")
+    for mode in ["mesh2", "df3"]:
+        result = results[mode]
+        times = []
+        for key in ["parse_time", "render_time"]:
+            times.append("n/a" if result[key] is None 
+                    else f"{result[key]:.2f} s")
+        print(f"  {mode:>5s}: create {result['create_time']:.2f} s, "
+              + f"{result['scene_bytes'] / 2**20:8.1f} MB, "
+              + f"parse {times[0]}, render {times[1]}")
+
+    return results
+
+
+def benchmark_mesh_backends(field, cutoff, meshers=None, repeat=3):
+    """Compare the meshing backends on a field.
+
+    Every backend meshes the same isosurface ``repeat`` times. Reports
+    the best time, the triangle and vertex counts, and the peak memory
+    allocated while meshing (from tracemalloc, which sees the NumPy 
+    arrays but not every allocation inside compiled code).
+
+    Args:
+      field (numpy array): Field values to turn into isosurface
+      cutoff (float): Isosurface value
+      meshers (list, optional): Backend names, see ``find_mesher`` in
+          povray_iso (default None, all available backends)
+      repeat (int, optional): Number of timed runs per backend
+          (default 3)
+
+    Returns:
+      list: One dict per backend with the best time (s), triangle and
+          vertex counts, and peak memory (bytes)
+
+    """
+    import tracemalloc
+    from time import perf_counter
+    from povray_iso import available_meshers, find_mesher
+
+    if meshers is None:
+        meshers = available_meshers()
+
+    results = []
+    for mesher in meshers:
+        mesher, mesh_function = find_mesher(mesher)
+
+        best = np.inf
+        for i in range(repeat):
+            start = perf_counter()
+            corners, faces, normals, values = mesh_function(field, cutoff)
+            best = min(best, perf_counter() - start)
+            del corners, faces, normals, values
+
+        tracemalloc.start()
+        corners, faces, normals, values = mesh_function(field, cutoff)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results.append({"mesher": mesher, "time": best, 
+                "triangles": len(faces), "vertices": len(corners),
+                "peak_memory": peak_memory})
+        del corners, faces, normals, values
+
+    print(f"Meshing backends, isosurface {cutoff}, field {field.shape}:")
+    for result in results:
+        print(f"  {result['mesher']:>22s}: {result['time']:.3f} s, "
+              + f"{result['triangles']:>9d} triangles, "
+              + f"{result['vertices']:>9d} vertices, "
+              + f"peak {result['peak_memory'] / 2**20:.1f} MB")
+
+    return results
@@ -6,10 +6,13 @@ them into a form that scikit-image's meshing tools can handle.
 A quick summary of these functions:
   * process_field_array reformats the data into something that
       the renderers (povray, mayavi) can process
+  * process_field_component does the same for just the E or H field
+      (or a single component), without copying the rest
   * double_roll adjusts the axes so that things aren't flipped
       when you go to plot them
   * extract_* extract varying information from the numpy array
-  * calc_* calculate various things based on the data
+  * calc_* calculate various things based on the data, and
+      calc_field_quantities calculates several of them at once
 
 These functions are specific to isosurface creation/rendering.
 
@@ -19,13 +22,64 @@ isosurface_unit_cell, located in povray_shapes.
 A quick summary of these functions:
   * create_mesh2 calls write_mesh2_params
   * write_mesh2_params never directly called by the user
+  * field_histogram builds a histogram of a field in one pass, for 
+    picking cutoffs at field quantiles (quantile_cutoffs, 
+    histogram_quantiles); load_field_histogram caches it next to the
+    field file
+  * mesh_isosurface runs marching cubes (or another backend, see
+    find_mesher and available_meshers) for a single isovalue,
+    optionally using the on-disk mesh cache (*_cached_mesh), and 
+    optionally only in a region of interest (roi_cell_boxes, 
+    mesh_cell_boxes), and optionally in z-slabs on a process pool 
+    (slab_cell_boxes, mesh_cell_box_shared)
+  * lod_step_sizes picks marching cubes step sizes from the image
+    size and camera distance
+  * iter_mesh2_parallel meshes several cutoffs on a process pool,
+    sharing the field through shared memory (share_array)
+  * create_mesh2_incremental keeps the geometry of every isosurface
+    (*_mesh2_block), so that editing the cutoffs only meshes the new
+    ones and changing the colors doesn't mesh anything
+  * render_isosurface_frames renders every simulation in an archive
+    as an animation frame, several frames at a time 
+    (render_isosurface_frame)
+  * create_mesh2_tiled meshes a periodic field seamlessly 
+    (mesh_isosurface_periodic) and places one declared copy in 
+    every unit cell
+  * create_mesh2_symmetric meshes only the fundamental domain of a
+    field with mirror symmetries (detect_symmetry, 
+    mesh_fundamental_domain) and places mirrored copies of it
+    (symmetry_transforms)
+  * create_mesh2_colored colors every vertex of an isosurface by a
+    second field (vertex_texture_indices, iter_mesh2_textured_object)
+  * create_mesh2_chunked meshes a memory-mapped simulation array one
+    z-block at a time (iter_field_blocks, read_field_block) and welds
+    the seams, for fields that don't fit in memory
+  * postprocess_mesh applies the optional mesh processing steps:
+    clean_mesh welds vertices and drops degenerate faces, and 
+    decimate_mesh simplifies an isosurface by vertex clustering
+    (both use collapse_vertices)
+  * create_isosurface_df3 skips meshing entirely, writing the field
+    to a density file (write_df3) and letting POV-Ray find the 
+    isosurfaces
+  * create_field_media renders the whole field as a glowing volume
+    from a density file, instead of discrete isosurfaces
+  * iter_* are streaming versions that yield the string in chunks,
+    so that it can be written to a file as it is generated
   * slice_isosurface is used to cut chunks out of the isosurface
     and/or the device unit cell
+  * clip_mesh does the same cut in NumPy before the isosurface is 
+    written (slice_bounds, clip_mesh_to_box, split_mesh), optionally
+    closing the cuts (slice_caps)
 """
 import numpy as np
 
 def create_mesh2(field, cutoffs, colormap="viridis", transmit=0.4, 
-        cmap_limits=["a","b"]):
+        cmap_limits=["a","b"], output=None, num_workers=1, 
+        cache_dir=None, cache_size=2**31, target_triangles=None, 
+        decimate_tolerance=None, cleanup=False, weld_tolerance=1e-4,
+        step_size=1, field_range=None, clip_cut_at=None, 
+        clip_subtract_box=False, clip_caps=False, roi_cut_at=None, 
+        roi_subtract_box=False, mesher="auto", num_slabs=1):
     """Convert any input field to one or more isosurfaces.
     
     Uses the scikit-image marching cubes algorithm to generate the
@@ -36,6 +90,65 @@ def create_mesh2(field, cutoffs, colormap="viridis", transmit=0.4,
     Minimum required input is
     * the field of interest (field)
     * the isovalues of interest (cutoffs)
+
+    If ``output`` is given, the mesh is streamed to it one chunk at a
+    time instead of being returned as one string. Only one isosurface
+    is held in memory at a time, so this is the way to go for large
+    fields with many cutoffs. Any object with a ``write`` method works,
+    e.g. an open .pov file that already contains the header.
+
+    With ``num_workers`` > 1, the cutoffs are meshed in parallel on a 
+    process pool. The field is placed in shared memory once instead of
+    being copied to every worker, and the isosurfaces are still output
+    in cutoff order, so the result is identical to the serial version.
+
+    If ``cache_dir`` is given, the marching cubes results are stored on
+    disk, keyed by a hash of the field contents, the cutoff, and the 
+    meshing parameters. Rendering the same field again (e.g. with a 
+    different colormap or transmit value) then skips marching cubes
+    and only regenerates the mesh2 text. The least recently used 
+    entries are deleted once the cache grows beyond ``cache_size``.
+
+    Fine grids produce far more triangles than the final image can
+    resolve. Set ``target_triangles`` and/or ``decimate_tolerance`` to 
+    simplify each isosurface before it is written (see 
+    ``decimate_mesh``). The triangle counts before and after are 
+    printed for every isosurface.
+
+    With ``cleanup``, coincident vertices are welded, degenerate faces
+    and unused vertices are removed, and the index arrays are shrunk
+    before anything is written (see ``clean_mesh``). This makes the 
+    mesh2 text smaller and speeds up POV-Ray's bounding hierarchy.
+
+    A ``step_size`` larger than 1 makes marching cubes skip grid 
+    points, for far fewer (and larger) triangles. ``lod_step_sizes`` 
+    picks step sizes from the image size and camera, so that triangles
+    aren't much smaller than a pixel.
+
+    The cutoffs are clamped to the field extrema, which takes a pass 
+    over the field. Pass ``field_range`` (e.g. from ``field_histogram``)
+    to skip it. ``quantile_cutoffs`` picks cutoffs from a histogram.
+
+    ``clip_cut_at`` cuts the isosurfaces with the same box as 
+    ``slice_isosurface``, but in NumPy (see ``clip_mesh``), so the 
+    removed triangles are never written and POV-Ray needs no CSG. 
+    ``clip_caps`` closes the cut surfaces.
+
+    ``roi_cut_at`` does the opposite: only the grid cells kept by that
+    slice are meshed (see ``roi_cell_boxes``), which saves meshing time
+    in proportion to the volume removed. The cut follows the grid 
+    cells, so combine it with the same ``clip_cut_at`` for an exact 
+    cut.
+
+    ``mesher`` picks the meshing backend (see ``find_mesher``). The 
+    default uses ``marching_cubes_lewiner`` where scikit-image still 
+    has it, and ``marching_cubes`` otherwise. ``benchmark_mesh_backends``
+    in povray_bench compares them.
+
+    ``num_workers`` parallelizes over the cutoffs, which doesn't help 
+    with a single isosurface. Set ``num_slabs`` to instead split the 
+    field into that many z-slabs, which are meshed on ``num_workers``
+    processes and welded back together (see ``mesh_isosurface``).
     
     #### NOTE ####
     Currently working on allowing user more control over the isosurface
@@ -44,146 +157,3582 @@ def create_mesh2(field, cutoffs, colormap="viridis", transmit=0.4,
     #### NOTE ####
 
     Args:
-      field (numpy array): Field values to turn into isosurface
-      cutoffs (list): Isosurface values you want rendered
-      colormap (string, optional): Colormap name, defaults to "viridis"
-      transmit (float, optional): Isosurface transparency (default 0.4)
-      cmap_limits (list, optional): colormap min and max values, 
-          defaults to field extrema if element is a character (set as 
-          ["a", "b"] by default)
+      field (numpy array): Field values to turn into isosurface
+      cutoffs (list): Isosurface values you want rendered
+      colormap (string, optional): Colormap name, defaults to "viridis"
+      transmit (float, optional): Isosurface transparency (default 0.4)
+      cmap_limits (list, optional): colormap min and max values, 
+          defaults to field extrema if element is a character (set as 
+          ["a", "b"] by default)
+      output (file, optional): Open file (or any object with a write
+          method) that the mesh is written to (default None, return
+          the mesh as a string)
+      num_workers (int, optional): Number of processes used to mesh
+          the cutoffs in parallel (default 1, serial)
+      cache_dir (str, optional): Directory for the marching cubes 
+          cache (default None, no caching)
+      cache_size (int, optional): Maximum size of the cache directory
+          in bytes (default 2**31, i.e. 2 GB)
+      target_triangles (int, optional): Decimate every isosurface to
+          at most this many triangles (default None, no decimation)
+      decimate_tolerance (float, optional): Decimate every isosurface,
+          merging vertices closer than roughly this distance (in grid
+          units) (default None, no decimation)
+      cleanup (bool, optional): Weld vertices and remove degenerate 
+          faces before output (default False)
+      weld_tolerance (float, optional): Vertices closer than this (in
+          grid units) are welded by the cleanup (default 1e-4)
+      step_size (int or list, optional): Marching cubes step size in 
+          grid points, or one step size per cutoff (in the same order
+          as ``cutoffs``) (default 1, full resolution)
+      field_range (list, optional): Minimum and maximum of the field
+          (default None, read from the field)
+      clip_cut_at (list, optional): Section to cut, as a fraction of 
+          the unit cell, like the cut_at of ``slice_isosurface`` 
+          (default None, no clipping)
+      clip_subtract_box (bool, optional): Remove the section (if True)
+          or keep only the section (if False, default)
+      clip_caps (bool, optional): Close the cuts with flat faces 
+          (default False)
+      roi_cut_at (list, optional): Only mesh the grid cells kept by a
+          slice with this cut_at (default None, mesh everything)
+      roi_subtract_box (bool, optional): The slice removes the section
+          (if True) or keeps only the section (if False, default)
+      mesher (str, optional): Meshing backend, see ``find_mesher`` 
+          (default "auto")
+      num_slabs (int, optional): Mesh every isosurface in this many 
+          z-slabs, in parallel if num_workers > 1 (default 1)
+
+    Returns:
+      string: mesh2 object as a string, empty if ``output`` is given
+
+    """
+    mesh_chunks = iter_mesh2(field, cutoffs, colormap=colormap,
+            transmit=transmit, cmap_limits=cmap_limits, 
+            num_workers=num_workers, cache_dir=cache_dir, 
+            cache_size=cache_size, target_triangles=target_triangles,
+            decimate_tolerance=decimate_tolerance, cleanup=cleanup,
+            weld_tolerance=weld_tolerance, step_size=step_size, 
+            field_range=field_range, clip_cut_at=clip_cut_at, 
+            clip_subtract_box=clip_subtract_box, clip_caps=clip_caps,
+            roi_cut_at=roi_cut_at, roi_subtract_box=roi_subtract_box,
+            mesher=mesher, num_slabs=num_slabs)
+
+    if output is None:
+        return "".join(mesh_chunks)
+
+    for chunk in mesh_chunks:
+        output.write(chunk)
+
+    return ""
+
+
+def iter_mesh2(field, cutoffs, colormap="viridis", transmit=0.4,
+        cmap_limits=["a","b"], num_workers=1, cache_dir=None, 
+        cache_size=2**31, target_triangles=None, decimate_tolerance=None,
+        cleanup=False, weld_tolerance=1e-4, step_size=1, 
+        field_range=None, clip_cut_at=None, clip_subtract_box=False, 
+        clip_caps=False, roi_cut_at=None, roi_subtract_box=False, 
+        mesher="auto", num_slabs=1):
+    """Generate the isosurface mesh2 string in chunks.
+
+    Does the actual work for ``create_mesh2``. Yields the union
+    wrapper and every isosurface piece by piece, so the chunks can be
+    written to a file as they are created. Takes the same arguments as
+    ``create_mesh2``.
+
+    Args:
+      field (numpy array): Field values to turn into isosurface
+      cutoffs (list): Isosurface values you want rendered
+      colormap (string, optional): Colormap name, defaults to "viridis"
+      transmit (float, optional): Isosurface transparency (default 0.4)
+      cmap_limits (list, optional): colormap min and max values, 
+          defaults to field extrema if element is a character (set as 
+          ["a", "b"] by default)
+      num_workers (int, optional): Number of processes used to mesh
+          the cutoffs in parallel (default 1, serial)
+      cache_dir (str, optional): Directory for the marching cubes 
+          cache (default None, no caching)
+      cache_size (int, optional): Maximum size of the cache directory
+          in bytes (default 2**31, i.e. 2 GB)
+      target_triangles (int, optional): Decimate every isosurface to
+          at most this many triangles (default None, no decimation)
+      decimate_tolerance (float, optional): Decimate every isosurface,
+          merging vertices closer than roughly this distance (in grid
+          units) (default None, no decimation)
+      cleanup (bool, optional): Weld vertices and remove degenerate 
+          faces before output (default False)
+      weld_tolerance (float, optional): Vertices closer than this (in
+          grid units) are welded by the cleanup (default 1e-4)
+      step_size (int or list, optional): Marching cubes step size in 
+          grid points, or one step size per cutoff (in the same order
+          as ``cutoffs``) (default 1, full resolution)
+      field_range (list, optional): Minimum and maximum of the field
+          (default None, read from the field)
+      clip_cut_at (list, optional): Section to cut, as a fraction of 
+          the unit cell, like the cut_at of ``slice_isosurface`` 
+          (default None, no clipping)
+      clip_subtract_box (bool, optional): Remove the section (if True)
+          or keep only the section (if False, default)
+      clip_caps (bool, optional): Close the cuts with flat faces 
+          (default False)
+      roi_cut_at (list, optional): Only mesh the grid cells kept by a
+          slice with this cut_at (default None, mesh everything)
+      roi_subtract_box (bool, optional): The slice removes the section
+          (if True) or keeps only the section (if False, default)
+      mesher (str, optional): Meshing backend, see ``find_mesher`` 
+          (default "auto")
+      num_slabs (int, optional): Mesh every isosurface in this many 
+          z-slabs, in parallel if num_workers > 1 (default 1)
+
+    Yields:
+      string: Consecutive pieces of the mesh2 string
+
+    """
+    if np.ndim(step_size) == 0:
+        step_size = [step_size] * len(cutoffs)
+    input_cutoffs = cutoffs
+
+    if field_range is None:
+        field_range = [np.amin(field), np.amax(field)]
+
+    cutoffs = clamp_cutoffs(cutoffs, field_range[0], field_range[1])
+    colors = isosurface_colors(cutoffs, colormap, cmap_limits)
+
+    # The input cutoffs were clamped in place, match up the step sizes
+    step_sizes = dict(zip(input_cutoffs, step_size))
+    step_sizes = [step_sizes[cutoff] for cutoff in cutoffs]
+
+    # Need to use union if more than one isosurface, esp. if using 
+    # povray's intersection or difference functions as an option
+    if len(cutoffs) > 1:
+        yield f"\nunion {{"
+
+    # Everything needed to find or store the meshes in the cache
+    cache = None
+    if cache_dir is not None:
+        cache = {"cache_dir": cache_dir, "cache_size": cache_size,
+                "field_hash": field_digest(field)}
+
+    # Everything that happens to a mesh between meshing and output
+    mesh_options = {"target_triangles": target_triangles,
+            "decimate_tolerance": decimate_tolerance, "cleanup": cleanup,
+            "weld_tolerance": weld_tolerance}
+
+    if clip_cut_at is not None:
+        lower, upper = slice_bounds(field.shape, clip_cut_at)
+        mesh_options["clip"] = {"lower": lower, "upper": upper, 
+                "subtract_box": clip_subtract_box, "caps": clip_caps,
+                "cutoffs": [float(c) for c in cutoffs]}
+
+    roi = None
+    if roi_cut_at is not None:
+        roi = roi_cell_boxes(field.shape, roi_cut_at, 
+                subtract_box=roi_subtract_box)
+
+    if num_slabs > 1:
+        meshes = iter_mesh2_serial(field, cutoffs, colors, transmit,
+                cache=cache, mesh_options=mesh_options, 
+                step_sizes=step_sizes, roi=roi, mesher=mesher, 
+                num_slabs=num_slabs, num_workers=num_workers)
+    elif num_workers > 1 and len(cutoffs) > 1:
+        meshes = iter_mesh2_parallel(field, cutoffs, colors, transmit,
+                num_workers, cache=cache, mesh_options=mesh_options,
+                step_sizes=step_sizes, roi=roi, mesher=mesher)
+    else:
+        meshes = iter_mesh2_serial(field, cutoffs, colors, transmit,
+                cache=cache, mesh_options=mesh_options, 
+                step_sizes=step_sizes, roi=roi, mesher=mesher)
+
+    # Loop over cutoffs
+    for i, mesh in enumerate(meshes):
+
+        print(f"Isosurface value: {cutoffs[i]}")
+        print(f"Color: {colors[i]}\n")
+
+        yield from mesh
+
+    # End union
+    if len(cutoffs) > 1:
+        yield f"\n}}\n\n"
+
+
+def field_histogram(field, num_bins=4096, chunk_size=2**22):
+    """Build a histogram of a field in a single streaming pass.
+
+    The field is read ``chunk_size`` values at a time, so memory-mapped
+    fields never have to fit in memory. The histogram starts out 
+    spanning the first chunk; whenever a chunk falls outside of it, 
+    the range is doubled (merging neighboring bins) until everything 
+    fits, while the exact minimum and maximum are tracked separately.
+    The range grows one side at a time, so it can overshoot the data
+    on both sides and the bins can end up several times wider than 
+    those of a histogram built from the true extrema (e.g. data in 
+    [0, 1] with outliers at -0.01 and 1.01 gives a range of [-1, 3], 
+    about 4x). Use more bins if the quantiles need finer resolution.
+
+    NaN and infinite values are left out of the histogram, the 
+    extrema, and the count, and are counted separately.
+
+    Use ``histogram_quantiles`` or ``quantile_cutoffs`` to pick 
+    cutoffs, and pass [hist["min"], hist["max"]] as the field_range of
+    ``create_mesh2``. ``load_field_histogram`` caches the histogram 
+    next to the field file.
+
+    Args:
+      field (numpy array): Field values, any shape
+      num_bins (int, optional): Number of bins, must be even 
+          (default 4096)
+      chunk_size (int, optional): Approximate number of values read at
+          a time (default 2**22)
+
+    Returns:
+      dict: Bin counts ("counts"), histogram range ("lower", "upper"),
+          field extrema ("min", "max"), number of values ("count"), and
+          number of non-finite values ("non_finite")
+
+    Raises:
+      ValueError: The field has no finite values
+
+    """
+    num_bins += num_bins % 2
+    counts = np.zeros(num_bins, dtype=np.int64)
+    lower = upper = None
+    field_min = np.inf
+    field_max = -np.inf
+    non_finite = 0
+
+    # Read whole slices along the first axis
+    slice_size = max(1, int(np.prod(field.shape[1:])))
+    num_slices = max(1, chunk_size // slice_size)
+
+    for start in range(0, field.shape[0], num_slices):
+        chunk = np.asarray(field[start:(start + num_slices)]).ravel()
+
+        # NaN and inf would stretch the range without end
+        finite = np.isfinite(chunk)
+        if not np.all(finite):
+            non_finite += len(chunk) - int(np.count_nonzero(finite))
+            chunk = chunk[finite]
+        if len(chunk) == 0:
+            continue
+        chunk_min = float(np.amin(chunk))
+        chunk_max = float(np.amax(chunk))
+        field_min = min(field_min, chunk_min)
+        field_max = max(field_max, chunk_max)
+
+        if lower is None:
+            lower = chunk_min
+            upper = chunk_max
+            if upper <= lower:
+                upper = lower + max(abs(lower), 1.0) * 1e-6
+
+        # Double the range until the chunk fits
+        while chunk_min < lower or chunk_max > upper:
+            merged = counts.reshape(-1, 2).sum(axis=1)
+            padding = np.zeros(num_bins // 2, dtype=np.int64)
+            width = upper - lower
+            if chunk_min < lower:
+                counts = np.concatenate([padding, merged])
+                lower -= width
+            else:
+                counts = np.concatenate([merged, padding])
+                upper += width
+
+        counts += np.histogram(chunk, bins=num_bins, 
+                range=(lower, upper))[0]
+
+    if lower is None:
+        raise ValueError("field has no finite values")
+    if non_finite > 0:
+        print(f"WARNING: {non_finite} non-finite field values (NaN or "
+              + "inf) left out of the histogram")
+
+    return {"counts": counts, "lower": lower, "upper": upper, 
+            "min": field_min, "max": field_max, 
+            "count": int(np.sum(counts)), "non_finite": non_finite}
+
+
+def histogram_quantiles(histogram, quantiles):
+    """Estimate field quantiles from a ``field_histogram``.
+
+    Interpolates linearly within the bins, and the results are clamped
+    to the field extrema.
+
+    Args:
+      histogram (dict): Output of ``field_histogram``
+      quantiles (list): Quantiles to estimate, between 0 and 1
+
+    Returns:
+      list: Field value at every quantile
+
+    """
+    counts = histogram["counts"]
+    edges = np.linspace(histogram["lower"], histogram["upper"], 
+            len(counts) + 1)
+    cdf = np.concatenate([[0], np.cumsum(counts)]) / histogram["count"]
+
+    values = []
+    for quantile in quantiles:
+        i = min(len(counts), max(1, np.searchsorted(cdf, quantile)))
+        fraction = 0.0
+        if cdf[i] > cdf[i - 1]:
+            fraction = (quantile - cdf[i - 1]) / (cdf[i] - cdf[i - 1])
+        value = edges[i - 1] + fraction * (edges[i] - edges[i - 1])
+        values.append(float(min(histogram["max"], 
+                max(histogram["min"], value))))
+
+    return values
+
+
+def quantile_cutoffs(field, quantiles=[0.9, 0.95, 0.99], num_bins=4096):
+    """Pick isosurface cutoffs at quantiles of the field.
+
+    E.g. the default gives the surfaces enclosing the 10%, 5%, and 1%
+    of the field with the largest values.
+
+    Args:
+      field (numpy array or dict): Field values, or a histogram from 
+          ``field_histogram`` or ``load_field_histogram``
+      quantiles (list, optional): Quantiles between 0 and 1 
+          (default [0.9, 0.95, 0.99])
+      num_bins (int, optional): Number of histogram bins, only used if
+          ``field`` is an array (default 4096)
+
+    Returns:
+      list: Cutoffs, one per quantile
+
+    """
+    histogram = field
+    if not isinstance(field, dict):
+        histogram = field_histogram(field, num_bins=num_bins)
+
+    cutoffs = histogram_quantiles(histogram, quantiles)
+    print(f"Quantile cutoffs: {cutoffs}")
+
+    return cutoffs
+
+
+def load_field_histogram(field_file, num_bins=4096):
+    """Load the histogram of a field file, building it if needed.
+
+    The field (a .npy file) is memory-mapped and passed through 
+    ``field_histogram`` once. The histogram is stored next to it, in 
+    ``{field_file}.hist.npz``, along with the size and modification 
+    time of the field file, and is rebuilt if the field file changes.
+
+    Args:
+      field_file (str): Name of the .npy field file
+      num_bins (int, optional): Number of bins (default 4096)
+
+    Returns:
+      dict: Histogram, as returned by ``field_histogram``
+
+    """
+    import os
+
+    stat = os.stat(field_file)
+    file_id = np.array([stat.st_size, stat.st_mtime_ns, num_bins])
+    hist_file = f"{field_file}.hist.npz"
+
+    if os.path.isfile(hist_file):
+        with np.load(hist_file) as stored:
+            # Histograms stored without the non-finite count are rebuilt
+            if (np.array_equal(stored["file_id"], file_id) 
+                    and "non_finite" in stored.files):
+                return {"counts": stored["counts"], 
+                        "lower": float(stored["lower"]), 
+                        "upper": float(stored["upper"]), 
+                        "min": float(stored["min"]), 
+                        "max": float(stored["max"]), 
+                        "count": int(stored["count"]), 
+                        "non_finite": int(stored["non_finite"])}
+
+    histogram = field_histogram(np.load(field_file, mmap_mode="r"), 
+            num_bins=num_bins)
+
+    try:
+        np.savez(hist_file, file_id=file_id, **histogram)
+    except OSError:
+        print(f"WARNING: could not save the histogram to {hist_file}")
+
+    return histogram
+
+
+def clamp_cutoffs(cutoffs, field_min, field_max):
+    """Move the cutoffs inside the field range, sort, and deduplicate.
+
+    Cutoffs outside the field range are replaced in place in the input
+    list, as ``create_mesh2`` always has.
+
+    Args:
+      cutoffs (list): Isosurface values
+      field_min (float): Minimum value of the field
+      field_max (float): Maximum value of the field
+
+    Returns:
+      list: Sorted isosurface values without duplicates
+
+    """
+    # Check that all cutoffs are contained within the dataset
+    # Also can't use the field extrema here, must tweek slightly
+    # Otherwise skimage.measure.marching_cubes() throws an error
+    for i in range(len(cutoffs)):
+        if cutoffs[i] <= field_min:
+            cutoffs[i] = 1.0001 * field_min
+        elif cutoffs[i] >= field_max:
+            cutoffs[i] = 0.9999 * field_max
+
+    # Sort and remove duplicates
+    return sorted(set(cutoffs))
+
+
+def isosurface_colors(cutoffs, colormap="viridis", cmap_limits=["a","b"]):
+    """Pick an isosurface color for every cutoff from a colormap.
+
+    Args:
+      cutoffs (list): Sorted isosurface values
+      colormap (string, optional): Colormap name, defaults to "viridis"
+      cmap_limits (list, optional): colormap min and max values, 
+          characters are replaced by the cutoff extrema in place (set 
+          as ["a", "b"] by default)
+
+    Returns:
+      list: One RGBA color per cutoff
+
+    """
+    import pylab
+
+    # Hijack colormap for a color scheme
+    # Extremes default to max and min cutoffs if the user doesn't specify
+    # Also make sure that the desired colormap range includes all cutoffs
+    cm = pylab.get_cmap(colormap)
+
+    if isinstance(cmap_limits[0], str):
+        cmap_limits[0] = min(cutoffs)
+    if isinstance(cmap_limits[1], str):
+        cmap_limits[1] = max(cutoffs)
+
+    # Grab colors from colormap
+    return [cm(i / len(cutoffs)) for i in range(len(cutoffs))]
+
+
+def lod_step_sizes(field_shape, cutoffs, height=800, width=800, 
+        camera_loc=[], camera_style="perspective", camera_rotate=60, 
+        viewing_angle=0, triangle_pixels=1.0, outer_coarsening=0.0, 
+        max_step=8):
+    """Pick marching cubes step sizes that match the image resolution.
+
+    Estimates how many grid points end up in a single pixel of the 
+    final image, from the image size, the camera distance to the field,
+    and the camera's field of view, and picks the largest step size 
+    for which the triangles are still about ``triangle_pixels`` pixels
+    across. The result is meant for the ``step_size`` argument of 
+    ``create_mesh2``.
+
+    With several translucent isosurfaces, the inner ones are seen 
+    through the outer ones, which therefore need less detail. A 
+    positive ``outer_coarsening`` gives the outermost (lowest) cutoff 
+    a step size (1 + outer_coarsening) times larger, scaling down to 
+    the base step size for the innermost (highest) cutoff.
+
+    The camera settings should match the ones passed to 
+    ``write_header_and_camera``. If ``camera_loc`` isn't given, it is
+    guessed with ``guess_camera``, as the header would.
+
+    Args:
+      field_shape (tuple): Shape of the field, [nx, ny, nz]
+      cutoffs (list): Isosurface values
+      height (int, optional): Image height (default 800)
+      width (int, optional): Image width (default 800)
+      camera_loc (list, optional): Camera location (default [], guess)
+      camera_style (str, optional): "perspective" (default) or 
+          "orthographic"
+      camera_rotate (float, optional): Camera rotation around z in 
+          degrees, only used when guessing the camera (default 60)
+      viewing_angle (float, optional): Camera angle in degrees, 0 uses
+          the POV-Ray (or write_header_and_camera) default (default 0)
+      triangle_pixels (float, optional): Smallest wanted triangle size
+          in pixels (default 1.0)
+      outer_coarsening (float, optional): Extra step size for the 
+          outer isosurfaces, as a fraction of the base step size 
+          (default 0.0, the same step size for all)
+      max_step (int, optional): Largest allowed step size (default 8)
+
+    Returns:
+      list: Marching cubes step size for every cutoff, in the same 
+          order as ``cutoffs``
+
+    """
+    from math import atan, radians, tan
+    from povray_pov import guess_camera
+
+    # guess_camera changes the dimensions it is given
+    if camera_loc == []:
+        camera_loc = guess_camera(list(field_shape), 
+                camera_style=camera_style, camera_rotate=camera_rotate,
+                isosurface=True)[0]
+
+    center = 0.5 * (np.array(field_shape) - 1)
+    distance = np.linalg.norm(np.array(camera_loc) - center)
+
+    # write_header_and_camera uses right and up vectors of length one
+    if camera_style == "orthographic" and viewing_angle == 0:
+        viewing_angle = 60
+    if viewing_angle == 0:
+        fov = 2 * atan(0.5)
+    else:
+        fov = radians(viewing_angle)
+
+    # Size of a pixel at the field, in grid points
+    pixel = 2 * distance * tan(0.5 * fov) / max(height, width)
+    base_step = max(1.0, pixel * triangle_pixels)
+
+    # Lowest cutoff is the outermost isosurface
+    ranks = np.argsort(np.argsort(cutoffs))
+    step_sizes = []
+    for rank in ranks:
+        factor = 1.0
+        if len(cutoffs) > 1:
+            factor += (outer_coarsening * (len(cutoffs) - 1 - rank) 
+                    / (len(cutoffs) - 1))
+        step_sizes.append(int(min(max_step, max(1, base_step * factor))))
+
+    print(f"Pixel size: {pixel:.2f} grid points, "
+          + f"step sizes: {step_sizes}")
+
+    return step_sizes
+
+
+def iter_mesh2_serial(field, cutoffs, colors, transmit, cache=None,
+        mesh_options=None, step_sizes=None, roi=None, mesher="auto",
+        num_slabs=1, num_workers=1):
+    """Mesh the cutoffs one after another.
+
+    Used by ``iter_mesh2``. Each isosurface is only meshed once the 
+    previous one has been fully consumed. With ``num_slabs`` > 1, each
+    isosurface is meshed in z-slabs on ``num_workers`` processes.
+
+    Args:
+      field (numpy array): Field values to turn into isosurface
+      cutoffs (list): Sorted isosurface values
+      colors (list): Isosurface color for every cutoff
+      transmit (float): Isosurface transparency
+      cache (dict, optional): Keyword arguments for the mesh cache,
+          passed on to ``mesh_isosurface`` (default None, no caching)
+      mesh_options (dict, optional): Keyword arguments passed on to
+          ``postprocess_mesh`` (default None, no postprocessing)
+      step_sizes (list, optional): Marching cubes step size for every
+          cutoff (default None, all 1)
+      roi (list, optional): Boxes of grid cells to mesh, from 
+          ``roi_cell_boxes`` (default None, the whole field)
+      mesher (str, optional): Meshing backend, see ``find_mesher`` 
+          (default "auto")
+      num_slabs (int, optional): Number of z-slabs (default 1)
+      num_workers (int, optional): Number of worker processes meshing
+          the slabs (default 1)
+
+    Yields:
+      iterator: Pieces of the mesh2 object, one iterator per cutoff
+
+    """
+    if cache is None:
+        cache = {}
+    if mesh_options is None:
+        mesh_options = {}
+    if step_sizes is None:
+        step_sizes = [1] * len(cutoffs)
+
+    for i in range(len(cutoffs)):
+        mesh = mesh_isosurface(field, cutoffs[i], step_size=step_sizes[i],
+                roi=roi, mesher=mesher, num_slabs=num_slabs, 
+                num_workers=num_workers, **cache)
+        corners, faces, normals, values = postprocess_mesh(mesh, 
+                cutoffs[i], field=field, **mesh_options)
+        del mesh
+
+        yield iter_mesh2_object(corners, faces, normals, colors[i], 
+                transmit)
+
+        # Release this isosurface before meshing the next one
+        del corners, faces, normals, values
+
+
+def iter_mesh2_parallel(field, cutoffs, colors, transmit, num_workers,
+        cache=None, mesh_options=None, step_sizes=None, roi=None, 
+        mesher="auto"):
+    """Mesh the cutoffs in parallel on a process pool.
+
+    Used by ``iter_mesh2``. The field is copied into shared memory once
+    and every worker reads it from there. Each worker runs marching 
+    cubes and formats its mesh2 object; the objects are handed back in
+    cutoff order. At most num_workers cutoffs are in flight at a time,
+    and the next one is only submitted once the oldest object has been
+    handed back, so finished objects don't pile up in memory.
+
+    Args:
+      field (numpy array): Field values to turn into isosurface
+      cutoffs (list): Sorted isosurface values
+      colors (list): Isosurface color for every cutoff
+      transmit (float): Isosurface transparency
+      num_workers (int): Number of worker processes
+      cache (dict, optional): Keyword arguments for the mesh cache,
+          passed on to ``mesh_isosurface`` (default None, no caching)
+      mesh_options (dict, optional): Keyword arguments passed on to
+          ``postprocess_mesh`` (default None, no postprocessing)
+      step_sizes (list, optional): Marching cubes step size for every
+          cutoff (default None, all 1)
+      roi (list, optional): Boxes of grid cells to mesh, from 
+          ``roi_cell_boxes`` (default None, the whole field)
+      mesher (str, optional): Meshing backend, see ``find_mesher`` 
+          (default "auto")
+
+    Yields:
+      list: Pieces of the mesh2 object, one list per cutoff
+
+    """
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    if cache is None:
+        cache = {}
+    if step_sizes is None:
+        step_sizes = [1] * len(cutoffs)
+
+    shm, shared_field = share_array(field)
+    try:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+
+            def submit(i):
+                return executor.submit(create_mesh2_object_shared, 
+                        shm.name, field.shape, field.dtype.str, cutoffs[i], 
+                        colors[i], transmit, cache, mesh_options, 
+                        step_sizes[i], roi, mesher)
+
+            # Keep the pool busy, but never more than num_workers 
+            # results waiting in this process
+            futures = deque()
+            next_cutoff = 0
+            while next_cutoff < len(cutoffs) and len(futures) < num_workers:
+                futures.append(submit(next_cutoff))
+                next_cutoff += 1
+
+            while futures:
+                mesh = futures.popleft().result()
+                if next_cutoff < len(cutoffs):
+                    futures.append(submit(next_cutoff))
+                    next_cutoff += 1
+                yield [mesh]
+                del mesh
+    finally:
+        del shared_field
+        shm.close()
+        shm.unlink()
+
+
+def share_array(array):
+    """Copy a numpy array into a new block of shared memory.
+
+    The caller is responsible for calling ``close()`` and ``unlink()``
+    on the returned shared memory block once all processes are done.
+
+    Args:
+      array (numpy array): Array to share
+
+    Returns:
+      tuple: The SharedMemory block and a numpy array backed by it
+
+    """
+    from multiprocessing import shared_memory
+
+    array = np.asarray(array)
+    shm = shared_memory.SharedMemory(create=True, 
+            size=max(1, array.nbytes))
+    shared = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    shared[...] = array
+
+    return shm, shared
+
+
+def create_mesh2_object_shared(shm_name, shape, dtype, cutoff, color, 
+        transmit, cache=None, mesh_options=None, step_size=1, roi=None,
+        mesher="auto"):
+    """Mesh a single cutoff of a field stored in shared memory.
+
+    Runs in the worker processes started by ``iter_mesh2_parallel``,
+    never directly called by the user.
+
+    Args:
+      shm_name (str): Name of the shared memory block holding the field
+      shape (tuple): Shape of the field array
+      dtype (str): Data type of the field array
+      cutoff (float): Isosurface value
+      color (list): Isosurface color as [r, g, b, ...]
+      transmit (float): Isosurface transparency
+      cache (dict, optional): Keyword arguments for the mesh cache,
+          passed on to ``mesh_isosurface`` (default None, no caching)
+      mesh_options (dict, optional): Keyword arguments passed on to
+          ``postprocess_mesh`` (default None, no postprocessing)
+      step_size (int, optional): Marching cubes step size (default 1)
+      roi (list, optional): Boxes of grid cells to mesh (default None,
+          the whole field)
+      mesher (str, optional): Meshing backend (default "auto")
+
+    Returns:
+      str: The mesh2 object
+
+    """
+    from multiprocessing import shared_memory
+
+    if cache is None:
+        cache = {}
+    if mesh_options is None:
+        mesh_options = {}
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        field = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        mesh = mesh_isosurface(field, cutoff, step_size=step_size, 
+                roi=roi, mesher=mesher, **cache)
+        corners, faces, normals, values = postprocess_mesh(mesh, cutoff,
+                field=field, **mesh_options)
+        del field, mesh
+    finally:
+        shm.close()
+
+    return "".join(iter_mesh2_object(corners, faces, normals, color, 
+            transmit))
+
+
+def create_mesh2_incremental(field, cutoffs, blocks, colormap="viridis",
+        transmit=0.4, cmap_limits=["a","b"], field_hash=None, 
+        target_triangles=None, decimate_tolerance=None, cleanup=False,
+        weld_tolerance=1e-4, step_size=1, field_range=None, 
+        mesher="auto", cache_size=2**31):
+    """Create isosurfaces, reusing the ones that were already made.
+
+    Same output as ``create_mesh2``, but the geometry of every 
+    isosurface (the mesh2 text without the pigment) is kept in 
+    ``blocks``. Call it again with the same ``blocks`` after editing 
+    the cutoffs, and only the new cutoffs are meshed and formatted. 
+    Changing only the colormap, cmap_limits or transmit doesn't mesh
+    anything; the stored geometry just gets new pigments.
+
+    The blocks are keyed by a hash of the field, the (clamped) cutoff,
+    and everything else that changes the geometry, so a different 
+    field or different mesh options never reuse old blocks. Blocks 
+    that are no longer used are kept, in case the cutoff comes back;
+    a directory of blocks is capped at cache_size like the mesh cache
+    (``prune_mesh_cache``, least recently used blocks go first), and 
+    it can be the same directory as the mesh cache.
+
+    Args:
+      field (numpy array): Field values to turn into isosurface
+      cutoffs (list): Isosurface values you want rendered
+      blocks (dict or str): Stored mesh2 geometry, either a dict (kept
+          in memory, start with {}) or the name of a directory (kept 
+          on disk, created if needed)
+      colormap (string, optional): Colormap name, defaults to "viridis"
+      transmit (float, optional): Isosurface transparency (default 0.4)
+      cmap_limits (list, optional): colormap min and max values, 
+          defaults to field extrema if element is a character (set as 
+          ["a", "b"] by default)
+      field_hash (str, optional): Digest of the field from 
+          ``field_digest``; computed here if missing (default None)
+      target_triangles (int, optional): Decimate every isosurface to
+          at most this many triangles (default None, no decimation)
+      decimate_tolerance (float, optional): Decimate every isosurface,
+          merging vertices closer than roughly this distance (in grid
+          units) (default None, no decimation)
+      cleanup (bool, optional): Weld vertices and remove degenerate 
+          faces before output (default False)
+      weld_tolerance (float, optional): Vertices closer than this (in
+          grid units) are welded by the cleanup (default 1e-4)
+      step_size (int, optional): Marching cubes step size in grid 
+          points (default 1, full resolution)
+      field_range (list, optional): Minimum and maximum of the field
+          (default None, read from the field)
+      mesher (str, optional): Meshing backend, see ``find_mesher`` 
+          (default "auto")
+      cache_size (int, optional): Maximum size of a blocks directory 
+          in bytes (default 2**31, i.e. 2 GB)
+
+    Returns:
+      string: mesh2 object as a string
+
+    """
+    mesher = find_mesher(mesher)[0]
+    if field_hash is None:
+        field_hash = field_digest(field)
+    if field_range is None:
+        field_range = [np.amin(field), np.amax(field)]
+
+    cutoffs = clamp_cutoffs(cutoffs, field_range[0], field_range[1])
+    colors = isosurface_colors(cutoffs, colormap, cmap_limits)
+
+    # Everything that changes the geometry must be part of the key
+    mesh_options = {"target_triangles": target_triangles,
+            "decimate_tolerance": decimate_tolerance, "cleanup": cleanup,
+            "weld_tolerance": weld_tolerance}
+    block_params = dict(mesh_options, mesher=mesher,
+            step_size=step_size, block="mesh2_geometry")
+
+    mesh = ""
+
+    # Need to use union if more than one isosurface
+    if len(cutoffs) > 1:
+        mesh += f"\nunion {{"
+
+    for i in range(len(cutoffs)):
+        print(f"Isosurface value: {cutoffs[i]}")
+        print(f"Color: {colors[i]}\n")
+
+        key = mesh_cache_key(field_hash, cutoffs[i], block_params)
+        geometry = load_mesh2_block(blocks, key)
+
+        if geometry is None:
+            corners, faces, normals, values = postprocess_mesh(
+                    mesh_isosurface(field, cutoffs[i], 
+                        step_size=step_size, mesher=mesher), 
+                    cutoffs[i], **mesh_options)
+            geometry = "".join(iter_mesh2_geometry(corners, faces, 
+                    normals))
+            del corners, faces, normals, values
+            save_mesh2_block(blocks, key, geometry, cache_size)
+        else:
+            print(f"Reusing isosurface {cutoffs[i]}")
+
+        mesh += geometry
+        mesh += mesh2_pigment(colors[i], transmit)
+        mesh += f"\n\t}}"
+
+    # End union
+    if len(cutoffs) > 1:
+        mesh += f"\n}}\n\n"
+
+    return mesh
+
+
+def load_mesh2_block(blocks, key):
+    """Look up stored mesh2 geometry for ``create_mesh2_incremental``.
+
+    Args:
+      blocks (dict or str): Dict of blocks, or directory of block files
+      key (str): Block key from ``mesh_cache_key``
+
+    Returns:
+      str: The stored geometry, None if there is none
+
+    """
+    import os
+
+    if isinstance(blocks, dict):
+        return blocks.get(key)
+
+    block_name = os.path.join(blocks, f"{key}.mesh2")
+
+    try:
+        with open(block_name, "r") as fileID:
+            geometry = fileID.read()
+        # Mark as recently used for prune_mesh_cache
+        os.utime(block_name)
+    except OSError:
+        # Missing, or removed by another process
+        return None
+
+    return geometry
+
+
+def save_mesh2_block(blocks, key, geometry, cache_size=2**31):
+    """Store mesh2 geometry for ``create_mesh2_incremental``.
+
+    Block files are written to a temporary file first and then moved
+    into place, so a crash never leaves a partial block behind. The
+    directory is then pruned with ``prune_mesh_cache``.
+
+    Args:
+      blocks (dict or str): Dict of blocks, or directory of block files
+      key (str): Block key from ``mesh_cache_key``
+      geometry (str): mesh2 geometry from ``iter_mesh2_geometry``
+      cache_size (int, optional): Maximum size of the directory in 
+          bytes (default 2**31, i.e. 2 GB)
+
+    Returns:
+
+    """
+    import os
+    import tempfile
+
+    if isinstance(blocks, dict):
+        blocks[key] = geometry
+        return
+
+    os.makedirs(blocks, exist_ok=True)
+
+    fd, temp_name = tempfile.mkstemp(dir=blocks, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as fileID:
+            fileID.write(geometry)
+        os.replace(temp_name, os.path.join(blocks, f"{key}.mesh2"))
+    except BaseException:
+        os.remove(temp_name)
+        raise
+
+    prune_mesh_cache(blocks, cache_size)
+
+    return
+
+
+def render_isosurface_frames(np_data, cutoffs, header, unit_cell="", 
+        sims=None, output_dir="", frame_name="frame", num_workers=1,
+        field_type="E", dtype=None, colormap="viridis", transmit=0.4,
+        cmap_limits=["a","b"], target_triangles=None, cleanup=False,
+        use_slice=False, cut_at=[[0.5, 1], [0.5, 1], [0, 1]], 
+        subtract_box=True, height=800, width=800, transparent=True, 
+        antialias=True, num_threads=0, render=True):
+    """Render isosurfaces of every simulation in an archive as frames.
+
+    Every simulation becomes one animation frame with the same header
+    (camera) and unit cell, so the frames line up. The frames are 
+    spread over ``num_workers`` processes; each one memory-maps the 
+    archive, reads only its own simulation, calculates the field 
+    magnitude, streams the isosurfaces into its .pov file, and renders
+    it. Frame files are named ``{output_dir}{frame_name}_0000.pov``
+    (and .png), numbered in simulation order, so they can be globbed 
+    straight into a gif.
+
+    Pass the same cmap_limits (not the default) to every frame if the
+    colors should mean the same thing in every frame.
+
+    Args:
+      np_data (str): Name of the .npy archive, indexed by
+          [sim, z_idx, y_idx, h_idx, E/H, (x, y, z)]
+      cutoffs (list): Isosurface values you want rendered
+      header (str): Header and camera, e.g. from 
+          ``write_header_and_camera``
+      unit_cell (str, optional): Unit cell, e.g. from 
+          ``isosurface_unit_cell`` (default "", no unit cell)
+      sims (list, optional): Indices of the simulations to render
+          (default None, all of them)
+      output_dir (str, optional): Prefix for the frame file names,
+          including the trailing "/" (default "")
+      frame_name (str, optional): Frame file name (default "frame")
+      num_workers (int, optional): Number of frames to make at once 
+          (default 1)
+      field_type (str, optional): "E" or "H" (default "E")
+      dtype (numpy dtype, optional): Cast the field to this type, e.g.
+          np.complex64 (default None, keep the stored type)
+      colormap (string, optional): Colormap name, defaults to "viridis"
+      transmit (float, optional): Isosurface transparency (default 0.4)
+      cmap_limits (list, optional): colormap min and max values, 
+          defaults to field extrema if element is a character (set as 
+          ["a", "b"] by default)
+      target_triangles (int, optional): Decimate every isosurface to
+          at most this many triangles (default None, no decimation)
+      cleanup (bool, optional): Weld vertices and remove degenerate 
+          faces (default False)
+      use_slice (bool, optional): Slice the isosurfaces with 
+          ``iter_slice_isosurface`` (default False)
+      cut_at (list, optional): Section to remove when slicing, as a 
+          fraction of the unit cell
+      subtract_box (bool, optional): Difference (True, default) or
+          intersection (False) when slicing
+      height (int, optional): Image height (default 800)
+      width (int, optional): Image width (default 800)
+      transparent (bool, optional): Sets background transparency 
+          (default True)
+      antialias (bool, optional): Turns antialiasing on (default True)
+      num_threads (int, optional): POV-Ray threads per frame, 0 uses
+          all available, split evenly between the workers (default 0)
+      render (bool, optional): Render the frames, otherwise only the
+          .pov files are written (default True)
+
+    Returns:
+      list: One dict per frame, in order, with the simulation index, 
+          file names, and the time (s) spent loading the field, 
+          writing the .pov file, and rendering
+
+    """
+    import os
+    from concurrent.futures import ProcessPoolExecutor
+
+    if sims is None:
+        sims = range(len(np.load(np_data, mmap_mode="r")))
+
+    # Every POV-Ray process would otherwise use all of the cores
+    if num_threads == 0 and num_workers > 1:
+        num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+
+    frame_options = {"np_data": np_data, "header": header, 
+            "unit_cell": unit_cell, "field_type": field_type, 
+            "dtype": dtype, "cutoffs": cutoffs, "colormap": colormap, 
+            "transmit": transmit, "cmap_limits": cmap_limits, 
+            "target_triangles": target_triangles, "cleanup": cleanup,
+            "use_slice": use_slice, "cut_at": cut_at, 
+            "subtract_box": subtract_box, "height": height, 
+            "width": width, "transparent": transparent, 
+            "antialias": antialias, "num_threads": num_threads, 
+            "render": render}
+
+    frame_names = [f"{output_dir}{frame_name}_{i:04d}" 
+            for i in range(len(sims))]
+
+    if num_workers > 1:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            futures = [executor.submit(render_isosurface_frame, sims[i],
+                    frame_names[i], frame_options) 
+                    for i in range(len(sims))]
+            frames = [future.result() for future in futures]
+    else:
+        frames = [render_isosurface_frame(sims[i], frame_names[i], 
+                frame_options) for i in range(len(sims))]
+
+    for i, frame in enumerate(frames):
+        print(f"Frame {i} (simulation {frame['sim']}): "
+              + f"load {frame['load_time']:.2f} s, "
+              + f"write {frame['write_time']:.2f} s, "
+              + f"render {frame['render_time']:.2f} s")
+
+    return frames
+
+
+def render_isosurface_frame(sim, frame_name, frame_options):
+    """Create and render a single frame for ``render_isosurface_frames``.
+
+    Runs in a worker process. Only the simulation that is needed is 
+    read from the memory-mapped archive.
+
+    Args:
+      sim (int): Index of the simulation in the archive
+      frame_name (str): File name of the frame, without extension
+      frame_options (dict): The arguments of 
+          ``render_isosurface_frames``
+
+    Returns:
+      dict: Simulation index, file names, and timing (s) of the frame
+
+    """
+    from copy import deepcopy
+    from itertools import chain
+    from time import perf_counter
+    from povray_pov import write_pov_file, render_pov
+
+    # The mesh functions update the cutoffs and colormap limits in place
+    options = deepcopy(frame_options)
+    pov_name = frame_name + ".pov"
+    image_name = frame_name + ".png"
+
+    start = perf_counter()
+    field_array = np.load(options["np_data"], mmap_mode="r")[sim]
+    field, nx, ny, nz = process_field_component(field_array, 
+            options["field_type"], dtype=options["dtype"])
+    field = calc_field_mag(field)
+    load_time = perf_counter() - start
+
+    start = perf_counter()
+    mesh = iter_mesh2(field, options["cutoffs"], 
+            colormap=options["colormap"], transmit=options["transmit"], 
+            cmap_limits=options["cmap_limits"], 
+            target_triangles=options["target_triangles"], 
+            cleanup=options["cleanup"])
+    if options["use_slice"]:
+        mesh = iter_slice_isosurface(mesh, [nx, ny, nz], 
+                cut_at=options["cut_at"], 
+                subtract_box=options["subtract_box"])
+    write_pov_file(pov_name, chain([options["header"]], mesh, 
+            [options["unit_cell"]]))
+    write_time = perf_counter() - start
+
+    start = perf_counter()
+    render_pov(pov_name, image_name, height=options["height"], 
+            width=options["width"], transparent=options["transparent"],
+            antialias=options["antialias"], 
+            num_threads=options["num_threads"], open_image=False, 
+            render=options["render"])
+    render_time = perf_counter() - start
+
+    return {"sim": sim, "pov_name": pov_name, "image_name": image_name,
+            "load_time": load_time, "write_time": write_time, 
+            "render_time": render_time}
+
+
+def create_mesh2_tiled(field, cutoffs, num_UC_x=2, num_UC_y=2, 
+        colormap="viridis", transmit=0.4, cmap_limits=["a","b"], 
+        output=None, cleanup=False, weld_tolerance=1e-4, 
+        field_range=None, object_name="IsoCell", mesher="auto"):
+    """Create isosurfaces tiled over several unit cells.
+
+    The field is treated as periodic in x and y, so the isosurfaces of
+    neighboring cells meet exactly, and they span the whole unit cell
+    (nx by ny grid units) instead of stopping one grid point short. 
+    The isosurfaces are written once as a ``#declare``d object and 
+    then placed in every cell, so POV-Ray only parses a single copy 
+    no matter how many cells there are.
+
+    Cells are arranged like ``create_device`` arranges its unit cells,
+    with the original cell at the origin and the others spread around
+    it, and are assumed to be rectangular.
+
+    Args:
+      field (numpy array): Field values of one unit cell, periodic in
+          x and y
+      cutoffs (list): Isosurface values you want rendered
+      num_UC_x (int, optional): Number of unit cells in the x direction
+          (default 2)
+      num_UC_y (int, optional): Number of unit cells in the y direction
+          (default 2)
+      colormap (string, optional): Colormap name, defaults to "viridis"
+      transmit (float, optional): Isosurface transparency (default 0.4)
+      cmap_limits (list, optional): colormap min and max values, 
+          defaults to field extrema if element is a character (set as 
+          ["a", "b"] by default)
+      output (file, optional): Open file (or any object with a write
+          method) that the mesh is written to (default None, return
+          the mesh as a string)
+      cleanup (bool, optional): Weld vertices and remove degenerate 
+          faces before output (default False)
+      weld_tolerance (float, optional): Vertices closer than this (in
+          grid units) are welded by the cleanup (default 1e-4)
+      field_range (list, optional): Minimum and maximum of the field
+          (default None, read from the field)
+      object_name (str, optional): Name of the declared isosurface 
+          object (default "IsoCell")
+      mesher (str, optional): Meshing backend, see ``find_mesher`` 
+          (default "auto")
+
+    Returns:
+      string: Declared isosurfaces and their copies, empty if 
+          ``output`` is given
+
+    """
+    mesh_chunks = iter_mesh2_tiled(field, cutoffs, num_UC_x=num_UC_x,
+            num_UC_y=num_UC_y, colormap=colormap, transmit=transmit, 
+            cmap_limits=cmap_limits, cleanup=cleanup, 
+            weld_tolerance=weld_tolerance, field_range=field_range, 
+            object_name=object_name, mesher=mesher)
+
+    if output is None:
+        return "".join(mesh_chunks)
+
+    for chunk in mesh_chunks:
+        output.write(chunk)
+
+    return ""
+
+
+def iter_mesh2_tiled(field, cutoffs, num_UC_x=2, num_UC_y=2, 
+        colormap="viridis", transmit=0.4, cmap_limits=["a","b"], 
+        cleanup=False, weld_tolerance=1e-4, field_range=None, 
+        object_name="IsoCell", mesher="auto"):
+    """Generate the output of ``create_mesh2_tiled`` in chunks.
+
+    Takes the same arguments as ``create_mesh2_tiled``.
+
+    Args:
+      field (numpy array): Field values of one unit cell, periodic in
+          x and y
+      cutoffs (list): Isosurface values you want rendered
+      num_UC_x (int, optional): Number of unit cells in the x direction
+          (default 2)
+      num_UC_y (int, optional): Number of unit cells in the y direction
+          (default 2)
+      colormap (string, optional): Colormap name, defaults to "viridis"
+      transmit (float, optional): Isosurface transparency (default 0.4)
+      cmap_limits (list, optional): colormap min and max values, 
+          defaults to field extrema if element is a character (set as 
+          ["a", "b"] by default)
+      cleanup (bool, optional): Weld vertices and remove degenerate 
+          faces before output (default False)
+      weld_tolerance (float, optional): Vertices closer than this (in
+          grid units) are welded by the cleanup (default 1e-4)
+      field_range (list, optional): Minimum and maximum of the field
+          (default None, read from the field)
+      object_name (str, optional): Name of the declared isosurface 
+          object (default "IsoCell")
+      mesher (str, optional): Meshing backend, see ``find_mesher`` 
+          (default "auto")
+
+    Yields:
+      string: Consecutive pieces of the output
+
+    """
+    nx, ny, nz = field.shape
+
+    if field_range is None:
+        field_range = [np.amin(field), np.amax(field)]
+
+    cutoffs = clamp_cutoffs(cutoffs, field_range[0], field_range[1])
+    colors = isosurface_colors(cutoffs, colormap, cmap_limits)
+
+    yield f"\n#declare {object_name} = "
+
+    # Need to use union if more than one isosurface
+    if len(cutoffs) > 1:
+        yield f"\nunion {{"
+
+    for i in range(len(cutoffs)):
+        print(f"Isosurface value: {cutoffs[i]}")
+        print(f"Color: {colors[i]}\n")
+
+        corners, faces, normals, values = postprocess_mesh(
+                mesh_isosurface_periodic(field, cutoffs[i], mesher=mesher),
+                cutoffs[i], cleanup=cleanup, weld_tolerance=weld_tolerance)
+
+        yield from iter_mesh2_object(corners, faces, normals, colors[i],
+                transmit)
+        del corners, faces, normals, values
+
+    # End union
+    if len(cutoffs) > 1:
+        yield f"\n}}\n\n"
+    else:
+        yield f"\n\n"
+
+    # Same arrangement as the unit cells in create_device
+    adj_x = int(0.5 * (num_UC_x - (1 + (num_UC_x - 1) % 2)))
+    adj_y = int(0.5 * (num_UC_y - (1 + (num_UC_y - 1) % 2)))
+
+    # Union, so the tiles can still be sliced as a single object
+    if num_UC_x * num_UC_y > 1:
+        yield f"union {{\n\t"
+
+    for i in range(num_UC_x):
+        for j in range(num_UC_y):
+            translate_x = (i - adj_x) * nx
+            translate_y = (j - adj_y) * ny
+            yield (f"object {{ {object_name} translate "
+                    + f"<{translate_x}, {translate_y}, 0> }}\n\t")
+
+    if num_UC_x * num_UC_y > 1:
+        yield f"}}\n\n"
+
+
+def mesh_isosurface_periodic(field, cutoff, mesher="auto"):
+    """Run marching cubes on a field that is periodic in x and y.
+
+    The field is wrapped around by a couple of grid points in x and y
+    before meshing, so the isosurface closes the gap between the last
+    and the first grid point, and the normals at the cell edges are 
+    calculated from the neighboring cell. The extra cells are then
+    cropped off. The resulting isosurface spans [0, nx] by [0, ny], 
+    and the vertices and normals on opposite edges match exactly, so
+    copies shifted by nx or ny join without seams.
+
+    Args:
+      field (numpy array): Field values, periodic in x and y
+      cutoff (float): Isosurface value
+      mesher (str, optional): Meshing backend, see ``find_mesher`` 
+          (default "auto")
+
+    Returns:
+      tuple: corners, faces, normals, and values
+
+    """
+    nx, ny, nz = field.shape
+
+    # One ghost layer before, the closing layer and a ghost layer after
+    padded = np.pad(field, ((1, 2), (1, 2), (0, 0)), mode="wrap")
+    mesh = mesh_isosurface(padded, cutoff, mesher=mesher)
+    del padded
+
+    corners, faces, normals, values = crop_mesh_to_cells(*mesh, 
+            lower=[1, 1, None], upper=[nx + 1, ny + 1, None])
+    corners[:, :2] -= 1
+
+    return corners, faces, normals, values
+
+
+def create_mesh2_symmetric(field, cutoffs, symmetry="auto", 
+        colormap="viridis", transmit=0.4, cmap_limits=["a","b"], 
+        output=None, cleanup=False, weld_tolerance=1e-4, 
+        field_range=None, tolerance=1e-3, object_name="IsoDomain", 
+        mesher="auto"):
+    """Create isosurfaces of a symmetric field from a part of it.
+
+    Only the fundamental domain of the field is meshed (see 
+    ``mesh_fundamental_domain``) and written once as a ``#declare``d 
+    object, which is then placed with mirror transformations to fill 
+    the whole field. A field with mirror symmetry in x and y and 
+    diagonal symmetry (e.g. a circular silo on a square lattice) is 
+    meshed about four times faster, and writes an eighth of the mesh2
+    text.
+
+    The symmetries are:
+      * "x": mirror symmetry across the plane x = (nx - 1) / 2
+      * "y": mirror symmetry across the plane y = (ny - 1) / 2
+      * "xy": symmetry under swapping x and y (needs nx == ny)
+    
+    All three together give the full symmetry of a square (C4 with 
+    mirrors). With "auto", the symmetries are found with 
+    ``detect_symmetry``.
+
+    Args:
+      field (numpy array): Field values to turn into isosurface
+      cutoffs (list): Isosurface values you want rendered
+      symmetry (str or list, optional): "auto", a single symmetry, or 
+          a list of the symmetries of the field (default "auto")
+      colormap (string, optional): Colormap name, defaults to "viridis"
+      transmit (float, optional): Isosurface transparency (default 0.4)
+      cmap_limits (list, optional): colormap min and max values, 
+          defaults to field extrema if element is a character (set as 
+          ["a", "b"] by default)
+      output (file, optional): Open file (or any object with a write
+          method) that the mesh is written to (default None, return
+          the mesh as a string)
+      cleanup (bool, optional): Weld vertices and remove degenerate 
+          faces before output (default False)
+      weld_tolerance (float, optional): Vertices closer than this (in
+          grid units) are welded by the cleanup (default 1e-4)
+      field_range (list, optional): Minimum and maximum of the field
+          (default None, read from the field)
+      tolerance (float, optional): Relative tolerance of 
+          ``detect_symmetry`` (default 1e-3)
+      object_name (str, optional): Name of the declared isosurface 
+          object (default "IsoDomain")
+      mesher (str, optional): Meshing backend, see ``find_mesher`` 
+          (default "auto")
+
+    Returns:
+      string: Declared isosurfaces and their mirror images, empty if 
+          ``output`` is given
+
+    """
+    mesh_chunks = iter_mesh2_symmetric(field, cutoffs, symmetry=symmetry,
+            colormap=colormap, transmit=transmit, cmap_limits=cmap_limits,
+            cleanup=cleanup, weld_tolerance=weld_tolerance, 
+            field_range=field_range, tolerance=tolerance, 
+            object_name=object_name, mesher=mesher)
+
+    if output is None:
+        return "".join(mesh_chunks)
+
+    for chunk in mesh_chunks:
+        output.write(chunk)
+
+    return ""
+
+
+def iter_mesh2_symmetric(field, cutoffs, symmetry="auto", 
+        colormap="viridis", transmit=0.4, cmap_limits=["a","b"], 
+        cleanup=False, weld_tolerance=1e-4, field_range=None, 
+        tolerance=1e-3, object_name="IsoDomain", mesher="auto"):
+    """Generate the output of ``create_mesh2_symmetric`` in chunks.
+
+    Takes the same arguments as ``create_mesh2_symmetric``.
+
+    Args:
+      field (numpy array): Field values to turn into isosurface
+      cutoffs (list): Isosurface values you want rendered
+      symmetry (str or list, optional): "auto", a single symmetry, or 
+          a list of the symmetries of the field (default "auto")
+      colormap (string, optional): Colormap name, defaults to "viridis"
+      transmit (float, optional): Isosurface transparency (default 0.4)
+      cmap_limits (list, optional): colormap min and max values, 
+          defaults to field extrema if element is a character (set as 
+          ["a", "b"] by default)
+      cleanup (bool, optional): Weld vertices and remove degenerate 
+          faces before output (default False)
+      weld_tolerance (float, optional): Vertices closer than this (in
+          grid units) are welded by the cleanup (default 1e-4)
+      field_range (list, optional): Minimum and maximum of the field
+          (default None, read from the field)
+      tolerance (float, optional): Relative tolerance of 
+          ``detect_symmetry`` (default 1e-3)
+      object_name (str, optional): Name of the declared isosurface 
+          object (default "IsoDomain")
+      mesher (str, optional): Meshing backend, see ``find_mesher`` 
+          (default "auto")
+
+    Yields:
+      string: Consecutive pieces of the output
+
+    Raises:
+      ValueError: Unknown symmetry
+
+    """
+    if symmetry == "auto":
+        symmetry = detect_symmetry(field, tolerance=tolerance)
+    elif isinstance(symmetry, str):
+        symmetry = [symmetry]
+
+    for name in symmetry:
+        if name not in ["x", "y", "xy"]:
+            raise ValueError(f"Unknown symmetry '{name}'")
+    print(f"Symmetry: {', '.join(symmetry) if symmetry else 'none'}\n")
+
+    if field_range is None:
+        field_range = [np.amin(field), np.amax(field)]
+
+    cutoffs = clamp_cutoffs(cutoffs, field_range[0], field_range[1])
+    colors = isosurface_colors(cutoffs, colormap, cmap_limits)
+
+    yield f"\n#declare {object_name} = "
+
+    # Need to use union if more than one isosurface
+    if len(cutoffs) > 1:
+        yield f"\nunion {{"
+
+    for i in range(len(cutoffs)):
+        print(f"Isosurface value: {cutoffs[i]}")
+        print(f"Color: {colors[i]}\n")
+
+        corners, faces, normals, values = postprocess_mesh(
+                mesh_fundamental_domain(field, cutoffs[i], symmetry, mesher),
+                cutoffs[i], cleanup=cleanup, weld_tolerance=weld_tolerance)
+
+        yield from iter_mesh2_object(corners, faces, normals, colors[i],
+                transmit)
+        del corners, faces, normals, values
+
+    # End union
+    if len(cutoffs) > 1:
+        yield f"\n}}\n\n"
+    else:
+        yield f"\n\n"
+
+    transforms = symmetry_transforms(field.shape, symmetry)
+
+    # Union, so the copies can still be sliced as a single object
+    if len(transforms) > 1:
+        yield f"union {{\n\t"
+
+    for transform in transforms:
+        yield f"object {{ {object_name}{transform} }}\n\t"
+
+    if len(transforms) > 1:
+        yield f"}}\n\n"
+
+
+def detect_symmetry(field, tolerance=1e-3, chunk_size=64):
+    """Find the mirror symmetries of a field.
+
+    Tests the symmetries used by ``create_mesh2_symmetric``: mirror 
+    symmetry in x and y, and symmetry under swapping x and y. The 
+    field is compared with its mirror image a z-block at a time.
+
+    Args:
+      field (numpy array): Field values
+      tolerance (float, optional): Largest difference between the 
+          field and its mirror image, relative to the largest field
+          magnitude (default 1e-3)
+      chunk_size (int, optional): Number of z planes compared at once
+          (default 64)
+
+    Returns:
+      list: The symmetries found, out of "x", "y", and "xy"
+
+    """
+    nx, ny, nz = field.shape
+
+    candidates = {"x": lambda block: block[::-1, :, :], 
+            "y": lambda block: block[:, ::-1, :]}
+    if nx == ny:
+        candidates["xy"] = lambda block: block.transpose(1, 0, 2)
+
+    limit = tolerance * np.amax(np.abs(field))
+    symmetry = []
+    for name, mirror in candidates.items():
+        for z_start in range(0, nz, chunk_size):
+            block = field[:, :, z_start:z_start + chunk_size]
+            if np.amax(np.abs(block - mirror(block))) > limit:
+                break
+        else:
+            symmetry.append(name)
+
+    return symmetry
+
+
+def mesh_fundamental_domain(field, cutoff, symmetry, mesher="auto"):
+    """Mesh the part of a symmetric field its mirror images don't cover.
+
+    With "x" the domain is x <= (nx - 1) / 2, with "y" it is 
+    y <= (ny - 1) / 2, and with "xy" it is y <= x. Marching cubes only
+    runs on the cells of the x and y halves (see ``mesh_cell_boxes``),
+    and the mesh is then cut exactly at the mirror planes 
+    (``split_mesh``), so that the mirror images meet without gaps.
+
+    Args:
+      field (numpy array): Field values
+      cutoff (float): Isosurface value
+      symmetry (list): Symmetries of the field, see 
+          ``create_mesh2_symmetric``
+      mesher (str, optional): Meshing backend, see ``find_mesher`` 
+          (default "auto")
+
+    Returns:
+      tuple: corners, faces, normals, and values
+
+    Raises:
+      ValueError: "xy" symmetry needs nx == ny
+
+    """
+    nx, ny, nz = field.shape
+    if "xy" in symmetry and nx != ny:
+        raise ValueError("xy symmetry needs a square field (nx == ny)")
+
+    center = [(nx - 1) / 2, (ny - 1) / 2]
+    last = [nx - 1, ny - 1, nz - 1]
+    for axis, name in enumerate(["x", "y"]):
+        if name in symmetry:
+            last[axis] = int(np.ceil(center[axis]))
+
+    if last == [nx - 1, ny - 1, nz - 1]:
+        mesh = mesh_isosurface(field, cutoff, mesher=mesher)
+    else:
+        mesh = mesh_isosurface(field, cutoff, roi=[[[0, 0, 0], last]],
+                mesher=mesher)
+
+    # Signed distance to every mirror plane, positive on the side to drop
+    planes = []
+    for axis, name in enumerate(["x", "y"]):
+        if name in symmetry:
+            planes.append(lambda corners, axis=axis: 
+                    corners[:, axis] - center[axis])
+    if "xy" in symmetry:
+        planes.append(lambda corners: corners[:, 1] - corners[:, 0])
+
+    corners, faces, normals, values = mesh
+    for plane in planes:
+        corners, faces, normals, values, distance = split_mesh(corners,
+                faces, normals, values, plane(corners))
+
+        # Every face is now on one side of the plane
+        keep = np.amax(distance[faces], axis=1) <= 0
+        corners, faces, normals, values = remove_unused_vertices(corners,
+                faces[keep], normals, values)
+
+    return corners, faces, normals, values
+
+
+def symmetry_transforms(shape, symmetry):
+    """POV-Ray transformations placing the copies of a fundamental domain.
+
+    Args:
+      shape (tuple): Shape of the field, [nx, ny, nz]
+      symmetry (list): Symmetries of the field, see 
+          ``create_mesh2_symmetric``
+
+    Returns:
+      list: One transformation string per copy, starting with the 
+          untransformed domain ("")
+
+    """
+    nx, ny, nz = shape
+
+    # Swap x and y first, then mirror the result in x and in y
+    transforms = [""]
+    if "xy" in symmetry:
+        transforms += [" matrix <0, 1, 0, 1, 0, 0, 0, 0, 1, 0, 0, 0>"]
+    if "x" in symmetry:
+        mirror = f" scale <-1, 1, 1> translate <{nx - 1}, 0, 0>"
+        transforms += [transform + mirror for transform in transforms]
+    if "y" in symmetry:
+        mirror = f" scale <1, -1, 1> translate <0, {ny - 1}, 0>"
+        transforms += [transform + mirror for transform in transforms]
+
+    return transforms
+
+
+def create_mesh2_colored(field, cutoffs, color_field, colormap="viridis",
+        transmit=0.4, cmap_limits=["a","b"], num_colors=64, output=None,
+        target_triangles=None, decimate_tolerance=None, cleanup=False,
+        weld_tolerance=1e-4, field_range=None, mesher="auto"):
+    """Create isosurfaces colored by a second field.
+
+    Instead of one flat color per isosurface, every vertex is colored
+    by the value of ``color_field`` there (e.g. |H| on an isosurface 
+    of |E|), and POV-Ray blends the colors across each triangle. A 
+    single isosurface then shows the variation that otherwise takes 
+    several nested shells. 
+
+    The color field is interpolated at the vertices 
+    (``interpolate_field``) and quantized to ``num_colors`` colors of
+    the colormap (``vertex_texture_indices``). Only the colors that 
+    are used end up in the mesh2 texture_list.
+
+    Args:
+      field (numpy array): Field values to turn into isosurface
+      cutoffs (list): Isosurface values you want rendered
+      color_field (numpy array): Field values used for the colors, 
+          same shape as ``field``
+      colormap (string, optional): Colormap name, defaults to "viridis"
+      transmit (float, optional): Isosurface transparency (default 0.4)
+      cmap_limits (list, optional): Color field values at the ends of
+          the colormap, defaults to the color field extrema if element
+          is a character (set as ["a", "b"] by default)
+      num_colors (int, optional): Number of colors the color field is 
+          quantized to (default 64)
+      output (file, optional): Open file (or any object with a write
+          method) that the mesh is written to (default None, return
+          the mesh as a string)
+      target_triangles (int, optional): Decimate every isosurface to
+          at most this many triangles (default None, no decimation)
+      decimate_tolerance (float, optional): Decimate every isosurface,
+          merging vertices closer than roughly this distance (in grid
+          units) (default None, no decimation)
+      cleanup (bool, optional): Weld vertices and remove degenerate 
+          faces before output (default False)
+      weld_tolerance (float, optional): Vertices closer than this (in
+          grid units) are welded by the cleanup (default 1e-4)
+      field_range (list, optional): Minimum and maximum of the field
+          (default None, read from the field)
+      mesher (str, optional): Meshing backend, see ``find_mesher`` 
+          (default "auto")
+
+    Returns:
+      string: mesh2 object as a string, empty if ``output`` is given
+
+    """
+    mesh_chunks = iter_mesh2_colored(field, cutoffs, color_field, 
+            colormap=colormap, transmit=transmit, cmap_limits=cmap_limits,
+            num_colors=num_colors, target_triangles=target_triangles,
+            decimate_tolerance=decimate_tolerance, cleanup=cleanup,
+            weld_tolerance=weld_tolerance, field_range=field_range, 
+            mesher=mesher)
+
+    if output is None:
+        return "".join(mesh_chunks)
+
+    for chunk in mesh_chunks:
+        output.write(chunk)
+
+    return ""
+
+
+def iter_mesh2_colored(field, cutoffs, color_field, colormap="viridis",
+        transmit=0.4, cmap_limits=["a","b"], num_colors=64, 
+        target_triangles=None, decimate_tolerance=None, cleanup=False,
+        weld_tolerance=1e-4, field_range=None, mesher="auto"):
+    """Generate the output of ``create_mesh2_colored`` in chunks.
+
+    Takes the same arguments as ``create_mesh2_colored``.
+
+    Args:
+      field (numpy array): Field values to turn into isosurface
+      cutoffs (list): Isosurface values you want rendered
+      color_field (numpy array): Field values used for the colors, 
+          same shape as ``field``
+      colormap (string, optional): Colormap name, defaults to "viridis"
+      transmit (float, optional): Isosurface transparency (default 0.4)
+      cmap_limits (list, optional): Color field values at the ends of
+          the colormap, defaults to the color field extrema if element
+          is a character (set as ["a", "b"] by default)
+      num_colors (int, optional): Number of colors the color field is 
+          quantized to (default 64)
+      target_triangles (int, optional): Decimate every isosurface to
+          at most this many triangles (default None, no decimation)
+      decimate_tolerance (float, optional): Decimate every isosurface,
+          merging vertices closer than roughly this distance (in grid
+          units) (default None, no decimation)
+      cleanup (bool, optional): Weld vertices and remove degenerate 
+          faces before output (default False)
+      weld_tolerance (float, optional): Vertices closer than this (in
+          grid units) are welded by the cleanup (default 1e-4)
+      field_range (list, optional): Minimum and maximum of the field
+          (default None, read from the field)
+      mesher (str, optional): Meshing backend, see ``find_mesher`` 
+          (default "auto")
+
+    Yields:
+      string: Consecutive pieces of the mesh2 string
+
+    Raises:
+      ValueError: The color field must have the same shape as the field
+
+    """
+    import pylab
+
+    if color_field.shape != field.shape:
+        raise ValueError("color_field must have the same shape as field")
+
+    if field_range is None:
+        field_range = [np.amin(field), np.amax(field)]
+
+    cutoffs = clamp_cutoffs(cutoffs, field_range[0], field_range[1])
+
+    # Don't fill in the shared default list
+    cmap_limits = list(cmap_limits)
+    if isinstance(cmap_limits[0], str):
+        cmap_limits[0] = np.amin(color_field)
+    if isinstance(cmap_limits[1], str):
+        cmap_limits[1] = np.amax(color_field)
+
+    cm = pylab.get_cmap(colormap)
+    colors = cm(np.linspace(0, 1, num_colors))
+
+    # Need to use union if more than one isosurface
+    if len(cutoffs) > 1:
+        yield f"\nunion {{"
+
+    for i in range(len(cutoffs)):
+        print(f"Isosurface value: {cutoffs[i]}")
+        print(f"Colored by: {cmap_limits[0]} - {cmap_limits[1]}\n")
+
+        corners, faces, normals, values = postprocess_mesh(
+                mesh_isosurface(field, cutoffs[i], mesher=mesher), 
+                cutoffs[i], target_triangles=target_triangles, 
+                decimate_tolerance=decimate_tolerance, cleanup=cleanup,
+                weld_tolerance=weld_tolerance)
+
+        textures = vertex_texture_indices(color_field, corners, 
+                cmap_limits, num_colors)
+
+        # Only keep the colors in use, renumbered from 0
+        used, textures = np.unique(textures, return_inverse=True)
+
+        yield from iter_mesh2_textured_object(corners, faces, normals,
+                colors[used], transmit, textures)
+        del corners, faces, normals, values, textures
+
+    # End union
+    if len(cutoffs) > 1:
+        yield f"\n}}\n\n"
+    else:
+        yield f"\n\n"
+
+
+def vertex_texture_indices(color_field, corners, cmap_limits, 
+        num_colors=64):
+    """Quantize the color field at the vertices of a mesh.
+
+    Args:
+      color_field (numpy array): Field values used for the colors
+      corners (numpy array): Coordinates of each vertex
+      cmap_limits (list): Color field values of the first and the last
+          color
+      num_colors (int, optional): Number of colors (default 64)
+
+    Returns:
+      numpy array: Color index (0 to num_colors - 1) of every vertex
+
+    """
+    values = interpolate_field(color_field, corners)
+
+    scale = (num_colors - 1) / max(cmap_limits[1] - cmap_limits[0], 
+            np.finfo(np.float64).tiny)
+    indices = np.rint((values - cmap_limits[0]) * scale)
+
+    return np.clip(indices, 0, num_colors - 1).astype(np.int64)
+
+
+def create_mesh2_chunked(field_array, cutoffs, chunk_size=64, 
+        field_type="E", center=True, colormap="viridis", transmit=0.4,
+        cmap_limits=["a","b"], field_range=None, output=None, 
+        target_triangles=None, decimate_tolerance=None, dtype=None, 
+        mesher="auto"):
+    """Create field magnitude isosurfaces without loading the field.
+
+    Out-of-core version of ``create_mesh2`` for fields that don't fit 
+    in memory. Takes the raw simulation array instead of a processed 
+    field, ideally memory-mapped, e.g. 
+    ``np.load(np_data, mmap_mode="r")[sim_index]``. The array is read
+    in blocks of ``chunk_size`` grid cells along z; each block is 
+    processed like ``process_field_array`` would, converted to the 
+    field magnitude, and meshed. Neighboring blocks share one layer of
+    grid points (plus one ghost layer for the normals), and the seams
+    are welded afterwards, so the isosurfaces are continuous.
+
+    Peak memory is set by ``chunk_size`` and the size of the resulting
+    meshes, not the size of the field.
+
+    Finding the field extrema requires an extra pass over the whole 
+    file. Pass ``field_range`` if you already know them.
+
+    Args:
+      field_array (numpy array): Raw simulation output array indexed
+          by [z_idx, y_idx, h_idx, E/H, (x, y, z)]
+      cutoffs (list): Isosurface values you want rendered
+      chunk_size (int, optional): Number of grid cells along z meshed
+          at once (default 64)
+      field_type (str, optional): "E" or "H" (default "E")
+      center (bool, optional): whether to move the origin to the center
+          (default True)
+      colormap (string, optional): Colormap name, defaults to "viridis"
+      transmit (float, optional): Isosurface transparency (default 0.4)
+      cmap_limits (list, optional): colormap min and max values, 
+          defaults to field extrema if element is a character (set as 
+          ["a", "b"] by default)
+      field_range (list, optional): Minimum and maximum of the field
+          magnitude (default None, read from the field)
+      output (file, optional): Open file (or any object with a write
+          method) that the mesh is written to (default None, return
+          the mesh as a string)
+      target_triangles (int, optional): Decimate every isosurface to
+          at most this many triangles (default None, no decimation)
+      decimate_tolerance (float, optional): Decimate every isosurface,
+          merging vertices closer than roughly this distance (in grid
+          units) (default None, no decimation)
+      dtype (numpy dtype, optional): Cast the field to this type as it
+          is read, e.g. np.complex64 for single precision (default None,
+          keep the stored type)
+      mesher (str, optional): Meshing backend, see ``find_mesher`` 
+          (default "auto")
+
+    Returns:
+      string: mesh2 object as a string, empty if ``output`` is given
+
+    """
+    mesh_chunks = iter_mesh2_chunked(field_array, cutoffs, 
+            chunk_size=chunk_size, field_type=field_type, center=center,
+            colormap=colormap, transmit=transmit, cmap_limits=cmap_limits,
+            field_range=field_range, target_triangles=target_triangles,
+            decimate_tolerance=decimate_tolerance, dtype=dtype, 
+            mesher=mesher)
+
+    if output is None:
+        return "".join(mesh_chunks)
+
+    for chunk in mesh_chunks:
+        output.write(chunk)
+
+    return ""
+
+
+def iter_mesh2_chunked(field_array, cutoffs, chunk_size=64, 
+        field_type="E", center=True, colormap="viridis", transmit=0.4,
+        cmap_limits=["a","b"], field_range=None, target_triangles=None,
+        decimate_tolerance=None, dtype=None, mesher="auto"):
+    """Generate the output of ``create_mesh2_chunked`` in chunks.
+
+    Takes the same arguments as ``create_mesh2_chunked``. All blocks
+    are meshed before the first isosurface is output.
+
+    Args:
+      field_array (numpy array): Raw simulation output array indexed
+          by [z_idx, y_idx, h_idx, E/H, (x, y, z)]
+      cutoffs (list): Isosurface values you want rendered
+      chunk_size (int, optional): Number of grid cells along z meshed
+          at once (default 64)
+      field_type (str, optional): "E" or "H" (default "E")
+      center (bool, optional): whether to move the origin to the center
+          (default True)
+      colormap (string, optional): Colormap name, defaults to "viridis"
+      transmit (float, optional): Isosurface transparency (default 0.4)
+      cmap_limits (list, optional): colormap min and max values, 
+          defaults to field extrema if element is a character (set as 
+          ["a", "b"] by default)
+      field_range (list, optional): Minimum and maximum of the field
+          magnitude (default None, read from the field)
+      target_triangles (int, optional): Decimate every isosurface to
+          at most this many triangles (default None, no decimation)
+      decimate_tolerance (float, optional): Decimate every isosurface,
+          merging vertices closer than roughly this distance (in grid
+          units) (default None, no decimation)
+      dtype (numpy dtype, optional): Cast the field to this type as it
+          is read, e.g. np.complex64 for single precision (default None,
+          keep the stored type)
+      mesher (str, optional): Meshing backend, see ``find_mesher`` 
+          (default "auto")
+
+    Yields:
+      string: Consecutive pieces of the mesh2 string
+
+    """
+    if field_range is None:
+        field_range = [np.inf, -np.inf]
+        for block, start, stop, offset in iter_field_blocks(field_array,
+                chunk_size, field_type=field_type, center=center, dtype=dtype):
+            field_range[0] = min(field_range[0], np.amin(block))
+            field_range[1] = max(field_range[1], np.amax(block))
+
+    cutoffs = clamp_cutoffs(cutoffs, field_range[0], field_range[1])
+    colors = isosurface_colors(cutoffs, colormap, cmap_limits)
+
+    # Mesh every block, reading each block only once
+    pieces = [[] for i in range(len(cutoffs))]
+    for block, start, stop, offset in iter_field_blocks(field_array,
+            chunk_size, field_type=field_type, center=center, dtype=dtype):
+        block_min = np.amin(block)
+        block_max = np.amax(block)
+
+        for i in range(len(cutoffs)):
+            # No isosurface in this block
+            if not block_min < cutoffs[i] < block_max:
+                continue
+
+            corners, faces, normals, values = mesh_isosurface(block, 
+                    cutoffs[i], mesher=mesher)
+
+            # Only keep the cells that belong to this block, the rest 
+            # are ghost cells meshed by the neighboring blocks
+            corners, faces, normals, values = crop_mesh_to_cells(corners,
+                    faces, normals, values, 
+                    lower=[None, None, start - offset],
+                    upper=[None, None, stop - offset])
+            corners[:, 2] += offset
+
+            pieces[i].append([corners, faces, normals, values])
+
+        del block
+
+    if len(cutoffs) > 1:
+        yield f"\nunion {{"
+
+    for i in range(len(cutoffs)):
+        mesh = merge_meshes(pieces[i])
+        pieces[i] = None
+
+        # Weld the seams between blocks
+        mesh = clean_mesh(*mesh)
+        corners, faces, normals, values = postprocess_mesh(mesh, 
+                cutoffs[i], target_triangles=target_triangles,
+                decimate_tolerance=decimate_tolerance)
+        del mesh
+
+        print(f"Isosurface value: {cutoffs[i]}")
+        print(f"Color: {colors[i]}\n")
+
+        yield from iter_mesh2_object(corners, faces, normals, colors[i],
+                transmit)
+
+    if len(cutoffs) > 1:
+        yield f"\n}}\n\n"
+
+
+def iter_field_blocks(field_array, chunk_size=64, field_type="E", 
+        center=True, dtype=None):
+    """Read the field magnitude from a raw array one z-block at a time.
+
+    Each block covers ``chunk_size`` grid cells along z, plus the grid
+    points needed to mesh them: the shared layer at the top of the 
+    block and one ghost layer on either side (for the normals).
+
+    Args:
+      field_array (numpy array): Raw simulation output array indexed
+          by [z_idx, y_idx, h_idx, E/H, (x, y, z)]
+      chunk_size (int, optional): Number of grid cells along z per 
+          block (default 64)
+      field_type (str, optional): "E" or "H" (default "E")
+      center (bool, optional): whether to move the origin to the center
+          (default True)
+      dtype (numpy dtype, optional): Cast the field to this type as it
+          is read, e.g. np.complex64 for single precision (default None,
+          keep the stored type)
+
+    Yields:
+      tuple: Field magnitude of the block as [x, y, z], the first and
+          last+1 grid cell (in z) that the block is responsible for, and
+          the z index of the first layer of the block
+
+    """
+    nz = field_array.shape[0]
+    num_cells = nz - 1
+    chunk_size = max(1, chunk_size)
+
+    for start in range(0, max(1, num_cells), chunk_size):
+        stop = min(num_cells, start + chunk_size)
+        first = max(0, start - 1)
+        last = min(nz, stop + 2)
+
+        block = read_field_block(field_array, first, last, 
+                field_type=field_type, center=center, dtype=dtype)
+        yield calc_field_mag(block), start, stop, first
+
+
+def read_field_block(field_array, z_start, z_stop, field_type="E", 
+        center=True, component=None, dtype=None):
+    """Read a range of z-layers from a raw simulation array.
+
+    Gives the same result as ``process_field_array`` followed by 
+    ``extract_e_field`` (or ``extract_h_field``) and slicing z, but 
+    only reads the requested layers, so it works on memory-mapped 
+    arrays that are larger than the available memory.
+
+    Everything except the centering is done with views, and the 
+    requested field (and component) is selected first, so only the
+    data that is returned is ever copied.
+
+    Args:
+      field_array (numpy array): Raw simulation output array indexed
+          by [z_idx, y_idx, h_idx, E/H, (x, y, z)]
+      z_start (int): First z index (after processing) to read
+      z_stop (int): Last+1 z index (after processing) to read
+      field_type (str, optional): "E" or "H" (default "E")
+      center (bool, optional): whether to move the origin to the center
+          (default True)
+      component (int, optional): Only return this vector component 
+          (0, 1, 2 for x, y, z) of the field (default None, all three)
+      dtype (numpy dtype, optional): Cast the field to this type as it
+          is read, e.g. np.complex64 for single precision (default None,
+          keep the stored type)
+
+    Returns:
+      np.array: Electric or magnetic field indexed by [x, y, z, (x,y,z)],
+          or by [x, y, z] if ``component`` is given
+
+    Raises:
+      RuntimeError: The input array must be 5D
+
+    """
+    if field_array.ndim != 5:
+        raise RuntimeError("field_array must be 5D")
+
+    index = {"E": 0, "H": 1}[field_type]
+    nz = field_array.shape[0]
+    if component is None:
+        component = slice(None)
+
+    # process_field_array reverses z, so the requested layers are at the
+    # other end of the raw array
+    block = field_array[(nz - z_stop):(nz - z_start), :, :, index, 
+            component]
+    block = np.asarray(block)[::-1]
+
+    # Swap the z, x axes so that we end up with [x, y, z, ...]
+    block = block.swapaxes(0, 2)
+    nx, ny = block.shape[:2]
+
+    if center:
+        block = double_roll(block, nx//2, ny//2, dtype=dtype)
+    elif dtype is not None:
+        block = block.astype(dtype)
+    return block
+
+
+def crop_mesh_to_cells(corners, faces, normals, values, lower, upper):
+    """Keep the faces that lie within a range of grid cells.
+
+    Every marching cubes face lies within a single grid cell; the cell
+    is found from the face centroid. Faces in cells outside 
+    [lower, upper) are dropped, as are the vertices they leave unused.
+
+    Args:
+      corners (numpy array): Coordinates of each vertex
+      faces (numpy array): Vertex indices of each face
+      normals (numpy array): Normal vector of each vertex
+      values (numpy array): Field value at each vertex
+      lower (list): First cell to keep along x, y, z; None for no limit
+      upper (list): Last+1 cell to keep along x, y, z; None for no limit
+
+    Returns:
+      tuple: corners, faces, normals, and values
+
+    """
+    cells = np.floor(np.mean(corners[faces], axis=1))
+
+    keep = np.ones(len(faces), dtype=bool)
+    for i in range(3):
+        if lower[i] is not None:
+            keep &= cells[:, i] >= lower[i]
+        if upper[i] is not None:
+            keep &= cells[:, i] < upper[i]
+
+    return remove_unused_vertices(corners, faces[keep], normals, values)
+
+
+def merge_meshes(meshes):
+    """Concatenate several meshes into one, renumbering the faces.
+
+    Coincident vertices are not welded; use ``clean_mesh`` for that.
+
+    Args:
+      meshes (list): List of [corners, faces, normals, values]
+
+    Returns:
+      tuple: corners, faces, normals, and values
+
+    """
+    if len(meshes) == 0:
+        return (np.zeros((0, 3), dtype=np.float32), 
+                np.zeros((0, 3), dtype=np.int64),
+                np.zeros((0, 3), dtype=np.float32), 
+                np.zeros(0, dtype=np.float32))
+
+    offsets = np.cumsum([0] + [len(mesh[0]) for mesh in meshes[:-1]])
+
+    corners = np.concatenate([mesh[0] for mesh in meshes])
+    faces = np.concatenate([np.asarray(mesh[1], dtype=np.int64) + offset 
+            for mesh, offset in zip(meshes, offsets)])
+    normals = np.concatenate([mesh[2] for mesh in meshes])
+    values = np.concatenate([mesh[3] for mesh in meshes])
+
+    return corners, faces, normals, values
+
+
+def postprocess_mesh(mesh, cutoff, target_triangles=None, 
+        decimate_tolerance=None, cleanup=False, weld_tolerance=1e-4,
+        clip=None, field=None):
+    """Apply the optional mesh processing steps to a single isosurface.
+
+    Runs between ``mesh_isosurface`` and the mesh2 output. Steps that
+    are not requested are skipped, and the mesh is returned unchanged
+    if nothing is requested.
+
+    Args:
+      mesh (tuple): corners, faces, normals, and values
+      cutoff (float): Isosurface value, only used for printing
+      target_triangles (int, optional): Decimate to at most this many 
+          triangles (default None)
+      decimate_tolerance (float, optional): Decimate by merging 
+          vertices closer than roughly this distance (default None)
+      cleanup (bool, optional): Run ``clean_mesh`` (default False)
+      weld_tolerance (float, optional): Welding distance used by the
+          cleanup (default 1e-4)
+      clip (dict, optional): Keyword arguments for ``clip_mesh`` 
+          (default None, no clipping)
+      field (numpy array, optional): Field values, needed for clipping
+          with caps (default None)
+
+    Returns:
+      tuple: corners, faces, normals, and values
+
+    """
+    # Clipping first, the other steps only see what is kept
+    if clip is not None:
+        mesh = clip_mesh(mesh, field, cutoff, **clip)
+
+    # Cleaning first leaves less work for the decimation
+    if cleanup:
+        num_before = [len(mesh[0]), len(mesh[1])]
+        mesh = clean_mesh(*mesh, weld_tolerance=weld_tolerance)
+        print(f"Cleaned isosurface {cutoff}: {num_before[0]} -> "
+              + f"{len(mesh[0])} vertices, {num_before[1]} -> "
+              + f"{len(mesh[1])} faces")
+
+    if target_triangles is not None or decimate_tolerance is not None:
+        num_before = len(mesh[1])
+        mesh = decimate_mesh(*mesh, target_triangles=target_triangles,
+                tolerance=decimate_tolerance)
+        print(f"Decimated isosurface {cutoff}: {num_before} -> "
+              + f"{len(mesh[1])} triangles")
+
+    return mesh
+
+
+def decimate_mesh(corners, faces, normals, values, target_triangles=None,
+        tolerance=None, max_iterations=12):
+    """Reduce the number of triangles in a mesh by vertex clustering.
+
+    Space is divided into cubic cells and all vertices in a cell are 
+    merged into one, placed at their mean position. The merged normal
+    is the renormalized sum of the original normals, so smooth shading
+    survives. Faces that collapse are dropped.
+
+    With ``tolerance``, the cell size is fixed at that value (in grid
+    units), which bounds how far any vertex moves. With 
+    ``target_triangles``, the cell size is grown until the mesh has at
+    most that many triangles. If both are given, the tolerance is used
+    as the starting cell size.
+
+    Args:
+      corners (numpy array): Coordinates of each vertex
+      faces (numpy array): Vertex indices of each face
+      normals (numpy array): Normal vector of each vertex
+      values (numpy array): Field value at each vertex
+      target_triangles (int, optional): Maximum number of triangles in
+          the result (default None)
+      tolerance (float, optional): Cell size used for clustering 
+          (default None)
+      max_iterations (int, optional): Maximum number of cell sizes to
+          try when aiming for ``target_triangles`` (default 12)
+
+    Returns:
+      tuple: Decimated corners, faces, normals, and values
+
+    """
+    num_faces = len(faces)
+
+    if target_triangles is None and tolerance is None:
+        return corners, faces, normals, values
+    if target_triangles is not None and num_faces <= target_triangles:
+        if tolerance is None:
+            return corners, faces, normals, values
+
+    if tolerance is not None:
+        cell_size = tolerance
+    else:
+        # Triangle count scales with 1/cell_size**2
+        edges = corners[faces[:, 1]] - corners[faces[:, 0]]
+        mean_edge = np.mean(np.linalg.norm(edges, axis=1))
+        cell_size = mean_edge * np.sqrt(num_faces / max(1, target_triangles))
+
+    origin = np.amin(corners, axis=0)
+
+    for iteration in range(max_iterations):
+        cells = np.floor((corners - origin) / cell_size).astype(np.int64)
+        labels = np.unique(cells, axis=0, return_inverse=True)[1]
+        decimated = collapse_vertices(corners, faces, normals, values, 
+                labels.reshape(-1))
+
+        if target_triangles is None or len(decimated[1]) <= target_triangles:
+            break
+
+        cell_size *= max(1.1, np.sqrt(len(decimated[1]) / target_triangles))
+
+    return decimated
+
+
+def collapse_vertices(corners, faces, normals, values, labels):
+    """Merge all vertices that share a label into a single vertex.
+
+    The merged vertex is placed at the mean position of its members,
+    gets the renormalized sum of their normals, and the mean of their
+    values. Faces are renumbered; faces that end up with a repeated
+    vertex are dropped, as are repeated faces and vertices that are no
+    longer used by any face.
+
+    Args:
+      corners (numpy array): Coordinates of each vertex
+      faces (numpy array): Vertex indices of each face
+      normals (numpy array): Normal vector of each vertex
+      values (numpy array): Field value at each vertex
+      labels (numpy array): Integer label of each vertex, starting at 0;
+          vertices with the same label are merged
+
+    Returns:
+      tuple: Merged corners, faces, normals, and values
+
+    """
+    num_labels = int(labels.max()) + 1 if len(labels) else 0
+    counts = np.bincount(labels, minlength=num_labels).astype(np.float64)
+    counts[counts == 0] = 1
+
+    new_corners = np.empty((num_labels, 3))
+    new_normals = np.empty((num_labels, 3))
+    for i in range(3):
+        new_corners[:, i] = np.bincount(labels, weights=corners[:, i],
+                minlength=num_labels) / counts
+        new_normals[:, i] = np.bincount(labels, weights=normals[:, i],
+                minlength=num_labels)
+    new_values = np.bincount(labels, weights=values, 
+            minlength=num_labels) / counts
+
+    # Normals that cancel out keep the normal of one of the members
+    lengths = np.linalg.norm(new_normals, axis=1)
+    cancelled = lengths < 1e-12
+    if np.any(cancelled):
+        first = np.full(num_labels, -1, dtype=np.int64)
+        first[labels[::-1]] = np.arange(len(labels))[::-1]
+        new_normals[cancelled] = normals[first[cancelled]]
+        lengths[cancelled] = np.linalg.norm(new_normals[cancelled], axis=1)
+    lengths[lengths == 0] = 1
+    new_normals /= lengths[:, np.newaxis]
+
+    # Renumber faces and drop the collapsed ones
+    new_faces = labels[faces]
+    keep = ((new_faces[:, 0] != new_faces[:, 1])
+            & (new_faces[:, 1] != new_faces[:, 2])
+            & (new_faces[:, 0] != new_faces[:, 2]))
+    new_faces = new_faces[keep]
+
+    # Drop repeated faces, regardless of winding, keeping the first one
+    if len(new_faces):
+        index = np.unique(np.sort(new_faces, axis=1), axis=0, 
+                return_index=True)[1]
+        new_faces = new_faces[np.sort(index)]
+
+    return remove_unused_vertices(new_corners.astype(corners.dtype),
+            new_faces.astype(faces.dtype), 
+            new_normals.astype(normals.dtype), 
+            new_values.astype(values.dtype))
+
+
+def clean_mesh(corners, faces, normals, values, weld_tolerance=1e-4,
+        area_tolerance=1e-10):
+    """Weld vertices and remove degenerate faces from a mesh.
+
+    Cleans up raw marching cubes output before it is written:
+    * vertices closer than ``weld_tolerance`` are welded into one,
+      e.g. the copies created along cell (or chunk) boundaries; 
+      vertices up to 2 * sqrt(3) times farther apart can be welded too
+    * faces with a repeated vertex or (almost) zero area are dropped,
+      as are repeated faces
+    * vertices not used by any face are dropped
+    * coordinates are stored as float32 and face indices with the
+      smallest unsigned integer type that fits
+
+    Args:
+      corners (numpy array): Coordinates of each vertex
+      faces (numpy array): Vertex indices of each face
+      normals (numpy array): Normal vector of each vertex
+      values (numpy array): Field value at each vertex
+      weld_tolerance (float, optional): Welding distance, in grid 
+          units (default 1e-4)
+      area_tolerance (float, optional): Faces with a smaller area are
+          dropped (default 1e-10)
+
+    Returns:
+      tuple: Cleaned corners, faces, normals, and values
+
+    """
+    import itertools
+
+    corners = np.asarray(corners, dtype=np.float32)
+    normals = np.asarray(normals, dtype=np.float32)
+    values = np.asarray(values, dtype=np.float32)
+    faces = np.asarray(faces, dtype=np.int64)
+
+    if len(faces) == 0:
+        return (corners[:0], faces.astype(np.uint16), normals[:0], 
+                values[:0])
+
+    # Weld by snapping to grids with cells twice the welding distance,
+    # offset by half a cell or not along each axis. Along an axis, two
+    # vertices closer than the welding distance cross at most one cell
+    # boundary of the two offsets, so they share a cell in at least one
+    # of the 8 grids; groups sharing a cell in any grid are merged.
+    num_corners = len(corners)
+    scaled = corners / (2 * weld_tolerance)
+    grids = []
+    for offset in itertools.product([0, 0.5], repeat=3):
+        keys = np.floor(scaled + np.array(offset)).astype(np.int64)
+        grids.append(np.unique(keys, axis=0, 
+                return_inverse=True)[1].reshape(-1))
+    del scaled
+
+    labels = np.arange(num_corners)
+    while True:
+        new_labels = labels
+        for grid in grids:
+            group_min = np.full(grid.max() + 1, num_corners)
+            np.minimum.at(group_min, grid, new_labels)
+            new_labels = group_min[grid]
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+    labels = np.unique(labels, return_inverse=True)[1].reshape(-1)
+
+    corners, faces, normals, values = collapse_vertices(corners, faces,
+            normals, values, labels)
+
+    # Zero-area faces, e.g. slivers where the isosurface touches a grid
+    # point
+    edge1 = corners[faces[:, 1]] - corners[faces[:, 0]]
+    edge2 = corners[faces[:, 2]] - corners[faces[:, 0]]
+    area = 0.5 * np.linalg.norm(np.cross(edge1, edge2), axis=1)
+    faces = faces[area > area_tolerance]
+
+    corners, faces, normals, values = remove_unused_vertices(corners, 
+            faces, normals, values)
+
+    # Shrink the index type
+    if len(corners) <= np.iinfo(np.uint16).max:
+        faces = faces.astype(np.uint16)
+    else:
+        faces = faces.astype(np.uint32)
+
+    return corners, faces, normals, values
+
+
+def remove_unused_vertices(corners, faces, normals, values):
+    """Drop vertices that aren't used by any face and renumber faces.
+
+    Args:
+      corners (numpy array): Coordinates of each vertex
+      faces (numpy array): Vertex indices of each face
+      normals (numpy array): Normal vector of each vertex
+      values (numpy array): Field value at each vertex
+
+    Returns:
+      tuple: corners, faces, normals, and values
+
+    """
+    used = np.zeros(len(corners), dtype=bool)
+    used[faces.reshape(-1)] = True
+    renumber = np.cumsum(used) - 1
+
+    return (corners[used], renumber[faces].astype(faces.dtype), 
+            normals[used], values[used])
+
+
+def find_mesher(mesher="auto"):
+    """Look up a meshing backend by name.
+
+    Available backends:
+      * "marching_cubes_lewiner": ``skimage.measure.marching_cubes_lewiner``,
+        the original mesher; removed in scikit-image 0.19
+      * "marching_cubes": ``skimage.measure.marching_cubes``, the same
+        algorithm in newer scikit-image releases
+      * "surface_nets": ``mesh_surface_nets``, a NumPy-only dual method
+        without the thin slivers of marching cubes
+      * "auto": the first of "marching_cubes_lewiner" and 
+        "marching_cubes" that the installed scikit-image provides
+
+    Args:
+      mesher (str, optional): Name of the backend (default "auto")
+
+    Returns:
+      tuple: Name of the backend and the function, which takes the 
+          field, the cutoff, and a step_size keyword, and returns 
+          corners, faces, normals, and values like marching cubes
+
+    Raises:
+      ValueError: Unknown backend
+      ImportError: The backend isn't available
+
+    """
+    if mesher == "auto":
+        for name in ["marching_cubes_lewiner", "marching_cubes"]:
+            if name in available_meshers():
+                return find_mesher(name)
+        raise ImportError("No marching cubes in skimage.measure")
+
+    if mesher == "marching_cubes_lewiner":
+        from skimage.measure import marching_cubes_lewiner
+        return mesher, marching_cubes_lewiner
+    elif mesher == "marching_cubes":
+        # Fail here rather than when meshing
+        from skimage.measure import marching_cubes
+        return mesher, mesh_marching_cubes
+    elif mesher == "surface_nets":
+        return mesher, mesh_surface_nets
+
+    raise ValueError(f"Unknown mesher '{mesher}'")
+
+
+def available_meshers():
+    """List the meshing backends that can run here.
+
+    Returns:
+      list: Names of the available backends, see ``find_mesher``
+
+    """
+    import skimage.measure
+
+    meshers = [name for name in ["marching_cubes_lewiner", 
+            "marching_cubes"] if hasattr(skimage.measure, name)]
+    meshers.append("surface_nets")
+
+    return meshers
+
+
+def mesh_marching_cubes(field, cutoff, step_size=1):
+    """Run the Lewiner marching cubes of newer scikit-image releases.
+
+    Args:
+      field (numpy array): Field values
+      cutoff (float): Isosurface value
+      step_size (int, optional): Marching cubes step size (default 1)
+
+    Returns:
+      tuple: corners, faces, normals, and values
+
+    """
+    from skimage.measure import marching_cubes
+
+    return marching_cubes(field, cutoff, step_size=step_size, 
+            method="lewiner")
+
+
+def mesh_surface_nets(field, cutoff, step_size=1):
+    """Mesh an isosurface with (naive) surface nets.
+
+    A dual method: instead of putting vertices on the grid edges like 
+    marching cubes, every grid cell that the isosurface passes through
+    gets a single vertex at the mean of its edge crossings, and every
+    crossed grid edge gets a quad joining the four cells around it. 
+    The triangle count is about the same as marching cubes, but there
+    are no thin slivers, and it runs without scikit-image. The surface
+    is slightly smoother than the field.
+
+    The output follows the ``marching_cubes_lewiner`` conventions: the
+    normals point towards lower field values, and the faces are wound
+    the other way.
+
+    Args:
+      field (numpy array): Field values
+      cutoff (float): Isosurface value
+      step_size (int, optional): Only use every step_size-th grid 
+          point, in grid units (default 1)
+
+    Returns:
+      tuple: corners, faces, normals, and values
+
+    """
+    if step_size > 1:
+        field = field[::step_size, ::step_size, ::step_size]
+
+    inside = field > cutoff
+    cells = [n - 1 for n in field.shape]
+
+    vertex_cells = []
+    vertex_points = []
+    quads = []
+    for axis in range(3):
+        # The other two axes, in right-handed order
+        axis1 = (axis + 1) % 3
+        axis2 = (axis + 2) % 3
+
+        # Grid edges along this axis that the isosurface crosses
+        first = [slice(None)] * 3
+        last = [slice(None)] * 3
+        first[axis] = slice(None, -1)
+        last[axis] = slice(1, None)
+        start = np.stack(np.nonzero(inside[tuple(first)] 
+                != inside[tuple(last)]), axis=1)
+
+        field0 = field[tuple(start.T)]
+        field1 = field[tuple((start + np.eye(3, dtype=int)[axis]).T)]
+        points = start.astype(np.float64)
+        points[:, axis] += (cutoff - field0) / (field1 - field0)
+
+        # Every crossing counts towards the vertices of the (up to) four
+        # cells around its edge
+        for shift1, shift2 in [[0, 0], [-1, 0], [-1, -1], [0, -1]]:
+            cell = start.copy()
+            cell[:, axis1] += shift1
+            cell[:, axis2] += shift2
+            valid = ((cell[:, axis1] >= 0) & (cell[:, axis1] < cells[axis1])
+                    & (cell[:, axis2] >= 0) & (cell[:, axis2] < cells[axis2]))
+            vertex_cells.append(np.ravel_multi_index(cell[valid].T, cells))
+            vertex_points.append(points[valid])
+
+        # One quad per edge that has cells all around it, facing along
+        # the gradient of the field
+        interior = ((start[:, axis1] > 0) & (start[:, axis1] < cells[axis1])
+                & (start[:, axis2] > 0) & (start[:, axis2] < cells[axis2]))
+        start = start[interior]
+        quad = []
+        for shift1, shift2 in [[-1, -1], [0, -1], [0, 0], [-1, 0]]:
+            cell = start.copy()
+            cell[:, axis1] += shift1
+            cell[:, axis2] += shift2
+            quad.append(np.ravel_multi_index(cell.T, cells))
+        quad = np.stack(quad, axis=1)
+
+        falling = field0[interior] > cutoff
+        quad[falling] = quad[falling, ::-1]
+        quads.append(quad)
+
+    # One vertex per crossed cell, at the mean of its crossings
+    vertex_cells = np.concatenate(vertex_cells)
+    vertex_points = np.concatenate(vertex_points)
+    active, labels = np.unique(vertex_cells, return_inverse=True)
+    count = np.bincount(labels, minlength=len(active))
+    corners = np.empty((len(active), 3))
+    for axis in range(3):
+        corners[:, axis] = np.bincount(labels, 
+                weights=vertex_points[:, axis], minlength=len(active)) / count
+
+    # Split every quad into two triangles, wound like marching cubes
+    quads = np.searchsorted(active, np.concatenate(quads))
+    faces = np.concatenate([quads[:, [0, 1, 2]], quads[:, [0, 2, 3]]])
+
+    # Normals point down the gradient, from central differences
+    normals = np.empty_like(corners)
+    for axis in range(3):
+        offset = np.zeros(3)
+        offset[axis] = 0.5
+        normals[:, axis] = (interpolate_field(field, corners - offset) 
+                - interpolate_field(field, corners + offset))
+    length = np.linalg.norm(normals, axis=1, keepdims=True)
+    normals /= np.where(length > 0, length, 1)
+
+    values = interpolate_field(field, corners)
+    corners *= step_size
+
+    return (corners.astype(np.float32), faces.astype(np.int32), 
+            normals.astype(np.float32), values.astype(np.float32))
+
+
+def mesh_isosurface(field, cutoff, cache_dir=None, cache_size=2**31,
+        field_hash=None, step_size=1, roi=None, mesher="auto", 
+        num_slabs=1, num_workers=1):
+    """Run marching cubes on the field for a single isovalue.
+
+    If ``cache_dir`` is given, the result is looked up in (and added 
+    to) the on-disk mesh cache first. See ``load_cached_mesh``.
+
+    With ``num_slabs`` > 1, the field is split into z-slabs 
+    (``slab_cell_boxes``) that are meshed on ``num_workers`` processes
+    and welded together (``mesh_cell_boxes``). This parallelizes a 
+    single isosurface of a big field. The slab edges are multiples of
+    ``step_size``, so without an ``roi`` the result is watertight and
+    has the same triangles as meshing the whole field with the same 
+    step size, except for the degenerate ones that are dropped while 
+    welding; only the order of the vertices and faces differs. The 
+    ``roi`` boxes are grown to multiples of ``step_size`` as well (see
+    ``mesh_cell_boxes``), so the mesh is only open where the region of
+    interest ends.
+
+    Args:
+      field (numpy array): Field values to turn into isosurface
+      cutoff (float): Isosurface value
+      cache_dir (str, optional): Directory for the marching cubes 
+          cache (default None, no caching)
+      cache_size (int, optional): Maximum size of the cache directory
+          in bytes (default 2**31, i.e. 2 GB)
+      field_hash (str, optional): Digest of the field from 
+          ``field_digest``; computed here if missing, so pass it in 
+          when meshing the same field more than once (default None)
+      step_size (int, optional): Marching cubes step size in grid 
+          points; larger is coarser and faster (default 1)
+      roi (list, optional): Only mesh these boxes of grid cells, from 
+          ``roi_cell_boxes``, grown by up to ``step_size`` - 1 cells 
+          (default None, the whole field)
+      mesher (str, optional): Meshing backend, see ``find_mesher`` 
+          (default "auto")
+      num_slabs (int, optional): Number of z-slabs (default 1)
+      num_workers (int, optional): Number of worker processes meshing
+          the slabs (default 1)
+
+    Returns:
+      tuple: corners (coordinates of each vertex), faces (vertex 
+          indices of each face), normals (normal vector at each 
+          vertex), and values (field value at each vertex)
+
+    """
+    mesher, mesh_function = find_mesher(mesher)
+
+    # Everything that changes the geometry must be part of the key
+    mesh_params = {"mesher": mesher}
+    if step_size != 1:
+        mesh_params["step_size"] = step_size
+    if roi is not None:
+        mesh_params["roi"] = roi
+    if num_slabs > 1:
+        mesh_params["num_slabs"] = num_slabs
+
+    if cache_dir is not None:
+        if field_hash is None:
+            field_hash = field_digest(field)
+        key = mesh_cache_key(field_hash, cutoff, mesh_params)
+
+        mesh = load_cached_mesh(cache_dir, key)
+        if mesh is not None:
+            return mesh
+
+    #SCIKIT marching cubes function
+    # corners :: Coordinates of each vertex, just a list of values
+    # faces :: List of the vertices for each face by index value 
+    #          in corners variable
+    # normals :: Normal vector for each vertex, indices match 
+    #            corners variable
+    # values :: Value at each vertex; we don't care about these
+    if num_slabs > 1:
+        mesh = mesh_cell_boxes(field, cutoff, 
+                slab_cell_boxes(field.shape, num_slabs, roi, step_size), 
+                step_size=step_size, mesher=mesher, 
+                num_workers=num_workers)
+    elif roi is None:
+        mesh = mesh_function(field, cutoff, step_size=step_size)
+    else:
+        mesh = mesh_cell_boxes(field, cutoff, roi, step_size=step_size,
+                mesher=mesher)
+
+    if cache_dir is not None:
+        save_cached_mesh(cache_dir, key, mesh, cache_size=cache_size)
+
+    return mesh
+
+
+def roi_cell_boxes(shape, cut_at=[[0.5, 1], [0.5, 1], [0, 1]], 
+        subtract_box=False):
+    """Find the grid cells that survive a slice.
+
+    Converts the box of ``slice_isosurface`` (see ``slice_bounds``) 
+    into boxes of whole grid cells that together cover everything the
+    slice keeps: a single box if the inside is kept, and up to six 
+    slabs around the box if it is removed. Cells that are only partly
+    kept are included, so the boxes cover up to one cell more than 
+    the slice.
+
+    Args:
+      shape (tuple): Shape of the field, [nx, ny, nz]
+      cut_at (list): Specify the section to remove, as a fraction of
+          the unit cell. (Default value = [[0.5, 1], [0.5, 1], [0, 1]])
+      subtract_box (bool, optional): The inside of the box is removed
+          (if True) or kept (if False, default)
+
+    Returns:
+      list: Boxes as [first cell, last+1 cell], each a list of x, y, z
+          cell indices
+
+    """
+    lower, upper = slice_bounds(shape, cut_at)
+    num_cells = [max(1, n - 1) for n in shape]
+
+    def clamp(cell, axis):
+        return int(min(num_cells[axis], max(0, cell)))
+
+    if not subtract_box:
+        first = [clamp(np.floor(lower[i]), i) for i in range(3)]
+        last = [clamp(np.ceil(upper[i]), i) for i in range(3)]
+        if all(first[i] < last[i] for i in range(3)):
+            return [[first, last]]
+        return []
+
+    # Cells entirely inside the box are removed, the rest is split into
+    # slabs: below and above the box in x, then in y, then in z
+    first = [clamp(np.ceil(lower[i]), i) for i in range(3)]
+    last = [clamp(np.floor(upper[i]), i) for i in range(3)]
+    if any(first[i] >= last[i] for i in range(3)):
+        return [[[0, 0, 0], list(num_cells)]]
+
+    boxes = []
+    outer = [[0, num_cells[i]] for i in range(3)]
+    for axis in range(3):
+        for span in [[0, first[axis]], [last[axis], num_cells[axis]]]:
+            if span[0] < span[1]:
+                box = [list(limit) for limit in outer]
+                box[axis] = span
+                boxes.append([[limit[0] for limit in box], 
+                        [limit[1] for limit in box]])
+        outer[axis] = [first[axis], last[axis]]
+
+    return boxes
+
+
+def mesh_cell_boxes(field, cutoff, boxes, step_size=1, mesher="auto",
+        num_workers=1):
+    """Run marching cubes on boxes of grid cells only.
+
+    Used by ``mesh_isosurface`` for region of interest meshing and for
+    meshing in slabs. Every box is meshed with one ghost layer of grid
+    points on each side, so the normals match those of the full field,
+    and then cropped to its own cells (``mesh_cell_box``). The pieces 
+    are merged and the seams between boxes are welded.
+
+    With a ``step_size`` > 1, the boxes are first grown to multiples of
+    the step size, so every box samples the same grid points as the 
+    whole field and the seams line up. Boxes that overlap after this 
+    give the same triangles there, which the welding removes.
+
+    With ``num_workers`` > 1, the boxes are meshed on a process pool 
+    that reads the field from shared memory 
+    (``mesh_cell_box_shared``). The result is the same as meshing the
+    boxes one after another.
+
+    Args:
+      field (numpy array): Field values
+      cutoff (float): Isosurface value
+      boxes (list): Boxes as [first cell, last+1 cell], from 
+          ``roi_cell_boxes`` or ``slab_cell_boxes``
+      step_size (int, optional): Marching cubes step size (default 1)
+      mesher (str, optional): Meshing backend, see ``find_mesher`` 
+          (default "auto")
+      num_workers (int, optional): Number of worker processes 
+          (default 1, mesh in this process)
+
+    Returns:
+      tuple: corners, faces, normals, and values
+
+    """
+    if step_size > 1:
+        num_cells = [max(1, n - 1) for n in field.shape]
+        boxes = [[[int(first[i] // step_size * step_size) 
+                for i in range(3)], 
+                [int(min(num_cells[i], -(-last[i] // step_size) * step_size))
+                for i in range(3)]] for first, last in boxes]
+
+    if num_workers > 1 and len(boxes) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        shm, shared_field = share_array(field)
+        try:
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                futures = [executor.submit(mesh_cell_box_shared, shm.name,
+                        field.shape, field.dtype.str, cutoff, first, last,
+                        step_size, mesher) for first, last in boxes]
+                pieces = [future.result() for future in futures]
+        finally:
+            del shared_field
+            shm.close()
+            shm.unlink()
+    else:
+        pieces = [mesh_cell_box(field, cutoff, first, last, 
+                step_size=step_size, mesher=mesher) 
+                for first, last in boxes]
+
+    pieces = [piece for piece in pieces if piece is not None]
+
+    mesh = merge_meshes(pieces)
+    if len(pieces) > 1:
+        mesh = clean_mesh(*mesh)
+
+    return mesh
+
+
+def mesh_cell_box(field, cutoff, first, last, step_size=1, 
+        mesher="auto"):
+    """Run marching cubes on a single box of grid cells.
+
+    The box is meshed with a ghost layer of ``step_size`` grid points
+    on each side, so that a box starting at a multiple of the step 
+    size is sampled on the same points as the whole field.
+
+    Args:
+      field (numpy array): Field values
+      cutoff (float): Isosurface value
+      first (list): First cell of the box in x, y and z
+      last (list): Last cell + 1 of the box in x, y and z
+      step_size (int, optional): Marching cubes step size (default 1)
+      mesher (str, optional): Meshing backend, see ``find_mesher`` 
+          (default "auto")
+
+    Returns:
+      list: corners, faces, normals, and values, or None if the 
+          isosurface doesn't pass through the box
+
+    """
+    mesher, mesh_function = find_mesher(mesher)
+
+    start = [max(0, first[i] - step_size) for i in range(3)]
+    stop = [min(field.shape[i], last[i] + step_size + 1) 
+            for i in range(3)]
+    block = field[start[0]:stop[0], start[1]:stop[1], start[2]:stop[2]]
+
+    # Nothing to mesh, or too thin for marching cubes
+    if min(block.shape) < 2:
+        return None
+    if cutoff <= np.amin(block) or cutoff >= np.amax(block):
+        return None
+
+    corners, faces, normals, values = mesh_function(block, cutoff, 
+            step_size=step_size)
+    corners, faces, normals, values = crop_mesh_to_cells(corners,
+            faces, normals, values, 
+            lower=[first[i] - start[i] for i in range(3)],
+            upper=[last[i] - start[i] for i in range(3)])
+    corners += np.array(start, dtype=corners.dtype)
+
+    return [corners, faces, normals, values]
+
+
+def mesh_cell_box_shared(shm_name, shape, dtype, cutoff, first, last, 
+        step_size=1, mesher="auto"):
+    """Mesh a box of grid cells of a field stored in shared memory.
+
+    Runs in the worker processes started by ``mesh_cell_boxes``,
+    never directly called by the user.
+
+    Args:
+      shm_name (str): Name of the shared memory block holding the field
+      shape (tuple): Shape of the field array
+      dtype (str): Data type of the field array
+      cutoff (float): Isosurface value
+      first (list): First cell of the box in x, y and z
+      last (list): Last cell + 1 of the box in x, y and z
+      step_size (int, optional): Marching cubes step size (default 1)
+      mesher (str, optional): Meshing backend (default "auto")
+
+    Returns:
+      list: corners, faces, normals, and values, or None
+
+    """
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        field = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        piece = mesh_cell_box(field, cutoff, first, last, 
+                step_size=step_size, mesher=mesher)
+        del field
+    finally:
+        shm.close()
+
+    return piece
+
+
+def slab_cell_boxes(shape, num_slabs, boxes=None, step_size=1):
+    """Split boxes of grid cells into z-slabs.
+
+    The slab edges are multiples of ``step_size``, so that marching 
+    cubes with that step size samples the same grid points in every 
+    slab as in the whole field and the seams line up.
+
+    Args:
+      shape (tuple): Shape of the field, [nx, ny, nz]
+      num_slabs (int): Number of slabs the z range of the field is 
+          split into
+      boxes (list, optional): Boxes as [first cell, last+1 cell], e.g.
+          from ``roi_cell_boxes`` (default None, the whole field)
+      step_size (int, optional): Marching cubes step size (default 1)
+
+    Returns:
+      list: Boxes as [first cell, last+1 cell], each inside a single 
+          slab
+
+    """
+    num_cells = [max(1, n - 1) for n in shape]
+    if boxes is None:
+        boxes = [[[0, 0, 0], num_cells]]
+
+    # Slab edges, as evenly spaced as the steps allow
+    num_steps = int(np.ceil(num_cells[2] / step_size))
+    edges = np.linspace(0, num_steps, min(num_slabs, num_steps) + 1)
+    edges = [min(int(edge) * step_size, num_cells[2]) 
+            for edge in np.round(edges)]
+
+    slabs = []
+    for z_first, z_last in zip(edges[:-1], edges[1:]):
+        for first, last in boxes:
+            if max(first[2], z_first) < min(last[2], z_last):
+                slabs.append([[first[0], first[1], max(first[2], z_first)],
+                        [last[0], last[1], min(last[2], z_last)]])
+
+    return slabs
+
+
+def field_digest(field, chunk_size=2**24):
+    """Compute a content hash of a field array.
+
+    The hash covers the shape, the data type, and the values, and is
+    computed in chunks so that non-contiguous arrays (e.g. the output
+    of ``process_field_array``) are never copied in full.
+
+    Args:
+      field (numpy array): Field to hash
+      chunk_size (int, optional): Approximate number of bytes hashed
+          at a time (default 2**24)
+
+    Returns:
+      str: Hex digest of the field
+
+    """
+    import hashlib
+
+    field = np.asarray(field)
+    digest = hashlib.sha1()
+    digest.update(f"{field.shape}{field.dtype.str}".encode())
+
+    if field.ndim == 0 or field.size == 0:
+        digest.update(field.tobytes())
+        return digest.hexdigest()
+
+    # Hash along the first axis, a few slices at a time
+    slice_bytes = max(1, field[0].nbytes)
+    step = max(1, chunk_size // slice_bytes)
+    for start in range(0, field.shape[0], step):
+        block = np.ascontiguousarray(field[start:(start + step)])
+        digest.update(memoryview(block).cast("B"))
+
+    return digest.hexdigest()
+
+
+def mesh_cache_key(field_hash, cutoff, mesh_params):
+    """Create the mesh cache key for a single isosurface.
+
+    Args:
+      field_hash (str): Digest of the field from ``field_digest``
+      cutoff (float): Isosurface value
+      mesh_params (dict): Every meshing parameter that changes the
+          resulting geometry
+
+    Returns:
+      str: Hex digest used as the cache file name
+
+    """
+    import hashlib
+    import json
+
+    key = json.dumps([field_hash, repr(float(cutoff)), mesh_params], 
+            sort_keys=True)
+
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def load_cached_mesh(cache_dir, key):
+    """Load a single isosurface from the mesh cache.
+
+    Marks the entry as recently used, so that it is the last to be
+    removed by ``prune_mesh_cache``.
+
+    Args:
+      cache_dir (str): Directory of the mesh cache
+      key (str): Cache key from ``mesh_cache_key``
+
+    Returns:
+      tuple: corners, faces, normals, and values, or None if the key
+          is not in the cache
+
+    """
+    import os
+
+    cache_file = os.path.join(cache_dir, f"{key}.npz")
+
+    try:
+        with np.load(cache_file) as data:
+            mesh = (data["corners"], data["faces"], data["normals"],
+                    data["values"])
+        os.utime(cache_file)
+    except (OSError, KeyError, ValueError):
+        # Missing, or removed/corrupted by another process
+        return None
+
+    return mesh
+
+
+def save_cached_mesh(cache_dir, key, mesh, cache_size=2**31):
+    """Add a single isosurface to the mesh cache.
+
+    The mesh is written to a temporary file first and then moved into
+    place, so that processes sharing the cache never see partial 
+    entries.
+
+    Args:
+      cache_dir (str): Directory of the mesh cache, created if needed
+      key (str): Cache key from ``mesh_cache_key``
+      mesh (tuple): corners, faces, normals, and values
+      cache_size (int, optional): Maximum size of the cache directory
+          in bytes (default 2**31, i.e. 2 GB)
+
+    Returns:
+
+    """
+    import os
+    import tempfile
+
+    os.makedirs(cache_dir, exist_ok=True)
+
+    corners, faces, normals, values = mesh
+
+    fd, temp_name = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fileID:
+            np.savez_compressed(fileID, corners=corners, faces=faces,
+                    normals=normals, values=values)
+        os.replace(temp_name, os.path.join(cache_dir, f"{key}.npz"))
+    except BaseException:
+        os.remove(temp_name)
+        raise
+
+    prune_mesh_cache(cache_dir, cache_size)
+
+    return
+
+
+def prune_mesh_cache(cache_dir, cache_size):
+    """Delete the least recently used cache entries until it fits.
+
+    Counts both meshes (.npz) and mesh2 blocks (.mesh2), so a 
+    directory shared by the mesh cache and ``create_mesh2_incremental``
+    stays within cache_size as a whole.
+
+    Args:
+      cache_dir (str): Directory of the mesh cache
+      cache_size (int): Maximum size of the cache directory in bytes
+
+    Returns:
+
+    """
+    import os
+
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith((".npz", ".mesh2")):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append([stat.st_mtime, stat.st_size, entry.path])
+
+    total_size = sum([entry[1] for entry in entries])
+
+    # Oldest first
+    for mtime, size, path in sorted(entries):
+        if total_size <= cache_size:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_size -= size
+
+    return
+
+
+def iter_mesh2_object(corners, faces, normals, color, transmit):
+    """Generate a single mesh2 object in chunks.
+
+    Args:
+      corners (numpy array): Coordinates of each vertex
+      faces (numpy array): Vertex indices of each face
+      normals (numpy array): Normal vector of each vertex
+      color (list): Isosurface color as [r, g, b, ...]
+      transmit (float): Isosurface transparency
+
+    Yields:
+      string: Consecutive pieces of the mesh2 object
+
+    """
+    yield from iter_mesh2_geometry(corners, faces, normals)
+    yield mesh2_pigment(color, transmit)
+    yield f"\n\t}}"
+
+
+def iter_mesh2_geometry(corners, faces, normals):
+    """Generate the geometry of a mesh2 object in chunks.
+
+    Everything in the mesh2 object up to, but not including, the 
+    pigment and the closing brace. Kept separate so the geometry can
+    be stored and recolored (see ``create_mesh2_incremental``).
+
+    Args:
+      corners (numpy array): Coordinates of each vertex
+      faces (numpy array): Vertex indices of each face
+      normals (numpy array): Normal vector of each vertex
+
+    Yields:
+      string: Consecutive pieces of the mesh2 geometry
+
+    """
+    # Create mesh
+    yield f"\n\nmesh2 {{"
+
+    # Add VERTEX vectors
+    yield "\n\t// Vertex vectors"
+    yield from iter_mesh2_params("vertex_vectors", corners)
+
+    # Add NORMAL vectors
+    yield "\n\t// Normal vectors"
+    yield from iter_mesh2_params("normal_vectors", normals)
+
+    # Add FACE indices
+    yield "\n\t// Face indices"
+    yield from iter_mesh2_params("face_indices", faces, values_per_line=3)
+
+    # NORMAL indices
+    # Not required because vertices & normals have the same indices
+    # POV-Ray will use the values from faces_indices
+
+
+def mesh2_pigment(color, transmit):
+    """Format the pigment of an isosurface.
+
+    Args:
+      color (list): Isosurface color as [r, g, b, ...]
+      transmit (float): Isosurface transparency
+
+    Returns:
+      string: Pigment statement
+
+    """
+    return (f"\n\tpigment {{ rgbt <"
+            + f"{color[0]:.4f}, {color[1]:.4f}, {color[2]:.4f}, "
+            + f"{transmit}> }}")
+
+
+def iter_mesh2_textured_object(corners, faces, normals, colors, transmit,
+        textures):
+    """Generate a mesh2 object with a color at every vertex.
+
+    Like ``iter_mesh2_object``, but instead of a single pigment the 
+    mesh2 gets a texture_list, and every face lists the texture of 
+    each of its vertices; POV-Ray interpolates between them.
+
+    Args:
+      corners (numpy array): Coordinates of each vertex
+      faces (numpy array): Vertex indices of each face
+      normals (numpy array): Normal vector of each vertex
+      colors (list): Colors of the texture_list as [r, g, b, ...]
+      transmit (float): Isosurface transparency
+      textures (numpy array): Index into ``colors`` of every vertex
+
+    Yields:
+      string: Consecutive pieces of the mesh2 object
+
+    """
+    # Create mesh
+    yield f"\n\nmesh2 {{"
+
+    # Add VERTEX vectors
+    yield "\n\t// Vertex vectors"
+    yield from iter_mesh2_params("vertex_vectors", corners)
+
+    # Add NORMAL vectors
+    yield "\n\t// Normal vectors"
+    yield from iter_mesh2_params("normal_vectors", normals)
+
+    # Add TEXTURE list, must come before the faces
+    yield "\n\t// Texture list"
+    yield f"\n\ttexture_list {{" + f"\n\t\t{len(colors)}"
+    for color in colors:
+        yield (f"\n\t\ttexture {{ pigment {{ rgbt <"
+                + f"{color[0]:.4f}, {color[1]:.4f}, {color[2]:.4f}, "
+                + f"{transmit}> }} }}")
+    yield f"\n\t\t}}"
+
+    # Add FACE indices, each followed by its three texture indices
+    yield "\n\t// Face indices"
+    yield from iter_mesh2_textured_faces(faces, textures)
+    yield f"\n\t}}"
+
+
+def iter_mesh2_textured_faces(faces, textures, chunk_size=65536):
+    """Generate the face_indices of a mesh2 with per-vertex textures.
+
+    Same format as ``iter_mesh2_params``, except that every face 
+    vector is followed by the texture indices of its three vertices.
+
+    Args:
+      faces (numpy array): Vertex indices of each face
+      textures (numpy array): Texture index of each vertex
+      chunk_size (int, optional): Number of faces formatted at once
+          (default 65536)
+
+    Yields:
+      string: Consecutive pieces of the face_indices block
+
+    """
+    faces = np.asarray(faces)
+    textures = np.asarray(textures)
+    num_faces = len(faces)
+
+    yield f"\n\tface_indices {{" + f"\n\t\t{num_faces}"
+
+    face_template = "\n\t\t<%d, %d, %d>, %d, %d, %d"
+
+    for start in range(0, num_faces, chunk_size):
+        block = faces[start:(start + chunk_size)]
+        block = np.concatenate([block, textures[block]], axis=1)
+
+        template = ",".join([face_template] * len(block))
+        if start + len(block) < num_faces:
+            template += ","
+
+        yield template % tuple(block.reshape(-1).tolist())
+
+    yield f"\n\t\t}}"
+
+
+def write_mesh2_params(parameter, values, values_per_line=2,
+        chunk_size=65536):
+    """Convert isosurface parameters to the POV-Ray mesh2 format.
+
+    The values are formatted in bulk: each chunk of rows is flattened
+    into a single tuple and pushed through one preformatted template
+    string, instead of building the output one vector at a time. The
+    output is byte-identical to formatting every vector individually
+    with ``f"{value:.5f}"``.
+
+    Args:
+      parameter (string): One of the mesh2 specifications, e.g.
+          "vertex_vectors", "normal_vectors", "face_indices"
+      values (list): The values for the parameter variable, each
+          element must be a list with three values
+      values_per_line (int, optional): Only place this many values on
+          a line for readability, defaults to 2. NOTE: the line break
+          is currently always placed after two vectors, regardless of
+          this setting, so that existing .pov files are unchanged.
+      chunk_size (int, optional): Number of vectors formatted at once;
+          bounds the size of the temporary template (default 65536)
+
+    Returns:
+      string: Parameter data in POV-Ray mesh2 format
+
+    """
+    return "".join(iter_mesh2_params(parameter, values,
+            values_per_line=values_per_line, chunk_size=chunk_size))
+
+
+def iter_mesh2_params(parameter, values, values_per_line=2,
+        chunk_size=65536):
+    """Generate the output of ``write_mesh2_params`` in chunks.
+
+    Each chunk holds at most ``chunk_size`` vectors, so a parameter
+    block can be written out without ever building the full string.
+    Takes the same arguments as ``write_mesh2_params``.
+
+    Args:
+      parameter (string): One of the mesh2 specifications, e.g.
+          "vertex_vectors", "normal_vectors", "face_indices"
+      values (list): The values for the parameter variable, each
+          element must be a list with three values
+      values_per_line (int, optional): Currently ignored, see
+          ``write_mesh2_params`` (default 2)
+      chunk_size (int, optional): Number of vectors formatted at once
+          (default 65536)
+
+    Yields:
+      string: Consecutive pieces of the parameter block
+
+    """
+    values = np.asarray(values)
+    num_values = len(values)
+
+    yield f"\n\t{parameter} {{" + f"\n\t\t{num_values}"
+
+    # Keep the chunk size even so that the line breaks, which come
+    # before every other vector, line up between chunks
+    chunk_size = max(2, chunk_size - (chunk_size % 2))
+
+    vector = "<%.5f, %.5f, %.5f>"
+    pair_template = "\n\t\t" + vector + ", " + vector
+
+    for start in range(0, num_values, chunk_size):
+        block = values[start:(start + chunk_size)]
+        num_block = len(block)
+
+        # Every vector but the very last is followed by a comma
+        template = ", ".join([pair_template] * (num_block // 2))
+        if num_block % 2 == 1:
+            if num_block > 1:
+                template += ", "
+            template += "\n\t\t" + vector
+        if start + num_block < num_values:
+            template += ", "
+
+        # tolist() hands back python floats/ints, which format exactly
+        # like the f-string version
+        yield template % tuple(block.reshape(-1).tolist())
+
+    yield f"\n\t\t}}"
+
+
+def create_isosurface_df3(field, cutoffs, df3_name="field.df3", 
+        colormap="viridis", transmit=0.4, cmap_limits=["a","b"], 
+        field_range=None, accuracy=0.001, max_gradient=None):
+    """Create isosurfaces that POV-Ray calculates from a density file.
+
+    An alternative to ``create_mesh2`` that skips marching cubes. The 
+    field is written to a 16-bit .df3 density file with ``write_df3``,
+    and every cutoff becomes a POV-Ray ``isosurface`` of that density.
+    The .pov file stays tiny no matter how large the field is, at the
+    cost of POV-Ray finding the surface while rendering.
+
+    The isosurfaces are scaled so that grid point i ends up at i, the
+    same coordinates as the mesh2 isosurfaces, so the result works 
+    with ``slice_isosurface`` and ``isosurface_unit_cell``. The df3 
+    file name is written into the .pov file as given, so it must be 
+    valid from wherever POV-Ray is run.
+
+    Args:
+      field (numpy array): Field values to turn into isosurface
+      cutoffs (list): Isosurface values you want rendered
+      df3_name (str, optional): Name of the density file 
+          (default "field.df3")
+      colormap (string, optional): Colormap name, defaults to "viridis"
+      transmit (float, optional): Isosurface transparency (default 0.4)
+      cmap_limits (list, optional): colormap min and max values, 
+          defaults to field extrema if element is a character (set as 
+          ["a", "b"] by default)
+      field_range (list, optional): Field values that map to the
+          smallest and largest density (default None, field extrema)
+      accuracy (float, optional): POV-Ray isosurface accuracy, smaller
+          is more accurate but slower (default 0.001)
+      max_gradient (float, optional): POV-Ray isosurface max_gradient 
+          (default None, estimated from the field)
+
+    Returns:
+      string: Density function declaration and isosurface objects
+
+    """
+    nx, ny, nz = field.shape
+
+    field_min, field_max = write_df3(df3_name, field, field_range)
+    cutoffs = clamp_cutoffs(cutoffs, field_min, field_max)
+    colors = isosurface_colors(cutoffs, colormap, cmap_limits)
+
+    if max_gradient is None:
+        max_gradient = density_gradient(field, field_min, field_max)
+
+    # The density pattern fills the unit cube, with grid point i at i/n
+    box_max = [(nx - 1) / nx, (ny - 1) / ny, (nz - 1) / nz]
+
+    isosurface = f"\n#declare FieldDensity = function {{"
+    isosurface += f"\n\tpattern {{ density_file df3 \"{df3_name}\" "
+    isosurface += f"interpolate 1 }}\n\t}}\n"
+
+    # Need to use union if more than one isosurface
+    if len(cutoffs) > 1:
+        isosurface += f"\nunion {{"
+
+    for i in range(len(cutoffs)):
+        print(f"Isosurface value: {cutoffs[i]}")
+        print(f"Color: {colors[i]}\n")
+
+        # POV-Ray puts the inside where the function is below the 
+        # threshold, the field is above the cutoff inside the mesh2s
+        level = (cutoffs[i] - field_min) / (field_max - field_min)
+        color = colors[i]
+
+        isosurface += (f"\n\nisosurface {{"
+                + f"\n\tfunction {{ -FieldDensity(x, y, z) }}"
+                + f"\n\tcontained_by {{ box {{ <0, 0, 0>, "
+                + f"<{box_max[0]}, {box_max[1]}, {box_max[2]}> }} }}"
+                + f"\n\tthreshold {-level:.6f}"
+                + f"\n\tmax_gradient {max_gradient:.4f}"
+                + f"\n\taccuracy {accuracy}")
+        if transmit > 0:
+            isosurface += f"\n\tall_intersections"
+        isosurface += (f"\n\tscale <{nx}, {ny}, {nz}>"
+                + f"\n\tpigment {{ rgbt <"
+                + f"{color[0]:.4f}, {color[1]:.4f}, {color[2]:.4f}, "
+                + f"{transmit}> }}"
+                + f"\n\t}}")
+
+    # End union
+    if len(cutoffs) > 1:
+        isosurface += f"\n}}\n\n"
+
+    return isosurface
+
+
+def write_df3(df3_name, field, field_range=None, chunk_size=64):
+    """Write a field to a POV-Ray density (.df3) file.
+
+    The file has a header with the three dimensions as big-endian 
+    16-bit integers, followed by the field values rescaled to 16-bit 
+    integers (big-endian, x varying fastest). The field is written one
+    block of z-layers at a time, so memory-mapped fields work.
+
+    Args:
+      df3_name (str): Name of the density file
+      field (numpy array): Field values indexed by [x, y, z]
+      field_range (list, optional): Field values that map to 0 and 
+          65535 (default None, field extrema); values outside the
+          range are clipped
+      chunk_size (int, optional): Number of z-layers written at a time
+          (default 64)
 
     Returns:
-      string: mesh2 object as a string
+      list: Field values that map to the smallest and largest density
 
     """
-    from skimage.measure import marching_cubes_lewiner
-    from os import system
-    import pylab
-    from math import floor, ceil
-
-    # Check that all cutoffs are contained within the dataset
-    # Also can't use the field extrema here, must tweek slightly
-    # Otherwise skimage.measure.marching_cubes_lewiner() throws an error
-    field_min = np.amin(field)
-    field_max = np.amax(field)
+    nx, ny, nz = field.shape
 
-    for i in range(len(cutoffs)):
-        if cutoffs[i] <= field_min:
-            cutoffs[i] = 1.0001 * field_min
-        elif cutoffs[i] >= field_max:
-            cutoffs[i] = 0.9999 * field_max
-
-    # Sort and remove duplicates
-    cutoffs = sorted(set(cutoffs))
+    if field_range is None:
+        field_range = [np.amin(field), np.amax(field)]
+    field_min, field_max = [float(value) for value in field_range]
 
-    # Hijack colormap for a color scheme
-    # Extremes default to max and min cutoffs if the user doesn't specify
-    # Also make sure that the desired colormap range includes all cutoffs
-    cm = pylab.get_cmap(colormap)
+    scale = 0.0
+    if field_max > field_min:
+        scale = 65535 / (field_max - field_min)
 
-    if isinstance(cmap_limits[0], str):
-        cmap_limits[0] = min(cutoffs)
-    if isinstance(cmap_limits[1], str):
-        cmap_limits[1] = max(cutoffs)
+    with open(df3_name, "wb") as df3_file:
+        df3_file.write(np.array([nx, ny, nz], dtype=">u2").tobytes())
 
+        for start in range(0, nz, chunk_size):
+            block = np.asarray(field[:, :, start:(start + chunk_size)],
+                    dtype=np.float64)
+            block = (block - field_min) * scale
+            np.clip(block, 0, 65535, out=block)
 
-#    print(cmap_limits)
+            # df3 data is ordered [z][y][x]
+            block = np.rint(block).astype(">u2").transpose(2, 1, 0)
+            df3_file.write(block.tobytes())
 
+    return [field_min, field_max]
 
 
-    # Create string to store mesh information
-    mesh = ""
+def density_gradient(field, field_min, field_max):
+    """Estimate the POV-Ray max_gradient of a density file.
 
-    # Need to use union if more than one isosurface, esp. if using 
-    # povray's intersection or difference functions as an option
-    if len(cutoffs) > 1:
-        mesh += f"\nunion {{"
+    The density pattern fills the unit cube, so a change between 
+    neighboring grid points along x is a gradient of nx times that
+    change. Uses the largest change along each axis.
 
-    # Loop over cutoffs
-    for i in range(len(cutoffs)):
+    Args:
+      field (numpy array): Field values indexed by [x, y, z]
+      field_min (float): Field value that maps to density 0
+      field_max (float): Field value that maps to density 1
 
-        # Grab color from colormap
-        color = cm(i / len(cutoffs))
+    Returns:
+      float: Upper bound of the density gradient, with 10% to spare
 
-        #SCIKIT marching cubes function
-        # corners :: Coordinates of each vertex, just a list of values
-        # faces :: List of the vertices for each face by index value 
-        #          in corners variable
-        # normals :: Normal vector for each vertex, indices match 
-        #            corners variable
-        # values :: Value at each vertex; we don't care about these
-        corners, faces, normals, values = marching_cubes_lewiner(
-                field, cutoffs[i])
+    """
+    if field_max <= field_min:
+        return 1.0
 
-        print(f"Isosurface value: {cutoffs[i]}")
-        #print(f"{corners} corners")
-        #print(f"{faces} faces")
-        print(f"Color: {color}\n")
-
-        # Create mesh
-        mesh += f"\n\nmesh2 {{"
-
-        # Add VERTEX vectors
-        mesh += "\n\t// Vertex vectors"
-        vertex_params = write_mesh2_params("vertex_vectors", corners)
-        mesh += vertex_params
-
-        # Add NORMAL vectors
-        mesh += "\n\t// Normal vectors"
-        normal_params = write_mesh2_params("normal_vectors", normals)
-        mesh += normal_params
-
-        # Add FACE indices
-        mesh += "\n\t// Face indices"
-        face_params = write_mesh2_params("face_indices", faces, 
-                values_per_line=3)
-        mesh += face_params
-
-        # NORMAL indices
-        # Not required because vertices & normals have the same indices
-        # POV-Ray will use the values from faces_indices
-
-        mesh += (f"\n\tpigment {{ rgbt <"
-                + f"{color[0]:.4f}, {color[1]:.4f}, {color[2]:.4f}, "
-                + f"{transmit}> }}")
+    gradient = np.zeros(3)
+    for axis in range(3):
+        if field.shape[axis] > 1:
+            gradient[axis] = (field.shape[axis] 
+                    * np.amax(np.abs(np.diff(field, axis=axis))))
 
-        mesh += f"\n\t}}"
+    gradient /= field_max - field_min
+    return max(1.0, 1.1 * float(np.linalg.norm(gradient)))
 
-    # End union
-    if len(cutoffs) > 1:
-        mesh += f"\n}}\n\n"
 
-    return mesh
+def create_field_media(field, df3_name="field_media.df3", 
+        colormap="viridis", cmap_limits=["a","b"], field_range=None, 
+        intensity=1.0, opacity_power=1.0, num_colors=16, samples=30):
+    """Render the whole field as a glowing volume instead of surfaces.
 
+    The field is written to a .df3 density file with ``write_df3`` and
+    used as the density of an emitting media filling the field volume.
+    Every field value glows with its colormap color, dimmed by 
+    (relative field value)**opacity_power, so weak regions stay 
+    see-through and strong regions stand out. No meshing is needed, 
+    and a single object shows the complete field distribution.
 
-def write_mesh2_params(parameter, values, values_per_line=2):
-    """Convert isosurface parameters to the POV-Ray mesh2 format.
+    The volume uses the same coordinates as the mesh2 isosurfaces, so 
+    it works with ``slice_isosurface``, ``isosurface_unit_cell``, and
+    ``write_header_and_camera(isosurface=True)``. The df3 file name is
+    written into the .pov file as given.
 
     Args:
-      parameter (string): One of the mesh2 specifications, e.g. 
-          "vertex_vectors", "normal_vectors", "face_indices"
-      values (list): The values for the parameter variable, each 
-          element must be a list with three values
-      values_per_line (int, optional): Only place this many values on
-          a line for readability, defaults to 2
+      field (numpy array): Field values to render, e.g. from 
+          ``calc_field_mag`` or ``calc_energy_density``
+      df3_name (str, optional): Name of the density file 
+          (default "field_media.df3")
+      colormap (string, optional): Colormap name, defaults to "viridis"
+      cmap_limits (list, optional): colormap min and max values, 
+          defaults to field extrema if element is a character (set as 
+          ["a", "b"] by default)
+      field_range (list, optional): Field values that map to the
+          smallest and largest density (default None, field extrema)
+      intensity (float, optional): Brightness of the strongest field 
+          seen through the whole volume (default 1.0)
+      opacity_power (float, optional): Larger values hide more of the
+          weak field (default 1.0)
+      num_colors (int, optional): Number of color_map entries 
+          (default 16)
+      samples (int, optional): POV-Ray media samples, more is smoother
+          but slower (default 30)
 
     Returns:
-      string: Parameter data in POV-Ray mesh2 format
+      string: Media object
 
     """
-    param_string = f"\n\t{parameter} {{"
-    param_string += f"\n\t\t{len(values)}"
+    import pylab
+
+    nx, ny, nz = field.shape
+    num_colors = max(2, num_colors)
+
+    field_min, field_max = write_df3(df3_name, field, field_range)
+
+    cm = pylab.get_cmap(colormap)
+
+    # Don't fill in the shared default list
+    cmap_limits = list(cmap_limits)
+    if isinstance(cmap_limits[0], str):
+        cmap_limits[0] = field_min
+    if isinstance(cmap_limits[1], str):
+        cmap_limits[1] = field_max
+
+    # POV-Ray doesn't scale media with the object
+    emission = intensity / max(nx, ny, nz)
+
+    # The density pattern fills the unit cube, with grid point i at i/n
+    box_max = [(nx - 1) / nx, (ny - 1) / ny, (nz - 1) / nz]
+
+    media = f"\n\nbox {{"
+    media += f"\n\t<0, 0, 0>, <{box_max[0]}, {box_max[1]}, {box_max[2]}>"
+    media += f"\n\tpigment {{ rgbt 1 }}"
+    media += f"\n\thollow"
+    media += f"\n\tinterior {{ media {{"
+    media += f"\n\t\temission {emission}"
+    media += f"\n\t\tmethod 3"
+    media += f"\n\t\tintervals 1"
+    media += f"\n\t\tsamples {samples}"
+    media += f"\n\t\tdensity {{"
+    media += f"\n\t\t\tdensity_file df3 \"{df3_name}\" interpolate 1"
+    media += f"\n\t\t\tcolor_map {{"
 
-    for j in range(len(values)):
-        if j % 2 == 0:
-            param_string += "\n\t\t"
-        param_string += f"<{values[j][0]:.5f}, {values[j][1]:.5f}, "
-        param_string += f"{values[j][2]:.5f}>"
-        if j != (len(values) - 1):
-            param_string += ", "
-    param_string += f"\n\t\t}}"
+    for i in range(num_colors):
+        density = i / (num_colors - 1)
+        value = field_min + density * (field_max - field_min)
 
-    return param_string
+        fraction = 0.0
+        if cmap_limits[1] != cmap_limits[0]:
+            fraction = ((value - cmap_limits[0]) 
+                    / (cmap_limits[1] - cmap_limits[0]))
+        color = cm(min(1.0, max(0.0, fraction)))
+        weight = density**opacity_power
+
+        media += (f"\n\t\t\t\t[{density:.4f} rgb <"
+                + f"{weight * color[0]:.4f}, {weight * color[1]:.4f}, "
+                + f"{weight * color[2]:.4f}>]")
+
+    media += f"\n\t\t\t\t}}"
+    media += f"\n\t\t\t}}"
+    media += f"\n\t\t}} }}"
+    media += f"\n\tscale <{nx}, {ny}, {nz}>"
+    media += f"\n\t}}\n\n"
+
+    return media
 
 
 def slice_isosurface(mesh, n, cut_at=[[0.5, 1], [0.5, 1], [0, 1]],
@@ -211,6 +3760,67 @@ def slice_isosurface(mesh, n, cut_at=[[0.5, 1], [0.5, 1], [0, 1]],
     Returns:
       str: The modified mesh string
 
+    """
+    slice_string = create_slice_prism(n, cut_at=cut_at, 
+            subtract_box=subtract_box)
+
+    # Create the intersection
+    mesh = f"intersection {{" + mesh +  slice_string + f"\n}}\n\n\t"
+
+    return mesh
+
+
+def iter_slice_isosurface(mesh_chunks, n, 
+        cut_at=[[0.5, 1], [0.5, 1], [0, 1]], subtract_box=False):
+    """Slice a streamed isosurface with a user-specified prism.
+
+    Streaming version of ``slice_isosurface``. Wraps the chunks of the
+    mesh (e.g. from ``iter_mesh2``) in the intersection without ever
+    joining them into one string. The prism is created immediately,
+    before any of the mesh chunks are consumed.
+
+    Args:
+      mesh_chunks (iterable): Pieces of the mesh2 isosurface string
+      n (list): Dimensions of the numpy field array as [nx, ny, nz],
+          used as the isosurface dimensions
+      cut_at (list): Specify the section to remove, as a fraction of
+          the unit cell. (Default value = [[0.5, 1], [0.5, 1], [0, 1]])
+      subtract_box (bool, optional): Switch between POV-Ray's intersect
+          (if False) and difference (if True) functions (Default value
+          = False)
+
+    Returns:
+      iterator: Pieces of the modified mesh string
+
+    """
+    from itertools import chain
+
+    slice_string = create_slice_prism(n, cut_at=cut_at, 
+            subtract_box=subtract_box)
+
+    return chain([f"intersection {{"], mesh_chunks, 
+            [slice_string + f"\n}}\n\n\t"])
+
+
+def create_slice_prism(n, cut_at=[[0.5, 1], [0.5, 1], [0, 1]],
+        subtract_box=False):
+    """Create the prism used to slice the isosurface.
+
+    Used by ``slice_isosurface`` and ``iter_slice_isosurface``. The
+    cut_at values are converted from fractions of the unit cell to 
+    field coordinates in place.
+
+    Args:
+      n (list): Dimensions of the numpy field array as [nx, ny, nz],
+          used as the isosurface dimensions
+      cut_at (list): Specify the section to remove, as a fraction of
+          the unit cell. (Default value = [[0.5, 1], [0.5, 1], [0, 1]])
+      subtract_box (bool, optional): Adds the inverse keyword to the
+          prism if True (Default value = False)
+
+    Returns:
+      str: The prism string
+
     """
     # cut_at is used to set the limits
     for i in range(3):
@@ -255,22 +3865,365 @@ def slice_isosurface(mesh, n, cut_at=[[0.5, 1], [0.5, 1], [0, 1]],
 
     slice_string += f"\n\t}}"
 
-    # Create the intersection
-    mesh = f"intersection {{" + mesh +  slice_string + f"\n}}\n\n\t"
+    return slice_string
+
+
+def slice_bounds(n, cut_at=[[0.5, 1], [0.5, 1], [0, 1]]):
+    """Find the box that ``create_slice_prism`` cuts out.
+
+    Unlike ``create_slice_prism``, cut_at is not changed. The prism is
+    swept along POV-Ray's y axis, so the box bounds match it exactly,
+    including the small overshoot at the unit cell edges: the x limits
+    come from cut_at[1] and n[1], the y limits from cut_at[0] and n[0].
+
+    Args:
+      n (list): Dimensions of the numpy field array as [nx, ny, nz],
+          used as the isosurface dimensions
+      cut_at (list): Specify the section to remove, as a fraction of
+          the unit cell. (Default value = [[0.5, 1], [0.5, 1], [0, 1]])
+
+    Returns:
+      tuple: Lower and upper corner of the box, in isosurface 
+          coordinates
+
+    """
+    limits = []
+    for i in range(3):
+        assert min(cut_at[i]) >= 0,"Error: min(cut_at[i]) must be >= 0"
+        assert max(cut_at[i]) <= 1,"Error: max(cut_at[i]) must be <= 1"
+
+        limit = sorted(cut_at[i])
+        for j in range(2):
+            if limit[j] == 0:
+                limit[j] -= 0.001
+            if limit[j] == 1:
+                limit[j] += 0.001
+        limits.append([limit[0] * n[i], limit[1] * n[i]])
+
+    # Prism points are <x, z>, swept along y between the cut_at[0] limits
+    lower = [limits[1][0], limits[0][0], limits[2][0]]
+    upper = [limits[1][1], limits[0][1], limits[2][1]]
+
+    return lower, upper
+
+
+def clip_mesh(mesh, field, cutoff, lower, upper, subtract_box=False,
+        caps=False, cutoffs=None):
+    """Cut an isosurface with a box before it is written.
+
+    Does in NumPy what ``slice_isosurface`` leaves to POV-Ray: 
+    triangles crossing the box are split along its faces 
+    (``clip_mesh_to_box``) and the ones on the wrong side are dropped.
+    POV-Ray then only parses the part that is seen and doesn't need 
+    the CSG, which speeds up both parsing and rendering.
+
+    A mesh2 is only a surface, so the clipped isosurfaces are open 
+    where they were cut. With ``caps``, the cut is closed with flat 
+    faces covering the part of the box surface where the field is 
+    above the cutoff (``slice_caps``). Given all ``cutoffs``, a cap 
+    stops at the next higher cutoff, where the cap of the isosurface 
+    inside it begins, so nested caps don't overlap.
+
+    Args:
+      mesh (tuple): corners, faces, normals, and values
+      field (numpy array): Field values, only used for the caps
+      cutoff (float): Isosurface value, only used for the caps
+      lower (list): Lower corner of the box, e.g. from ``slice_bounds``
+      upper (list): Upper corner of the box
+      subtract_box (bool, optional): Remove the inside of the box (if
+          True) or keep only the inside (if False, default), like 
+          ``slice_isosurface``
+      caps (bool, optional): Close the cuts (default False)
+      cutoffs (list, optional): All isosurface values of the scene, 
+          only used for the caps (default None, caps are unbounded)
+
+    Returns:
+      tuple: corners, faces, normals, and values
+
+    """
+    num_before = len(mesh[1])
+    mesh = clip_mesh_to_box(*mesh, lower, upper, 
+            keep_inside=(not subtract_box))
+
+    if caps:
+        higher = [c for c in (cutoffs or []) if c > cutoff]
+        next_cutoff = min(higher) if higher else None
+        mesh = merge_meshes([mesh, slice_caps(field, cutoff, lower, upper,
+                subtract_box=subtract_box, next_cutoff=next_cutoff)])
+
+    print(f"Clipped isosurface {cutoff}: {num_before} -> "
+          + f"{len(mesh[1])} triangles")
 
     return mesh
 
 
-def process_field_array(field_array, center=True):
+def clip_mesh_to_box(corners, faces, normals, values, lower, upper,
+        keep_inside=True):
+    """Keep only the part of a mesh inside (or outside) of a box.
+
+    The mesh is split along the six faces of the box with 
+    ``split_mesh``, after which every triangle is entirely inside or 
+    outside, and the triangles on the wrong side are dropped.
+
+    Args:
+      corners (numpy array): Coordinates of each vertex
+      faces (numpy array): Vertex indices of each face
+      normals (numpy array): Normal vector of each vertex
+      values (numpy array): Field value at each vertex
+      lower (list): Lower corner of the box
+      upper (list): Upper corner of the box
+      keep_inside (bool, optional): Keep the inside (default True) or 
+          the outside of the box
+
+    Returns:
+      tuple: corners, faces, normals, and values
+
+    """
+    for axis in range(3):
+        for bound in [lower[axis], upper[axis]]:
+            corners, faces, normals, values, distance = split_mesh(
+                    corners, faces, normals, values, 
+                    corners[:, axis] - bound)
+
+    centers = np.mean(corners[faces], axis=1)
+    inside = np.all((centers >= lower) & (centers <= upper), axis=1)
+    if not keep_inside:
+        inside = ~inside
+
+    return remove_unused_vertices(corners, faces[inside], normals, values)
+
+
+def split_mesh(corners, faces, normals, values, distance):
+    """Split the triangles of a mesh where a scalar crosses zero.
+
+    ``distance`` is any scalar given at the vertices, e.g. the signed
+    distance to a plane. Each triangle that has vertices on both sides
+    of zero is replaced by three triangles, which are each entirely on
+    one side. The new vertices are placed on the edges by linear 
+    interpolation, shared between the triangles of an edge, and get 
+    interpolated normals and values. The face orientation is kept.
+
+    Args:
+      corners (numpy array): Coordinates of each vertex
+      faces (numpy array): Vertex indices of each face
+      normals (numpy array): Normal vector of each vertex
+      values (numpy array): Field value at each vertex
+      distance (numpy array): Scalar at each vertex
+
+    Returns:
+      tuple: corners, faces, normals, values, and distance, with the 
+          new vertices (distance 0) appended
+
+    """
+    faces = np.asarray(faces, dtype=np.int64)
+    distance = np.asarray(distance, dtype=np.float64)
+
+    positive = (distance > 0)[faces]
+    num_positive = np.sum(positive, axis=1)
+    crossing = (num_positive == 1) | (num_positive == 2)
+
+    if not np.any(crossing):
+        return corners, faces, normals, values, distance
+
+    split = faces[crossing]
+    positive = positive[crossing]
+
+    # Rotate every face so that the vertex alone on its side comes 
+    # first, which keeps the orientation
+    alone = np.argmax(positive == (num_positive[crossing] == 1)[:, None],
+            axis=1)
+    rows = np.arange(len(split))[:, None]
+    split = split[rows, (alone[:, None] + np.arange(3)) % 3]
+
+    # One new vertex per crossed edge, shared by both faces of the edge
+    edges = np.concatenate([split[:, [0, 1]], split[:, [0, 2]]])
+    edges = np.sort(edges, axis=1)
+    edges, edge_index = np.unique(edges, axis=0, return_inverse=True)
+    edge_index = edge_index.reshape(2, -1) + len(corners)
+
+    start = distance[edges[:, 0]]
+    weight = (start / (start - distance[edges[:, 1]]))[:, None]
+
+    def interpolate(array):
+        array = np.asarray(array)
+        first = array[edges[:, 0]].astype(np.float64)
+        last = array[edges[:, 1]].astype(np.float64)
+        if array.ndim == 1:
+            new = first + weight[:, 0] * (last - first)
+        else:
+            new = first + weight * (last - first)
+        return np.concatenate([array, new.astype(array.dtype)])
+
+    corners = interpolate(corners)
+    values = interpolate(values)
+    normals = interpolate(normals)
+    length = np.linalg.norm(normals[-len(edges):], axis=1)[:, None]
+    normals[-len(edges):] /= np.where(length > 0, length, 1)
+    distance = np.concatenate([distance, np.zeros(len(edges))])
+
+    # Vertex alone on its side, then the quad left on the other side
+    a, b, c = split[:, 0], split[:, 1], split[:, 2]
+    ab, ac = edge_index
+    faces = np.concatenate([faces[~crossing], 
+            np.stack([a, ab, ac], axis=1),
+            np.stack([ab, b, c], axis=1),
+            np.stack([ab, c, ac], axis=1)])
+
+    return corners, faces, normals, values, distance
+
+
+def slice_caps(field, cutoff, lower, upper, subtract_box=False,
+        next_cutoff=None):
+    """Create flat faces closing the cuts of a clipped isosurface.
+
+    Every box face inside the field volume is sampled on the grid, 
+    triangulated, and clipped to where the field is above the cutoff
+    (assuming the field is larger inside the isosurfaces). With 
+    ``next_cutoff``, the cap is also clipped to where the field is at 
+    most ``next_cutoff``, so it only covers the band between the two 
+    isosurfaces. The normals point away from the part of the 
+    isosurface that is kept.
+
+    Args:
+      field (numpy array): Field values
+      cutoff (float): Isosurface value
+      lower (list): Lower corner of the box
+      upper (list): Upper corner of the box
+      subtract_box (bool, optional): The inside of the box is removed
+          (if True) or kept (if False, default)
+      next_cutoff (float, optional): Next higher isosurface value 
+          (default None, no upper limit)
+
+    Returns:
+      tuple: corners, faces, normals, and values of the caps
+
+    """
+    shape = field.shape
+    caps = []
+
+    for axis in range(3):
+        b_axis, c_axis = [i for i in range(3) if i != axis]
+
+        # Part of the box face that lies within the field
+        b_range = [max(0, lower[b_axis]), min(shape[b_axis] - 1, 
+                upper[b_axis])]
+        c_range = [max(0, lower[c_axis]), min(shape[c_axis] - 1, 
+                upper[c_axis])]
+        if b_range[0] >= b_range[1] or c_range[0] >= c_range[1]:
+            continue
+
+        b_coords = np.unique(np.concatenate([b_range, 
+                np.arange(np.ceil(b_range[0]), b_range[1])]))
+        c_coords = np.unique(np.concatenate([c_range, 
+                np.arange(np.ceil(c_range[0]), c_range[1])]))
+        num_b, num_c = len(b_coords), len(c_coords)
+
+        # Two triangles per grid square
+        grid = np.arange(num_b * num_c).reshape(num_b, num_c)
+        v00 = grid[:-1, :-1].ravel()
+        v10 = grid[1:, :-1].ravel()
+        v01 = grid[:-1, 1:].ravel()
+        v11 = grid[1:, 1:].ravel()
+        square_faces = np.concatenate([np.stack([v00, v10, v11], axis=1),
+                np.stack([v00, v11, v01], axis=1)])
+
+        for side, bound in enumerate([lower[axis], upper[axis]]):
+            if bound < 0 or bound > shape[axis] - 1:
+                continue
+
+            corners = np.zeros((num_b * num_c, 3))
+            corners[:, axis] = bound
+            corners[:, b_axis] = np.repeat(b_coords, num_c)
+            corners[:, c_axis] = np.tile(c_coords, num_b)
+
+            values = interpolate_field(field, corners)
+
+            # Outward normal of the kept part
+            direction = [-1.0, 1.0][side]
+            if subtract_box:
+                direction *= -1
+            normals = np.zeros_like(corners)
+            normals[:, axis] = direction
+
+            corners, faces, normals, values, distance = split_mesh(
+                    corners, square_faces, normals, values, 
+                    values - cutoff)
+            faces = faces[np.amax(distance[faces], axis=1) > 0]
+
+            # Leave the band above the next cutoff to its own cap
+            if next_cutoff is not None:
+                corners, faces, normals, values, distance = split_mesh(
+                        corners, faces, normals, values, 
+                        values - next_cutoff)
+                faces = faces[np.amin(distance[faces], axis=1) < 0]
+
+            # Wind the faces to match the normals
+            if (direction > 0) != ((c_axis - b_axis) % 3 == 1):
+                faces = faces[:, [0, 2, 1]]
+
+            caps.append(remove_unused_vertices(corners.astype(np.float32),
+                    faces, normals.astype(np.float32), 
+                    values.astype(np.float32)))
+
+    return merge_meshes(caps)
+
+
+def interpolate_field(field, points):
+    """Trilinearly interpolate a field at arbitrary points.
+
+    Points outside the field are moved to its edge.
+
+    Args:
+      field (numpy array): Field values indexed by [x, y, z]
+      points (numpy array): Coordinates in grid units, as an [N, 3]
+          array
+
+    Returns:
+      numpy array: Field value at every point
+
+    """
+    points = np.asarray(points, dtype=np.float64)
+    shape = np.array(field.shape[:3])
+
+    points = np.clip(points, 0, shape - 1)
+    first = np.clip(np.floor(points), 0, np.maximum(shape - 2, 0))
+    first = first.astype(np.int64)
+    last = np.minimum(first + 1, shape - 1)
+    weight = points - first
+
+    result = np.zeros(len(points))
+    for corner in range(8):
+        index = []
+        corner_weight = np.ones(len(points))
+        for axis in range(3):
+            if (corner >> axis) & 1:
+                index.append(last[:, axis])
+                corner_weight *= weight[:, axis]
+            else:
+                index.append(first[:, axis])
+                corner_weight *= 1 - weight[:, axis]
+        result += corner_weight * field[tuple(index)]
+
+    return result
+
+
+def process_field_array(field_array, center=True, dtype=None):
     """Extract field data and dimensionality from simulation data.
     
     POV-Ray and mayavi can't interpret the simulation's output array.
 
+    Passing ``dtype=np.complex64`` gives a single precision pipeline:
+    the data is cast as it is copied, and the extract_* and calc_* 
+    functions keep that precision (complex64/float32), halving the 
+    memory needed. This is plenty for placing isosurfaces.
+
     Args:
       field_array(np.array): simulation output array indexed by
           [z_idx, y_idx, h_idx, E/H, (x, y, z)]
       center(bool, optional): whether to move the origin to the center
           (default True)
+      dtype(numpy dtype, optional): Cast the field to this type, e.g.
+          np.complex64 (default None, keep the stored type)
 
     Returns:
       tuple: Electric or magnetic field numpy array and the array
@@ -293,26 +4246,89 @@ def process_field_array(field_array, center=True):
     nx, ny, nz, _, _ = field_array.shape
 
     if center:
-        field_array = double_roll(field_array, nx//2, ny//2)
+        field_array = double_roll(field_array, nx//2, ny//2, dtype=dtype)
+    elif dtype is not None:
+        field_array = field_array.astype(dtype)
     return field_array, nx, ny, nz
 
 
-def double_roll(array, n0, n1):
+def process_field_component(field_array, field_type="E", component=None,
+        center=True, dtype=None):
+    """Extract a single field from simulation data.
+
+    A leaner alternative to ``process_field_array`` followed by 
+    ``extract_e_field`` or ``extract_h_field``. The E or H field (and
+    optionally a single vector component) is selected before the 
+    axes are flipped, swapped and rolled, and everything but the roll
+    is a view. Only the requested data is copied, once, instead of the
+    full array holding both fields.
+
+    Args:
+      field_array(np.array): simulation output array indexed by
+          [z_idx, y_idx, h_idx, E/H, (x, y, z)]
+      field_type(str, optional): "E" or "H" (default "E")
+      component(int, optional): Only return this vector component (0,
+          1, 2 for x, y, z) of the field (default None, all three)
+      center(bool, optional): whether to move the origin to the center
+          (default True)
+      dtype(numpy dtype, optional): Cast the field to this type, e.g.
+          np.complex64 (default None, keep the stored type)
+
+    Returns:
+      tuple: Electric or magnetic field numpy array, indexed by
+          [x, y, z, (x, y, z)] or [x, y, z] if ``component`` is given,
+          and the array dimensionality as integers
+
+    Raises:
+      RuntimeError: The input array must be 5D
+
+    """
+    if field_array.ndim != 5:
+        raise RuntimeError("field_array must be 5D")
+
+    nz, ny, nx = field_array.shape[:3]
+    field = read_field_block(field_array, 0, nz, field_type=field_type,
+            center=center, component=component, dtype=dtype)
+
+    return field, nx, ny, nz
+
+
+def double_roll(array, n0, n1, dtype=None):
     """Roll the input array along two axes and return the result.
     
     Required because the order of the axes is flipped between S4 and
     what both POV-Ray and mayavi expect.
 
+    Same result as rolling along each axis with ``np.roll``, but the
+    four quadrants are copied straight into the output, so the data is
+    only copied once.
+
     Args:
       array(np.array): array to shift. must be >= 2 dimensional
       n0(int): number of elements to shift along first axis
       n1(int): number of elements to shift along second axis
+      dtype(numpy dtype, optional): Cast the copy to this type (default
+          None, same type as the input)
 
     Returns:
       np.array: Copy of the input array shifted by n0, n1
 
     """
-    return np.copy(np.roll(np.roll(array, n0, axis=0), n1, axis=1))
+    array = np.asarray(array)
+    size0, size1 = array.shape[:2]
+    n0 = n0 % size0 if size0 else 0
+    n1 = n1 % size1 if size1 else 0
+
+    result = np.empty_like(array, dtype=dtype)
+
+    # Element i of the input ends up at element i + n
+    for src0, dst0 in [[slice(0, size0 - n0), slice(n0, size0)],
+            [slice(size0 - n0, size0), slice(0, n0)]]:
+        for src1, dst1 in [[slice(0, size1 - n1), slice(n1, size1)],
+                [slice(size1 - n1, size1), slice(0, n1)]]:
+            result[dst0, dst1] = array[src0, src1]
+
+    return result
 
 
 def extract_components(field):
@@ -393,17 +4409,19 @@ def calc_field_mag(field):
       np.array: Field magnitude
 
     """
-    from util import deep_access
+    # |F|^2 = sum(Re(F_i)^2 + Im(F_i)^2), computed straight from views 
+    # of the real and imaginary parts, so there is only one full-size 
+    # (real) array, which is square rooted in place
 
-    # First, we multiply the field by its complex conjugate.
-    # (This effectively squares the values of the vector components.)
-    # Second, we take the real component. (Multiplying by the complex
-    # conjugate guarantees a real result, it is still type complex.)
-    # Third, we sum the vector components (x*x + y*y + z*z).
-    # Finally, we take the square root.
+    # mag is always floating point, so integer fields work too
+    field = np.asarray(field)
+    dtype = np.result_type(field.real, np.float32)
+    mag = np.einsum("...i,...i->...", field.real, field.real, dtype=dtype)
+    if np.iscomplexobj(field):
+        mag += np.einsum("...i,...i->...", field.imag, field.imag, 
+                dtype=dtype)
 
-    return np.sqrt(np.sum(np.real(np.multiply(field,
-                                              np.conj(field))), axis=-1))
+    return np.sqrt(mag, out=mag)
 
 
 def calc_energy_density(e_field, h_field, eps_arr):
@@ -418,6 +4436,114 @@ def calc_energy_density(e_field, h_field, eps_arr):
       np.array: Local energy density
 
     """
-    e_mag = calc_field_mag(e_field)
+    def fits(out, other):
+        # The result can be written into out without changing its type
+        # or shape (not for a complex eps_arr, which lossy materials 
+        # have, or one that broadcasts to a larger shape)
+        return (np.result_type(out, other) == out.dtype and 
+                np.broadcast_shapes(out.shape, np.shape(other)) == out.shape)
+
+    energy = calc_field_mag(e_field)
+    if fits(energy, eps_arr):
+        np.divide(energy, eps_arr, out=energy)
+    else:
+        energy = energy / eps_arr
+
     h_mag = calc_field_mag(h_field)
-    return 0.5 * (np.divide(e_mag, eps_arr) + h_mag)
+    if fits(energy, h_mag):
+        energy += h_mag
+    else:
+        energy = energy + h_mag
+    del h_mag
+
+    energy *= 0.5
+    return energy
+
+
+def calc_field_quantities(field_array, quantities=["e_mag"], eps_arr=None,
+        chunk_size=32):
+    """Calculate several field quantities in one pass over the data.
+
+    Reads the field array one block of x-layers at a time and squares
+    every vector component once, then fills all of the requested 
+    quantities from those squares. The outputs are allocated up front 
+    and the temporaries are the size of a block, so this is much 
+    lighter on memory than separate ``calc_field_mag`` and 
+    ``calc_energy_density`` calls, and it works on memory-mapped 
+    arrays.
+
+    Valid quantities are
+    * "e_mag", "h_mag": field magnitudes
+    * "ex", "ey", "ez", "hx", "hy", "hz": magnitude of each component
+    * "energy": local energy density, as in ``calc_energy_density``
+
+    Args:
+      field_array(np.array): Processed field array indexed by
+          [x, y, z, E/H, (x, y, z)], i.e. ``process_field_array`` output
+      quantities(list, optional): Quantities to calculate 
+          (default ["e_mag"])
+      eps_arr(np.array, optional): Array of epsilon values, or a 
+          single value, required for "energy" (default None)
+      chunk_size(int, optional): Number of x-layers to process at a 
+          time (default 32)
+
+    Returns:
+      dict: The requested quantities as [x, y, z] numpy arrays
+
+    Raises:
+      RuntimeError: The input array must be 5D
+      ValueError: Unknown quantity, or "energy" without eps_arr
+
+    """
+    components = {"ex": [0, 0], "ey": [0, 1], "ez": [0, 2], 
+            "hx": [1, 0], "hy": [1, 1], "hz": [1, 2]}
+    magnitudes = {"e_mag": 0, "h_mag": 1}
+
+    if field_array.ndim != 5:
+        raise RuntimeError("field_array must be 5D")
+    for quantity in quantities:
+        if (quantity not in components and quantity not in magnitudes
+                and quantity != "energy"):
+            raise ValueError(f"Unknown field quantity '{quantity}'")
+    if "energy" in quantities and eps_arr is None:
+        raise ValueError("eps_arr is required for the energy density")
+
+    shape = field_array.shape[:3]
+    dtype = np.finfo(np.result_type(field_array.dtype, np.float32)).dtype
+    results = {quantity: np.empty(shape, dtype=dtype) 
+            for quantity in quantities}
+
+    if eps_arr is not None:
+        eps_arr = np.broadcast_to(eps_arr, shape)
+        if "energy" in results:
+            # Complex for lossy materials
+            results["energy"] = np.empty(shape, 
+                    dtype=np.result_type(dtype, eps_arr))
+
+    for start in range(0, shape[0], chunk_size):
+        stop = min(start + chunk_size, shape[0])
+        block = np.asarray(field_array[start:stop])
+
+        # Squared magnitude of every component, indexed by 
+        # [x, y, z, E/H, (x, y, z)]
+        squares = np.square(block.real)
+        if np.iscomplexobj(block):
+            squares += np.square(block.imag)
+
+        for quantity, [index, axis] in components.items():
+            if quantity in results:
+                np.sqrt(squares[..., index, axis], 
+                        out=results[quantity][start:stop])
+
+        field_mags = np.sqrt(np.sum(squares, axis=-1))
+        for quantity, index in magnitudes.items():
+            if quantity in results:
+                results[quantity][start:stop] = field_mags[..., index]
+
+        if "energy" in results:
+            energy = results["energy"][start:stop]
+            np.divide(field_mags[..., 0], eps_arr[start:stop], out=energy)
+            energy += field_mags[..., 1]
+            energy *= 0.5
+
+    return results
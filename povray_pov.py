@@ -265,20 +265,47 @@ def write_pov_file(pov_name, pov_string):
     are present if the user appears to be calling information from the
     include files. Everything is written to the file pov_name.
 
+    Instead of a single string, pov_string can also be any iterable of
+    strings (e.g. the chunks generated by ``iter_mesh2`` or 
+    ``iter_device``). The chunks are written as they arrive, so the 
+    full scene never has to exist in memory.
+
     Args:
       pov_name (string): Name to give the .pov file
-      pov_string (string): String describing the header, camera
-          information, and the device string
+      pov_string (string or iterable): String describing the header,
+          camera information, and the device string, or an iterable
+          of strings making up the same
 
     Returns:
 
     """
-    import os
+    if isinstance(pov_string, str):
+        pov_string = [pov_string]
 
     fileID = open(pov_name, "w")
-    fileID.write(pov_string)
+    for chunk in pov_string:
+        fileID.write(chunk)
     fileID.close()
 
+    check_include_files(pov_name)
+
+    return
+
+
+def check_include_files(pov_name):
+    """Make sure include files are declared if they are being used.
+
+    Called by ``write_pov_file``. Use it directly if you write the .pov
+    file yourself, e.g. by streaming the isosurface into an open file.
+
+    Args:
+      pov_name (string): Name of the .pov file
+
+    Returns:
+
+    """
+    import os
+
     using_include_file = False
 
     # Anything from the include files is "keyword { OneWord }"
@@ -0,0 +1,567 @@
+"""Typed scene graph for building POV-Ray scene descriptions.
+
+The device is built as a tree of small nodes instead of by adding
+strings together, and turned into POV-Ray code in a single pass at the
+end. The text of every node matches what the string functions in
+povray_shapes have always written, so the .pov files don't change.
+
+A quick summary:
+  * Node is the base class: iter_pov yields the POV-Ray code in
+    pieces, to_pov (or str) joins them once, and write sends them to
+    a file without building the whole string
+  * Raw holds POV-Ray code as text (comments, #declares, anything
+    without a node of its own) and Group holds a list of nodes
+  * Cylinder, Ellipse, Box, Prism, Slab, Torus and Sphere are the
+    primitives; the device features are left open so that a texture
+    can be added before they are closed
+  * CSG is a union, merge, difference or intersection of other nodes
+  * Texture is a pigment and finish, Textured adds one to a node and
+    closes it
+  * Transform, Object and Declare place declared objects
+"""
+
+
+class Node:
+    """Base class of all scene nodes."""
+
+    __slots__ = ()
+
+    def iter_pov(self):
+        """Generate the POV-Ray code of the node in pieces.
+
+        Yields:
+          str: Consecutive pieces of the POV-Ray code
+
+        """
+        raise NotImplementedError
+
+    def to_pov(self):
+        """Return the POV-Ray code of the node as a single string.
+
+        Returns:
+          str: POV-Ray code
+
+        """
+        return "".join(self.iter_pov())
+
+    def write(self, output):
+        """Write the POV-Ray code of the node, piece by piece.
+
+        Args:
+          output (file): Open file (or any object with a write method)
+
+        """
+        for chunk in self.iter_pov():
+            output.write(chunk)
+
+    def __str__(self):
+        return self.to_pov()
+
+
+class Raw(Node):
+    """POV-Ray code that is written as is.
+
+    Args:
+      text (str): POV-Ray code
+
+    """
+
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+    def iter_pov(self):
+        yield self.text
+
+
+class Group(Node):
+    """A list of nodes, written one after another.
+
+    Args:
+      children (list, optional): Nodes (or strings) in the group
+          (default None, start empty)
+
+    """
+
+    __slots__ = ("children",)
+
+    def __init__(self, children=None):
+        self.children = []
+        if children is not None:
+            self.extend(children)
+
+    def append(self, node):
+        """Add a node (or a string of POV-Ray code) to the group.
+
+        Args:
+          node (Node or str): Node to add; strings are added as Raw
+
+        """
+        if isinstance(node, str):
+            node = Raw(node)
+        self.children.append(node)
+
+    def extend(self, nodes):
+        """Add several nodes to the group.
+
+        Args:
+          nodes (list): Nodes (or strings) to add
+
+        """
+        for node in nodes:
+            self.append(node)
+
+    def iter_pov(self):
+        for child in self.children:
+            yield from child.iter_pov()
+
+
+class Cylinder(Node):
+    """Cylindrical pillar along the z-axis.
+
+    Args:
+      center (list): Point on the x,y-plane where the shape is centered
+      end (list): Limits on the z-dimensions, as [upper, lower]
+      radius (float): Cylinder radius
+      closed (bool, optional): Close the object (for silos, default
+          False, left open for a texture)
+
+    """
+
+    __slots__ = ("center", "end", "radius", "closed")
+
+    def __init__(self, center, end, radius, closed=False):
+        self.center = center
+        self.end = end
+        self.radius = radius
+        self.closed = closed
+
+    def iter_pov(self):
+        center, end = self.center, self.end
+
+        yield (f"cylinder \n\t\t{{\n\t\t "
+                + f"<{center[0]}, {center[1]}, {end[0]:.5f}>, \n\t\t"
+                + f"<{center[0]}, {center[1]}, {end[1]:.5f}>, \n\t\t")
+
+        if self.closed:
+            yield f"{self.radius} }}\n\t\t"
+        else:
+            yield f"{self.radius}\n\t\t"
+
+
+class Ellipse(Node):
+    """Elliptical pillar along the z-axis.
+
+    Args:
+      center (list): Point on the x,y-plane where the shape is centered
+      end (list): Limits on the z-dimensions, as [upper, lower]
+      halfwidths (list): Semi-major and semi-minor axes
+      angle (float, optional): Rotation angle (deg) about its center
+          (default 0)
+      closed (bool, optional): Close the object (default False)
+
+    """
+
+    __slots__ = ("center", "end", "halfwidths", "angle", "closed")
+
+    def __init__(self, center, end, halfwidths, angle=0, closed=False):
+        self.center = center
+        self.end = end
+        self.halfwidths = halfwidths
+        self.angle = angle
+        self.closed = closed
+
+    def iter_pov(self):
+        center, end, halfwidths = self.center, self.end, self.halfwidths
+
+        # Start with radius=1, then scale to shape
+        yield (f"cylinder \n\t\t{{\n\t\t "
+                + f"<0, 0, {end[0]:.5f}>, \n\t\t"
+                + f"<0, 0, {end[1]:.5f}>, \n\t\t"
+                + f"1\n\t\t"
+                + f"scale <{halfwidths[0]}, {halfwidths[1]}, 1>\n\t\t")
+
+        if self.angle != 0:      # in degrees
+            yield f"rotate <0, 0, {self.angle}> \n\t\t"
+        if center != [0, 0]:
+            yield f"translate <{center[0]}, {center[1]}, 0> \n\t\t"
+
+        if self.closed:
+            yield f"}}\n\t\t"
+
+
+class Box(Node):
+    """Rectangular box, rotated about its center.
+
+    Args:
+      center (list): Point on the x,y-plane where the shape is centered
+      end (list): Limits on the z-dimensions, as [upper, lower]
+      halfwidths (list): Halfwidths in the x- and y-directions
+      angle (float, optional): Rotation angle (deg) about its center
+          (default 0)
+      closed (bool, optional): Close the object (default False)
+
+    """
+
+    __slots__ = ("center", "end", "halfwidths", "angle", "closed")
+
+    def __init__(self, center, end, halfwidths, angle=0, closed=False):
+        self.center = center
+        self.end = end
+        self.halfwidths = halfwidths
+        self.angle = angle
+        self.closed = closed
+
+    def iter_pov(self):
+        center, end, halfwidths = self.center, self.end, self.halfwidths
+
+        # Spawn at origin, then rotate
+        yield (f"box\n\t\t{{\n\t\t"
+                + f"<-{halfwidths[0]}, -{halfwidths[1]}, {end[0]:.5f}>\n\t\t"
+                + f"<{halfwidths[0]} {halfwidths[1]}, {end[1]:.5f}>\n\t\t")
+
+        if self.angle != 0:      # in degrees
+            yield f"rotate <0, 0, {self.angle}> \n\t\t"
+        if center != [0, 0]:
+            yield f"translate <{center[0]}, {center[1]}, 0> \n\t\t"
+
+        if self.closed:
+            yield f"}}\n\t\t"
+
+
+class Prism(Node):
+    """Polygonal prism, closed automatically.
+
+    Args:
+      center (list): Point on the x,y-plane where the shape is centered
+      end (list): Limits on the z-dimensions, as [upper, lower]
+      vertices (list): The x-,y-coordinates of the polygon
+      z_translate (float): Translation along z after rotating the
+          prism into place
+      angle (float, optional): Rotation angle (deg) about its center
+          (default 0)
+      closed (bool, optional): Close the object (default False)
+
+    """
+
+    __slots__ = ("center", "end", "vertices", "z_translate", "angle",
+            "closed")
+
+    def __init__(self, center, end, vertices, z_translate, angle=0,
+            closed=False):
+        self.center = center
+        self.end = end
+        self.vertices = vertices
+        self.z_translate = z_translate
+        self.angle = angle
+        self.closed = closed
+
+    def iter_pov(self):
+        center, end, vertices = self.center, self.end, self.vertices
+
+        # Povray requires that you close the shape
+        # The first and last point must be the same
+        yield (f"prism\n\t\t{{\n\t\t"
+                + "linear_sweep \n\t\tlinear_spline \n\t\t"
+                + f"{end[0]:.5f}, {end[1]:.5f}, {len(vertices) + 1} \n\t\t")
+
+        yield "".join([f"<{vertex[0]}, {vertex[1]}>, "
+                for vertex in vertices])
+        yield f"<{vertices[0][0]}, {vertices[0][1]}>\n\t\t"
+
+        yield (f"rotate <90, 0, {self.angle}> \n\t\t"
+                + f"translate <{center[0]}, {center[1]}, "
+                + f"{self.z_translate}> \n\t\t")
+
+        if self.closed:
+            yield f"}}\n\t\t"
+
+
+class Slab(Node):
+    """Slab spanned by two lattice vectors (substrate, coatings).
+
+    Args:
+      points (list): The x-,y-coordinates of the corners, centered on
+          the origin
+      end (list): Limits on the z-dimensions before rotating, as
+          [lower, upper]
+      translate (list): Final position of the slab
+
+    """
+
+    __slots__ = ("points", "end", "translate")
+
+    def __init__(self, points, end, translate):
+        self.points = points
+        self.end = end
+        self.translate = translate
+
+    def iter_pov(self):
+        points, end, translate = self.points, self.end, self.translate
+
+        # Adding teensy extra height to prevent weird artifacts
+        yield (f"prism\n\t\t{{\n\t\t"
+                + "linear_sweep \n\t\tlinear_spline \n\t\t"
+                + f"{end[0]}, {end[1]*1.000001}, {len(points)+1} \n\t\t")
+
+        yield "".join([f"<{point[0]:.6f}, {point[1]:.6f}>, "
+                for point in points])
+        yield f"<{points[0][0]:.6f}, {points[0][1]:.6f}> \n\t\t"
+
+        yield "rotate <90, 0, 0> \n\t\t"
+        yield (f"translate <{translate[0]}, {translate[1]}, "
+                + f"{translate[2]:.6f}>")
+        yield "\n\t\t"
+
+
+class Torus(Node):
+    """Circular or elliptical torus for accent lines.
+
+    Args:
+      major_radius (float): Radius of the (smaller axis of the) torus
+      minor_radius (float): Line thickness
+      center (list): The x-,y-coordinates of the center
+      z_top (float): The z-coordinate of the center
+      color (list): Line color as rgb
+      scale (list, optional): Scaling of the x- and y-axes for
+          elliptical tori (default None, circular)
+      angle (float, optional): Rotation angle (deg) about the z-axis
+          (default 0)
+
+    """
+
+    __slots__ = ("major_radius", "minor_radius", "center", "z_top",
+            "color", "scale", "angle")
+
+    def __init__(self, major_radius, minor_radius, center, z_top, color,
+            scale=None, angle=0):
+        self.major_radius = major_radius
+        self.minor_radius = minor_radius
+        self.center = center
+        self.z_top = z_top
+        self.color = color
+        self.scale = scale
+        self.angle = angle
+
+    def iter_pov(self):
+        center, color = self.center, self.color
+
+        yield (f"torus\n\t\t{{\n\t\t\t"
+                + f"{self.major_radius}, {self.minor_radius}\n\t\t\t"
+                + f"pigment {{ color rgbft "
+                + f"<{color[0]}, {color[1]}, {color[2]}, 0, 0> "
+                + f"}}\n\t\t\t"
+                + "rotate <90, 0, 0>\n\t\t\t"
+                + f"translate <{center[0]}, {center[1]}, {self.z_top}>\n\t\t")
+
+        if self.scale is not None:
+            yield f"scale <{self.scale[0]}, {self.scale[1]}, 1>\n\t\t\t"
+
+        if self.angle != 0:      # in degrees
+            yield f"rotate <0, 0, {self.angle}> \n\t\t"
+
+        yield f"no_shadow\n\t\t}}\n\t"
+
+
+class Sphere(Node):
+    """Sphere for accent line corners.
+
+    Args:
+      radius (float): Sphere radius
+      center (list): The x-,y-,z-coordinates of the center
+      color (list): Sphere color as rgb
+
+    """
+
+    __slots__ = ("radius", "center", "color")
+
+    def __init__(self, radius, center, color):
+        self.radius = radius
+        self.center = center
+        self.color = color
+
+    def iter_pov(self):
+        center, color = self.center, self.color
+
+        yield (f"sphere\n\t\t{{\n\t\t"
+                + f"<{center[0]}, {center[1]}, {center[2]}>, "
+                + f"{self.radius}\n\t\t"
+                + f"pigment {{ color rgbft "
+                + f"<{color[0]}, {color[1]}, {color[2]}, 0, 0> "
+                + f"}}\n\t\t"
+                + f"no_shadow\n\t\t}}\n\t")
+
+
+class CSG(Node):
+    """Constructive solid geometry of other nodes.
+
+    Args:
+      operation (str): "union", "merge", "difference", or
+          "intersection"
+      children (list, optional): Nodes combined by the operation
+          (default None, start empty)
+      opening (str, optional): Whitespace and brace after the
+          operation (default "\\n\\t{\\n\\t")
+      closing (str, optional): Closing brace; empty if a texture
+          closes it (default "}\\n\\t")
+
+    """
+
+    __slots__ = ("operation", "children", "opening", "closing")
+
+    def __init__(self, operation, children=None, opening="\n\t{\n\t",
+            closing="}\n\t"):
+        self.operation = operation
+        self.children = Group(children)
+        self.opening = opening
+        self.closing = closing
+
+    def append(self, node):
+        """Add a node (or a string of POV-Ray code) to the operation.
+
+        Args:
+          node (Node or str): Node to add; strings are added as Raw
+
+        """
+        self.children.append(node)
+
+    def iter_pov(self):
+        yield f"{self.operation}{self.opening}"
+        yield from self.children.iter_pov()
+        yield self.closing
+
+
+class Texture(Node):
+    """Pigment and finish of an object.
+
+    Args:
+      color (tuple or str): Color as rgbft, or the name of a color
+          from the POV-Ray include files
+      finish (str): Finish name
+      finish_string (str, optional): Finish statement; None uses the
+          finish of that name from the POV-Ray include files (default
+          None)
+
+    """
+
+    __slots__ = ("color", "finish", "finish_string")
+
+    def __init__(self, color, finish, finish_string=None):
+        self.color = color
+        self.finish = finish
+        self.finish_string = finish_string
+
+    def iter_pov(self):
+        color = self.color
+
+        if isinstance(color, str):
+            yield f"pigment {{ {color} }}\n\t\t"
+        else:
+            yield (f"pigment {{ color rgbft "
+                    + f"<{color[0]}, {color[1]}, {color[2]}, {color[3]}, "
+                    + f"{color[4]}>"
+                    + f" }}\n\t\t")
+
+        if self.finish_string is None:
+            yield f"finish {{ {self.finish} }}\n\t\t"
+        else:
+            yield self.finish_string
+
+
+class Textured(Node):
+    """An open object followed by its texture and closing brace.
+
+    Args:
+      node (Node): Object left open, e.g. a Cylinder or a CSG without
+          a closing brace
+      texture (Texture): Pigment and finish
+
+    """
+
+    __slots__ = ("node", "texture")
+
+    def __init__(self, node, texture):
+        self.node = node
+        self.texture = texture
+
+    def iter_pov(self):
+        yield from self.node.iter_pov()
+        yield from self.texture.iter_pov()
+
+        # Close object
+        yield f"}}\n\n\t"
+
+
+class Transform(Node):
+    """A single transformation, e.g. translate <x, y, z>.
+
+    Args:
+      kind (str): "translate", "rotate", or "scale"
+      vector (list): The x-,y-,z-components
+
+    """
+
+    __slots__ = ("kind", "vector")
+
+    def __init__(self, kind, vector):
+        self.kind = kind
+        self.vector = vector
+
+    def iter_pov(self):
+        vector = self.vector
+        yield f"{self.kind} <{vector[0]}, {vector[1]}, {vector[2]}>"
+
+
+class Object(Node):
+    """A transformed copy of a declared object.
+
+    Args:
+      name (str): Name of the declared object
+      transforms (list, optional): Transform nodes (default None)
+      inline (bool, optional): Write everything on a single line
+          (default True) or one transformation per line
+
+    """
+
+    __slots__ = ("name", "transforms", "inline")
+
+    def __init__(self, name, transforms=None, inline=True):
+        self.name = name
+        self.transforms = [] if transforms is None else transforms
+        self.inline = inline
+
+    def iter_pov(self):
+        if self.inline:
+            yield f"object {{ {self.name}"
+            for transform in self.transforms:
+                yield " "
+                yield from transform.iter_pov()
+            yield f" }}\n\t"
+        else:
+            yield f"object {{ {self.name} "
+            for transform in self.transforms:
+                yield "\n\t"
+                yield from transform.iter_pov()
+                yield " "
+            yield f"\n\t}}\n\n"
+
+
+class Declare(Node):
+    """Declare a node under a name, to be placed with Object.
+
+    Args:
+      name (str): Name of the object
+      node (Node): The declared object
+
+    """
+
+    __slots__ = ("name", "node")
+
+    def __init__(self, name, node):
+        self.name = name
+        self.node = node
+
+    def iter_pov(self):
+        yield f"#declare {self.name} = "
+        yield from self.node.iter_pov()
@@ -26,6 +26,17 @@ A quick summary:
     custom, and coating finishes as relevant
   * set_color_and_finish sets the color and finish based on values 
     specified by the user and available in finish_dict
+  * build_* build the same things as scene nodes (see povray_scene)
+    instead of strings: build_device, build_device_layer, 
+    build_*_feature, build_accent_lines, build_slab, build_torus, 
+    build_isosurface_unit_cell and build_texture. The string functions
+    above are thin wrappers that serialize the nodes once.
+  * iter_device, iter_device_layer and iter_*_feature generate the 
+    same strings in pieces, building every feature just before it is
+    written; write_device writes the device to a file that way. They
+    share the layer and slab helpers (layer_feature_types, 
+    build_layer_feature, build_layer_background, build_coating, 
+    build_substrate, ...) with build_device.
 """
 
 def create_cylinder(center, end, radius, for_silo=False):
@@ -42,16 +53,9 @@ def create_cylinder(center, end, radius, for_silo=False):
       string: POV-Ray code describing the cylinder
 
     """
-    cyl_string = (f"cylinder \n\t\t{{\n\t\t "
-            + f"<{center[0]}, {center[1]}, {end[0]:.5f}>, \n\t\t"
-            + f"<{center[0]}, {center[1]}, {end[1]:.5f}>, \n\t\t")
+    from povray_scene import Cylinder
 
-    if for_silo:
-        cyl_string += f"{radius} }}\n\t\t"
-    else:
-        cyl_string += f"{radius}\n\t\t"
-
-    return cyl_string
+    return str(Cylinder(center, end, radius, closed=for_silo))
 
 
 def create_ellipse(center, end, halfwidths, angle=0, for_silo=False):
@@ -70,22 +74,9 @@ def create_ellipse(center, end, halfwidths, angle=0, for_silo=False):
       string: POV-Ray code describing the elliptical cylinder
 
     """
-    # Start with radius=1, then scale to shape 
-    ellipse_string = (f"cylinder \n\t\t{{\n\t\t "
-            + f"<0, 0, {end[0]:.5f}>, \n\t\t"
-            + f"<0, 0, {end[1]:.5f}>, \n\t\t"
-            + f"1\n\t\t"
-            + f"scale <{halfwidths[0]}, {halfwidths[1]}, 1>\n\t\t")
-
-    if angle != 0:      # in degrees
-        ellipse_string += f"rotate <0, 0, {angle}> \n\t\t"
-    if center != [0, 0]:
-        ellipse_string += f"translate <{center[0]}, {center[1]}, 0> \n\t\t"
-
-    if for_silo:
-        ellipse_string += f"}}\n\t\t"
+    from povray_scene import Ellipse
 
-    return ellipse_string
+    return str(Ellipse(center, end, halfwidths, angle, closed=for_silo))
 
 
 def create_rectangle(center, end, halfwidths, angle=0, for_silo=False):
@@ -104,20 +95,9 @@ def create_rectangle(center, end, halfwidths, angle=0, for_silo=False):
       string: POV-Ray code describing the box
 
     """
-    # Spawn at origin, then rotate
-    rect_string = (f"box\n\t\t{{\n\t\t"
-            + f"<-{halfwidths[0]}, -{halfwidths[1]}, {end[0]:.5f}>\n\t\t"
-            + f"<{halfwidths[0]} {halfwidths[1]}, {end[1]:.5f}>\n\t\t")
+    from povray_scene import Box
 
-    if angle != 0:      # in degrees
-        rect_string += f"rotate <0, 0, {angle}> \n\t\t"
-    if center != [0, 0]:
-        rect_string += f"translate <{center[0]}, {center[1]}, 0> \n\t\t"
-
-    if for_silo:
-        rect_string += f"}}\n\t\t"
-
-    return rect_string
+    return str(Box(center, end, halfwidths, angle, closed=for_silo))
 
 
 def create_polygon(center, end, vertices, device_dims, angle=0, 
@@ -138,29 +118,14 @@ def create_polygon(center, end, vertices, device_dims, angle=0,
       string: POV-Ray code describing the prism
 
     """
-    # Povray requires that you close the shape
-    # The first and last point must be the same
-    num_points = len(vertices) + 1
-
-    poly_string = (f"prism\n\t\t{{\n\t\t"
-                  + "linear_sweep \n\t\tlinear_spline \n\t\t"
-                  + f"{end[0]:.5f}, {end[1]:.5f}, {num_points} \n\t\t")
+    from povray_scene import Prism
 
     # Must spawn prism at origin, then rotate and translate into 
     # position. Angle is in degrees. (Rotation note: povray rotates 
-    # about x first, then y, then z.)
-    for i in range(len(vertices)):
-        poly_string += f"<{vertices[i][0]}, {vertices[i][1]}>, "
-    poly_string += f"<{vertices[0][0]}, {vertices[0][1]}>\n\t\t"
-
-    poly_string += (f"rotate <90, 0, {angle}> \n\t\t"
-                   + f"translate <{center[0]}, {center[1]}, "
-                   + f"{(end[0]-device_dims[2])}> \n\t\t")
-
-    if for_silo:
-        poly_string += f"}}\n\t\t"
-
-    return poly_string
+    # about x first, then y, then z.) The z-translation uses the
+    # device dimensions at the time the prism is created.
+    return str(Prism(center, end, vertices, (end[0]-device_dims[2]), 
+            angle, closed=for_silo))
 
 
 def add_slab(lattice_vecs, thickness, device_dims, layer_type="substrate"):
@@ -188,6 +153,31 @@ def add_slab(lattice_vecs, thickness, device_dims, layer_type="substrate"):
       tuple: POV-Ray code describing the slab and the slab halfwidths
 
     """
+    slab, halfwidth = build_slab(lattice_vecs, thickness, device_dims, 
+            layer_type=layer_type)
+
+    return str(slab), halfwidth
+
+
+def build_slab(lattice_vecs, thickness, device_dims, layer_type="substrate"):
+    """Build a slab using lattice vectors as the dimensions.
+
+    Scene node version of ``add_slab``; the slab is left open for a 
+    texture (see ``build_texture``).
+
+    Args:
+      lattice_vecs (list): The lattice vectors defining the slab
+      thickness (float): Thickness of the layer
+      device_dims (list): Dimensions of the existing device
+      layer_type (string, optional): "coating", "background", 
+          "isosurface", or "substrate" (default)
+
+    Returns:
+      tuple: the slab (Slab) and the slab halfwidths
+
+    """
+    from povray_scene import Slab
+
     halfwidth = [(0.5 * (lattice_vecs[0][0] + lattice_vecs[1][0])),
             (0.5 * (lattice_vecs[0][1] + lattice_vecs[1][1]))]
 
@@ -206,16 +196,10 @@ def add_slab(lattice_vecs, thickness, device_dims, layer_type="substrate"):
             [lattice_vecs[1][0], lattice_vecs[1][1]]
             ]
 
-    # Write slab layer, adding teensy extra height to prevent weird artifacts
-    slab = (f"prism\n\t\t{{\n\t\t"
-            + "linear_sweep \n\t\tlinear_spline \n\t\t"
-            + f"{end[0]}, {end[1]*1.000001}, {len(points)+1} \n\t\t")
-
+    # Center the slab on the origin
     for i in range(len(points)):
         points[i][0] -= halfwidth[0]
         points[i][1] -= halfwidth[1]
-        slab += f"<{points[i][0]:.6f}, {points[i][1]:.6f}>, "
-    slab += f"<{points[0][0]:.6f}, {points[0][1]:.6f}> \n\t\t"
 
     # Determine translation vector
     if layer_type == "coating":
@@ -234,10 +218,8 @@ def add_slab(lattice_vecs, thickness, device_dims, layer_type="substrate"):
         y_translate = device_dims[1]
         z_translate = end[0] - device_dims[2]
 
-    # Move slab to final location
-    slab += "rotate <90, 0, 0> \n\t\t"
-    slab += f"translate <{x_translate}, {y_translate}, {z_translate:.6f}>"
-    slab += "\n\t\t"
+    # Slab is moved to its final location after rotating
+    slab = Slab(points, end, [x_translate, y_translate, z_translate])
 
     return slab, halfwidth
 
@@ -265,6 +247,22 @@ def create_torus(major_radius, minor_radius, center, z_top, angle=0,
       str: String containing torus description
 
     """
+    return str(build_torus(major_radius, minor_radius, center, z_top, 
+            angle=angle, color=color))
+
+
+def build_torus(major_radius, minor_radius, center, z_top, angle=0, 
+        color=[0,0,0]):
+    """Build a torus for accent line functionality.
+
+    Scene node version of ``create_torus``, see there for the arguments.
+
+    Returns:
+      Torus: The torus
+
+    """
+    from povray_scene import Torus
+
     # Create initial torus using smaller of the major radii.
     # Determine ellipse v circle based on type of major_radius.
     if isinstance(major_radius, list):
@@ -276,28 +274,18 @@ def create_torus(major_radius, minor_radius, center, z_top, angle=0,
         smaller_dim = major_radius
         ratio = 1.0
 
-    torus = (f"torus\n\t\t{{\n\t\t\t"
-            + f"{smaller_dim}, {minor_radius}\n\t\t\t"
-            + f"pigment {{ color rgbft "
-            + f"<{color[0]}, {color[1]}, {color[2]}, 0, 0> "
-            + f"}}\n\t\t\t"
-            + "rotate <90, 0, 0>\n\t\t\t"
-            + f"translate <{center[0]}, {center[1]}, {z_top}>\n\t\t")
-
     # Scale dimensions to make elliptical torus
+    scale = None
     if ratio == 0.0:
         if smaller_dim == major_radius[0]:
             ratio = major_radius[1] / major_radius[0]
-            torus += f"scale <1, {ratio}, 1>\n\t\t\t"
+            scale = [1, ratio]
         else:
             ratio = major_radius[0] / major_radius[1]
-            torus += f"scale <{ratio}, 1, 1>\n\t\t\t"
-
-    if angle != 0:      # in degrees
-        torus += f"rotate <0, 0, {angle}> \n\t\t"
+            scale = [ratio, 1]
 
-    torus += f"no_shadow\n\t\t}}\n\t"
-    return torus
+    return Torus(smaller_dim, minor_radius, center, z_top, color, 
+            scale=scale, angle=angle)
 
 
 def create_sphere(radius, center, color=[0,0,0]):
@@ -313,13 +301,9 @@ def create_sphere(radius, center, color=[0,0,0]):
       string: povray sphere description
 
     """
-    sphere = (f"sphere\n\t\t{{\n\t\t"
-            + f"<{center[0]}, {center[1]}, {center[2]}>, {radius}\n\t\t"
-            + f"pigment {{ color rgbft "
-            + f"<{color[0]}, {color[1]}, {color[2]}, 0, 0> "
-            + f"}}\n\t\t"
-            + f"no_shadow\n\t\t}}\n\t")
-    return sphere
+    from povray_scene import Sphere
+
+    return str(Sphere(radius, center, color))
 
 
 def add_accent_lines(shape, z_top, center, dims, feature_height, angle=0, 
@@ -351,10 +335,26 @@ def add_accent_lines(shape, z_top, center, dims, feature_height, angle=0,
     Returns:
       string: Accent lines for the feature
 
+    """
+    return str(build_accent_lines(shape, z_top, center, dims, 
+            feature_height, angle=angle, line_settings=line_settings))
+
+
+def build_accent_lines(shape, z_top, center, dims, feature_height, angle=0, 
+        line_settings=[[0,0,0], 0.0020]):
+    """Build the accent lines of a feature.
+
+    Scene node version of ``add_accent_lines``, see there for the
+    arguments.
+
+    Returns:
+      Group: Accent lines for the feature
+
     """
     from math import sin, cos, radians, sqrt
+    from povray_scene import Group, Declare, Cylinder, Sphere
 
-    line = "//Accent Lines\n\t"
+    line = Group(["//Accent Lines\n\t"])
 
     # Just doublechecking, because I've screwed this up before
     feature_height = abs(feature_height)
@@ -369,23 +369,23 @@ def add_accent_lines(shape, z_top, center, dims, feature_height, angle=0,
 
     if shape == "circle":
         # dims is the radius
-        line_upper = create_torus(
+        line_upper = build_torus(
                 dims, line_thickness, center, z_top, angle=0, color=color)
-        line_lower = create_torus(
+        line_lower = build_torus(
                 dims, line_thickness, center, (z_top - feature_height), 
                 angle=0, color=color)
-        line += line_upper
-        line += line_lower
+        line.append(line_upper)
+        line.append(line_lower)
 
     elif shape == "ellipse":
         # dims is the halfwidths
-        line_upper = create_torus(
+        line_upper = build_torus(
                 dims, line_thickness, center, z_top, angle=angle, color=color)
-        line_lower = create_torus(
+        line_lower = build_torus(
                 dims, line_thickness, center, (z_top - feature_height), 
                 angle=angle, color=color)
-        line += line_upper
-        line += line_lower
+        line.append(line_upper)
+        line.append(line_lower)
 
     elif shape == "rectangle":
         # dims is the halfwidths
@@ -399,34 +399,34 @@ def add_accent_lines(shape, z_top, center, dims, feature_height, angle=0,
         # Declare cylinders parallel to X-,Y-,Z-axes, respectively
         # All spawn parallel to the Z-axis because create_cylinder,
         # but are then rotated into place, parallel to the axes
-        x_cyl = "#declare Xcyl = "
-        x_cyl += create_cylinder([0.0, 0.0], x_limits, line_thickness)
-        x_cyl += (f"pigment {{ color rgbft "
+        x_cyl = Declare("Xcyl", Group([
+                Cylinder([0.0, 0.0], x_limits, line_thickness),
+                (f"pigment {{ color rgbft "
                 + f"<{color[0]}, {color[1]}, {color[2]}, 0, 0> }}\n\t\t"
                 + "rotate <0, 90, 0>\n\t\t"
-                + f"no_shadow\n\t\t}}\n\t")
+                + f"no_shadow\n\t\t}}\n\t")]))
 
-        y_cyl = "#declare Ycyl = "
-        y_cyl += create_cylinder([0.0, 0.0], y_limits, line_thickness)
-        y_cyl += (f"pigment {{ color rgbft "
+        y_cyl = Declare("Ycyl", Group([
+                Cylinder([0.0, 0.0], y_limits, line_thickness),
+                (f"pigment {{ color rgbft "
                 + f"<{color[0]}, {color[1]}, {color[2]}, 0, 0> }}\n\t\t"
                 + "rotate <90, 0, 0>\n\t\t"
-                + f"no_shadow\n\t\t}}\n\t")
+                + f"no_shadow\n\t\t}}\n\t")]))
 
-        z_cyl = "#declare Zcyl = "
-        z_cyl += create_cylinder([0.0, 0.0], z_limits, line_thickness)
-        z_cyl += (f"pigment {{ color rgbft "
+        z_cyl = Declare("Zcyl", Group([
+                Cylinder([0.0, 0.0], z_limits, line_thickness),
+                (f"pigment {{ color rgbft "
                 + f"<{color[0]}, {color[1]}, {color[2]}, 0, 0> }}\n\t\t"
-                + f"no_shadow\n\t\t}}\n\t")
+                + f"no_shadow\n\t\t}}\n\t")]))
 
         # Create spheres to fill corners to cover rough cylinder ends
-        sph = "#declare Corner = "
-        sph += create_sphere(line_thickness, [0.0, 0.0, 0.0], color=[0,0,0])
+        sph = Declare("Corner", 
+                Sphere(line_thickness, [0.0, 0.0, 0.0], color=[0,0,0]))
 
-        line += x_cyl
-        line += y_cyl
-        line += z_cyl
-        line += sph
+        line.append(x_cyl)
+        line.append(y_cyl)
+        line.append(z_cyl)
+        line.append(sph)
 
         # Rotate and translate lines into position
         # Povray's left-handed coordinate system makes trig looks weird
@@ -436,7 +436,7 @@ def add_accent_lines(shape, z_top, center, dims, feature_height, angle=0,
             vector1 = y_limits[ii] * sin(radians(angle)) + center[0]
             vector2 = -1 * y_limits[ii] * cos(radians(angle)) + center[1]
             for jj in range(2):
-                line += (f"object {{ Xcyl "
+                line.append(f"object {{ Xcyl "
                         + f"rotate <0, 0, {angle:.6f}>\n\t\t"
                         + "translate "
                         + f"<{vector1:.6f}, {vector2:.6f}, {z_limits[jj]:.6f}>"
@@ -445,7 +445,7 @@ def add_accent_lines(shape, z_top, center, dims, feature_height, angle=0,
             vector1 = x_limits[ii] * cos(radians(angle)) + center[0]
             vector2 = x_limits[ii] * sin(radians(angle)) + center[1]
             for jj in range(2):
-                line += (f"object {{ Ycyl "
+                line.append(f"object {{ Ycyl "
                         + f"rotate <0, 0, {angle:.6f}>\n\t\t"
                         + "translate "
                         + f"<{vector1:.6f}, {vector2:.6f}, {z_limits[jj]:.6f}>"
@@ -458,12 +458,12 @@ def add_accent_lines(shape, z_top, center, dims, feature_height, angle=0,
                           + center[0])
                 vector2 = (y*cos(radians(angle)) + x*sin(radians(angle))
                           + center[1])
-                line += (f"object {{ Zcyl "
+                line.append(f"object {{ Zcyl "
                         + "translate "
                         + f"<{vector1:.6f}, {vector2:.6f}, {0:.6f}>"
                         + f"}}\n\t")
                 for z in z_limits:
-                    line += (f"object {{ Corner "
+                    line.append(f"object {{ Corner "
                             + "translate "
                             + f"<{vector1:.6f}, {vector2:.6f}, {z:.6f}>"
                             + f" }}\n\t")
@@ -475,22 +475,22 @@ def add_accent_lines(shape, z_top, center, dims, feature_height, angle=0,
         z_limits = [(z_top - feature_height), z_top]
 
         # Create spheres to fill corners to cover rough cylinder ends
-        sph = "#declare Corner = "
-        sph += create_sphere(line_thickness, [0.0, 0.0, 0.0], color=[0,0,0])
+        sph = Declare("Corner", 
+                Sphere(line_thickness, [0.0, 0.0, 0.0], color=[0,0,0]))
 
         # Create cylinder along z axis
         # Not used (yet) because I've not yet come up with an algorithm
         # that can intelligently place them only where they make sense.
-        z_cyl = "#declare Zcyl = "
-        z_cyl += create_cylinder([0.0, 0.0], z_limits, line_thickness)
-        z_cyl += (f"pigment {{ color rgbft "
+        z_cyl = Declare("Zcyl", Group([
+                Cylinder([0.0, 0.0], z_limits, line_thickness),
+                (f"pigment {{ color rgbft "
                 + f"<{color[0]}, {color[1]}, {color[2]}, 0, 0> "
                 + f"}}\n\t\t"
-                + f"no_shadow\n\t\t}}\n\t")
+                + f"no_shadow\n\t\t}}\n\t")]))
 
         # Declaring shapes
-        line = sph
-        #line += z_cyl
+        line = Group([sph])
+        #line.append(z_cyl)
 
         # Create cylinders in xy-plane, both at the top and bottom of
         # the shape.Loop over all vertices defined in dims.
@@ -510,7 +510,7 @@ def add_accent_lines(shape, z_top, center, dims, feature_height, angle=0,
                 # Translates to original insertion point on the origin-
                 # centered, unrotated object, then rotates to `angle`, 
                 # then translates to wherever center is.
-                line += (f"object {{ Corner \n\t\t"
+                line.append(f"object {{ Corner \n\t\t"
                         + "translate "
                         + f"<-{end1[0]:.6f}, -{end1[1]:.6f}, {z:.6f}>"
                         + f"rotate <0, 0, {angle}> \n\t\t"                           
@@ -535,7 +535,7 @@ def add_accent_lines(shape, z_top, center, dims, feature_height, angle=0,
                 # parallel to the z-axis. I'm sick of trying to rotate
                 # things in POV-Ray's left-handed coordinate system.
                 if cyl_length > line_thickness:
-                    line += (f"cylinder \n\t\t{{\n\t\t "
+                    line.append(f"cylinder \n\t\t{{\n\t\t "
                             + f"<-{end1[0]}, -{end1[1]}, {z:.5f}>, \n\t\t"
                             + f"<-{end2[0]}, -{end2[1]}, {z:.5f}>, \n\t\t"
                             + f"{line_thickness}\n\t\t"
@@ -552,7 +552,7 @@ def add_accent_lines(shape, z_top, center, dims, feature_height, angle=0,
 #            # place them only where it makes sense. May eventually
 #            # output this to stdout in case the user wants to add 
 #            # them manually.
-#            line += (f"object {{ Zcyl "
+#            line.append(f"object {{ Zcyl "
 #                    + "translate "
 #                    + f"<{vector1:.6f}, {vector2:.6f}, {0:.6f}>"
 #                    + f"}}\n\t")
@@ -611,8 +611,29 @@ def write_circle_feature(shapes, k, device_dims, end,
     Returns:
       str: String with circle feature information
 
+    """
+    feature, c, device_dims = build_circle_feature(shapes, k, device_dims, 
+            end, finish_dict, feature_color_finish, c, add_lines, 
+            line_settings)
+
+    return str(feature), c, device_dims
+
+
+def build_circle_feature(shapes, k, device_dims, end, 
+        finish_dict, feature_color_finish, c, add_lines=False,
+        line_settings=[[0, 0, 0], 0.0020]):
+    """Build a circle feature within a layer.
+
+    Scene node version of ``write_circle_feature``, see there for the
+    arguments.
+
+    Returns:
+      tuple: the feature (Group), the color counter, and updated
+      device_dims
+
     """
     from util import deep_access
+    from povray_scene import Group, Cylinder, Textured
 
     mid = deep_access(shapes, [str(k), 'shape_vars', 'center'])
     if isinstance(mid, dict):
@@ -622,25 +643,47 @@ def write_circle_feature(shapes, k, device_dims, end,
 
     radius = deep_access(shapes, [str(k), 'shape_vars', 'radius'])
 
-    circle = "// Circular pillar\n\t" \
-            + create_cylinder(center, end, radius)
-
-    circle = set_color_and_finish(circle, finish_dict=finish_dict,
-            feature_color_finish=feature_color_finish[c])
+    circle = Group([Textured(
+            Group(["// Circular pillar\n\t", 
+                Cylinder(center, end, radius)]),
+            build_texture(finish_dict=finish_dict,
+                feature_color_finish=feature_color_finish[c]))])
 
     c += 1
 
     # Add lines to the top and bottom of the feature
     if add_lines == True:
-        lines = add_accent_lines("circle", device_dims[2], center, 
+        lines = build_accent_lines("circle", device_dims[2], center, 
                 radius, (end[1]-end[0]), line_settings=line_settings)
-        circle += lines
+        circle.append(lines)
 
     device_dims = update_device_dims(device_dims, radius, radius, 0)
 
     return circle, c, device_dims
 
 
+def iter_circle_feature(shapes, k, device_dims, end, 
+        finish_dict, feature_color_finish, c, add_lines=False,
+        line_settings=[[0, 0, 0], 0.0020]):
+    """Generate a circle feature in pieces.
+
+    Streaming version of ``write_circle_feature``, see there for the
+    arguments. Use it as 
+    ``c, device_dims = yield from iter_circle_feature(...)``.
+
+    Returns:
+      iterator: Pieces of the feature string, the generator returns the
+      color counter and updated device_dims
+
+    """
+    feature, c, device_dims = build_circle_feature(shapes, k, device_dims, 
+            end, finish_dict, feature_color_finish, c, add_lines, 
+            line_settings)
+    yield from feature.iter_pov()
+
+    return c, device_dims
+
+
 def write_ellipse_feature(shapes, k, device_dims, end, 
         finish_dict, feature_color_finish, c, add_lines=False,
         line_settings=[[0, 0, 0], 0.0020]):
@@ -666,8 +709,29 @@ def write_ellipse_feature(shapes, k, device_dims, end,
     Returns:
       str: String with ellipse feature information
 
+    """
+    feature, c, device_dims = build_ellipse_feature(shapes, k, device_dims, 
+            end, finish_dict, feature_color_finish, c, add_lines, 
+            line_settings)
+
+    return str(feature), c, device_dims
+
+
+def build_ellipse_feature(shapes, k, device_dims, end, 
+        finish_dict, feature_color_finish, c, add_lines=False,
+        line_settings=[[0, 0, 0], 0.0020]):
+    """Build a ellipse feature within a layer.
+
+    Scene node version of ``write_ellipse_feature``, see there for the
+    arguments.
+
+    Returns:
+      tuple: the feature (Group), the color counter, and updated
+      device_dims
+
     """
     from util import deep_access
+    from povray_scene import Group, Ellipse, Textured
 
     mid = deep_access(shapes, [str(k), 'shape_vars', 'center'])
     if isinstance(mid, dict):
@@ -683,21 +747,21 @@ def write_ellipse_feature(shapes, k, device_dims, end,
 
     angle = deep_access(shapes, [str(k), 'shape_vars', 'angle'])
 
-    ellipse = "// Ellipse\n\t" \
-            + create_ellipse(center, end, halfwidths, angle)
-
-    ellipse = set_color_and_finish(ellipse, finish_dict=finish_dict,
-            feature_color_finish=feature_color_finish[c])
+    ellipse = Group([Textured(
+            Group(["// Ellipse\n\t", 
+                Ellipse(center, end, halfwidths, angle)]),
+            build_texture(finish_dict=finish_dict,
+                feature_color_finish=feature_color_finish[c]))])
             
     # Increments through custom color list
     c += 1
 
     # Add lines to the top and bottom of the feature
     if add_lines == True:
-        lines = add_accent_lines("ellipse", device_dims[2], center, 
+        lines = build_accent_lines("ellipse", device_dims[2], center, 
                 halfwidths, (end[1]-end[0]), angle=angle,
                 line_settings=line_settings)
-        ellipse += lines
+        ellipse.append(lines)
 
     device_dims = update_device_dims(
             device_dims, halfwidths[0], halfwidths[1], 0)
@@ -705,6 +769,28 @@ def write_ellipse_feature(shapes, k, device_dims, end,
     return ellipse, c, device_dims
 
 
+def iter_ellipse_feature(shapes, k, device_dims, end, 
+        finish_dict, feature_color_finish, c, add_lines=False,
+        line_settings=[[0, 0, 0], 0.0020]):
+    """Generate an ellipse feature in pieces.
+
+    Streaming version of ``write_ellipse_feature``, see there for the
+    arguments. Use it as 
+    ``c, device_dims = yield from iter_ellipse_feature(...)``.
+
+    Returns:
+      iterator: Pieces of the feature string, the generator returns the
+      color counter and updated device_dims
+
+    """
+    feature, c, device_dims = build_ellipse_feature(shapes, k, device_dims, 
+            end, finish_dict, feature_color_finish, c, add_lines, 
+            line_settings)
+    yield from feature.iter_pov()
+
+    return c, device_dims
+
+
 def write_rectangle_feature(shapes, k, device_dims, end, 
         finish_dict, feature_color_finish, c, add_lines=False,
         line_settings=[[0, 0, 0], 0.0020]):
@@ -730,8 +816,29 @@ def write_rectangle_feature(shapes, k, device_dims, end,
     Returns:
       str: String containing rectangle feature
 
+    """
+    feature, c, device_dims = build_rectangle_feature(shapes, k, device_dims, 
+            end, finish_dict, feature_color_finish, c, add_lines, 
+            line_settings)
+
+    return str(feature), c, device_dims
+
+
+def build_rectangle_feature(shapes, k, device_dims, end, 
+        finish_dict, feature_color_finish, c, add_lines=False,
+        line_settings=[[0, 0, 0], 0.0020]):
+    """Build a rectangle feature within a layer.
+
+    Scene node version of ``write_rectangle_feature``, see there for the
+    arguments.
+
+    Returns:
+      tuple: the feature (Group), the color counter, and updated
+      device_dims
+
     """
     from util import deep_access
+    from povray_scene import Group, Box, Textured
 
     mid = deep_access(shapes, [str(k), 'shape_vars', 'center'])
     if isinstance(mid, dict):
@@ -747,21 +854,21 @@ def write_rectangle_feature(shapes, k, device_dims, end,
 
     angle = deep_access(shapes, [str(k), 'shape_vars', 'angle'])
 
-    rectangle = ("// Rectangle\n\t"
-            + create_rectangle(center, end, halfwidths, angle))
-
-    rectangle = set_color_and_finish(rectangle, finish_dict=finish_dict,
-            feature_color_finish=feature_color_finish[c])
+    rectangle = Group([Textured(
+            Group(["// Rectangle\n\t", 
+                Box(center, end, halfwidths, angle)]),
+            build_texture(finish_dict=finish_dict,
+                feature_color_finish=feature_color_finish[c]))])
 
     # Increments through custom color list
     c += 1
 
     # Add lines edges of the feature
     if add_lines == True:
-        lines = add_accent_lines("rectangle", device_dims[2], center, 
+        lines = build_accent_lines("rectangle", device_dims[2], center, 
                 halfwidths, (end[1]-end[0]), angle=angle,
                 line_settings=line_settings)
-        rectangle += lines
+        rectangle.append(lines)
 
     device_dims = update_device_dims(
             device_dims, halfwidths[0], halfwidths[1], 0)
@@ -769,6 +876,28 @@ def write_rectangle_feature(shapes, k, device_dims, end,
     return rectangle, c, device_dims
 
 
+def iter_rectangle_feature(shapes, k, device_dims, end, 
+        finish_dict, feature_color_finish, c, add_lines=False,
+        line_settings=[[0, 0, 0], 0.0020]):
+    """Generate a rectangle feature in pieces.
+
+    Streaming version of ``write_rectangle_feature``, see there for the
+    arguments. Use it as 
+    ``c, device_dims = yield from iter_rectangle_feature(...)``.
+
+    Returns:
+      iterator: Pieces of the feature string, the generator returns the
+      color counter and updated device_dims
+
+    """
+    feature, c, device_dims = build_rectangle_feature(shapes, k, device_dims, 
+            end, finish_dict, feature_color_finish, c, add_lines, 
+            line_settings)
+    yield from feature.iter_pov()
+
+    return c, device_dims
+
+
 def write_polygon_feature(shapes, k, device_dims, end, 
         finish_dict, feature_color_finish, c, add_lines=False,
         line_settings=[[0, 0, 0], 0.0020]):
@@ -796,8 +925,29 @@ def write_polygon_feature(shapes, k, device_dims, end,
     Returns:
       str: String with polygon feature information
 
+    """
+    feature, c, device_dims = build_polygon_feature(shapes, k, device_dims, 
+            end, finish_dict, feature_color_finish, c, add_lines, 
+            line_settings)
+
+    return str(feature), c, device_dims
+
+
+def build_polygon_feature(shapes, k, device_dims, end, 
+        finish_dict, feature_color_finish, c, add_lines=False,
+        line_settings=[[0, 0, 0], 0.0020]):
+    """Build a polygon feature within a layer.
+
+    Scene node version of ``write_polygon_feature``, see there for the
+    arguments.
+
+    Returns:
+      tuple: the feature (Group), the color counter, and updated
+      device_dims
+
     """
     from util import deep_access
+    from povray_scene import Group, Prism, Textured
 
     mid = deep_access(shapes, [str(k), 'shape_vars', 'center'])
     if isinstance(mid, dict):
@@ -827,27 +977,50 @@ def write_polygon_feature(shapes, k, device_dims, end,
         x_max = max(abs(x_max), vertex[0])
         y_max = max(abs(y_max), vertex[1])
 
-    polygon = ("// Polygon\n\t"
-            + create_polygon(center, end, vertices, device_dims, angle))
-
-    polygon = set_color_and_finish(polygon, finish_dict=finish_dict,
-            feature_color_finish=feature_color_finish[c])
+    polygon = Group([Textured(
+            Group(["// Polygon\n\t", 
+                Prism(center, end, vertices, (end[0]-device_dims[2]), 
+                    angle)]),
+            build_texture(finish_dict=finish_dict,
+                feature_color_finish=feature_color_finish[c]))])
             
     # Increments through custom color list
     c += 1
 
     # Add lines edges of the feature
     if add_lines == True:
-        lines = add_accent_lines("polygon", device_dims[2], center, 
+        lines = build_accent_lines("polygon", device_dims[2], center, 
                 vertices, (end[1]-end[0]), angle=angle,
                 line_settings=line_settings)
-        polygon += lines
+        polygon.append(lines)
 
     device_dims = update_device_dims(device_dims, x_max, y_max, 0)
 
     return polygon, c, device_dims
 
 
+def iter_polygon_feature(shapes, k, device_dims, end, 
+        finish_dict, feature_color_finish, c, add_lines=False,
+        line_settings=[[0, 0, 0], 0.0020]):
+    """Generate a polygon feature in pieces.
+
+    Streaming version of ``write_polygon_feature``, see there for the
+    arguments. Use it as 
+    ``c, device_dims = yield from iter_polygon_feature(...)``.
+
+    Returns:
+      iterator: Pieces of the feature string, the generator returns the
+      color counter and updated device_dims
+
+    """
+    feature, c, device_dims = build_polygon_feature(shapes, k, device_dims, 
+            end, finish_dict, feature_color_finish, c, add_lines, 
+            line_settings)
+    yield from feature.iter_pov()
+
+    return c, device_dims
+
+
 def check_for_false_silos(shapes, layer_type):
     """Remove 'silos' that aren't actually silos.
     
@@ -922,12 +1095,34 @@ def write_silo_feature(shapes, k, layer_type, device_dims, end,
       tuple: a string describing the silo, the color counter, and
       updated device_dims
 
+    """
+    feature, c, device_dims = build_silo_feature(shapes, k, layer_type, 
+            device_dims, end, finish_dict, feature_color_finish, c, 
+            add_lines, line_settings)
+
+    return str(feature), c, device_dims
+
+
+def build_silo_feature(shapes, k, layer_type, device_dims, end, 
+        finish_dict, feature_color_finish, c, add_lines=False,
+        line_settings=[[0, 0, 0], 0.0020]):
+    """Build a silo feature, with color and finish.
+
+    Scene node version of ``write_silo_feature``, see there for the
+    arguments.
+
+    Returns:
+      tuple: the silo (Group), the color counter, and updated
+      device_dims
+
     """
     from util import deep_access
     from copy import deepcopy
+    from povray_scene import Group, CSG, Cylinder, Ellipse, Box, Prism
+    from povray_scene import Textured
 
-    device = "// Silo\n\t" \
-            + f"difference \n\t\t{{\n\t\t"
+    # The texture closes the difference
+    difference = CSG("difference", opening=" \n\t\t{\n\t\t", closing="")
 
     # First shape
     if deep_access(shapes, [str(k), 'shape']) == "circle":
@@ -935,7 +1130,7 @@ def write_silo_feature(shapes, k, layer_type, device_dims, end,
         radius = deep_access(shapes, [str(k), 'shape_vars', 'radius'])
         halfwidths = [radius, radius]           # to make things work
 
-        device += create_cylinder(center, end, radius, for_silo=True)
+        difference.append(Cylinder(center, end, radius, closed=True))
 
         # Set up for add_lines=True, even if not actually used
         shape = "circle"
@@ -946,7 +1141,8 @@ def write_silo_feature(shapes, k, layer_type, device_dims, end,
         hw = deep_access(shapes, [str(k), 'shape_vars', 'halfwidths'])
         halfwidths = [hw.get("x"), hw.get("y")]
         angle = deep_access(shapes, [str(k), 'shape_vars', 'angle'])
-        device += create_ellipse(center, end, halfwidths, angle, for_silo=True)
+        difference.append(
+                Ellipse(center, end, halfwidths, angle, closed=True))
         print("WARNING: this function has not been tested in silos!!")
 
         # Set up for add_lines=True, even if not actually used
@@ -958,8 +1154,8 @@ def write_silo_feature(shapes, k, layer_type, device_dims, end,
         hw = deep_access(shapes, [str(k), 'shape_vars', 'halfwidths'])
         halfwidths = [hw.get("x"), hw.get("y")]
         angle = deep_access(shapes, [str(k), 'shape_vars', 'angle'])
-        device += create_rectangle(
-                center, end, halfwidths, angle, for_silo=True)
+        difference.append(
+                Box(center, end, halfwidths, angle, closed=True))
         print("WARNING: this function has not been tested in silos!!")
 
         # Set up for add_lines=True, even if not actually used
@@ -975,8 +1171,8 @@ def write_silo_feature(shapes, k, layer_type, device_dims, end,
             vertex = [deep_access(points, [f"{k}", "x"]),
                     deep_access(points, [f"{k}", "y"])]
             vertices.append(vertex)
-        device += create_polygon(
-                center, end, vertices, device_dims, angle, for_silo=True)
+        difference.append(Prism(center, end, vertices, 
+                (end[0]-device_dims[2]), angle, closed=True))
         print("WARNING: this function has not been tested in silos!!")
 
         # Set up for add_lines=True, even if not actually used
@@ -989,7 +1185,7 @@ def write_silo_feature(shapes, k, layer_type, device_dims, end,
     # Create line to the top of the feature, added later
     # Also storing outer radius for later
     if add_lines == True:
-        lines = add_accent_lines(shape, device_dims[2], center, 
+        lines = build_accent_lines(shape, device_dims[2], center, 
                 dims_outer, (end[1]-end[0]), line_settings=line_settings)
 
     # Hole(s)
@@ -1002,7 +1198,7 @@ def write_silo_feature(shapes, k, layer_type, device_dims, end,
         if deep_access(shapes, [str(j), 'shape']) == "circle":
             center = deep_access(shapes, [str(j), 'shape_vars', 'center'])
             radius = deep_access(shapes, [str(j), 'shape_vars', 'radius'])
-            device += create_cylinder(center, end2, radius, for_silo=True)
+            difference.append(Cylinder(center, end2, radius, closed=True))
 
             # Set up for add_lines=True, even if not actually used
             shape = "circle"
@@ -1013,8 +1209,8 @@ def write_silo_feature(shapes, k, layer_type, device_dims, end,
             hw = deep_access(shapes, [str(k), 'shape_vars', 'halfwidths'])
             halfwidths = [hw.get("x"), hw.get("y")]
             angle = deep_access(shapes, [str(k), 'shape_vars', 'angle'])
-            device += create_ellipse(
-                    center, end2, halfwidths, angle, for_silo=True)
+            difference.append(
+                    Ellipse(center, end2, halfwidths, angle, closed=True))
             print("WARNING: this function has not been tested in silos!!")
 
             # Set up for add_lines=True, even if not actually used
@@ -1026,8 +1222,8 @@ def write_silo_feature(shapes, k, layer_type, device_dims, end,
             hw = deep_access(shapes, [str(k), 'shape_vars', 'halfwidths'])
             halfwidths = [hw.get("x"), hw.get("y")]
             angle = deep_access(shapes, [str(k), 'shape_vars', 'angle'])
-            device += create_rectangle(
-                    center, end2, halfwidths, angle, for_silo=True)
+            difference.append(
+                    Box(center, end2, halfwidths, angle, closed=True))
             print("WARNING: this function has not been tested in silos!!")
 
             # Set up for add_lines=True, even if not actually used
@@ -1043,8 +1239,8 @@ def write_silo_feature(shapes, k, layer_type, device_dims, end,
                 vertex = [deep_access(points, [f"{k}", "x"]),
                         deep_access(points, [f"{k}", "y"])]
                 vertices.append(vertex)
-            device += create_polygon(
-                    center, end, vertices, device_dims, angle, for_silo=True)
+            difference.append(Prism(center, end, vertices, 
+                    (end[0]-device_dims[2]), angle, closed=True))
 
             print("WARNING: this function has not been tested in silos!!")
 
@@ -1057,21 +1253,22 @@ def write_silo_feature(shapes, k, layer_type, device_dims, end,
 
         # Create inner lines and append to the silo master list
         if add_lines == True:
-            lines_inner = add_accent_lines(shape, device_dims[2], center, 
+            lines_inner = build_accent_lines(shape, device_dims[2], center, 
                     dims_inner, (end[1]-end[0]), line_settings=line_settings)
-            lines += lines_inner
+            lines.append(lines_inner)
 
         j += 1
 
-    device = set_color_and_finish(device, finish_dict=finish_dict,
-            feature_color_finish=feature_color_finish[c])
+    device = Group([Textured(Group(["// Silo\n\t", difference]),
+            build_texture(finish_dict=finish_dict,
+                feature_color_finish=feature_color_finish[c]))])
 
     # Increments through custom color list
     c += 1
 
     # Add all silo lines
     if add_lines == True:
-        device += lines
+        device.append(lines)
 
     device_dims = update_device_dims(
             device_dims, halfwidths[0], halfwidths[1], 0)
@@ -1079,6 +1276,28 @@ def write_silo_feature(shapes, k, layer_type, device_dims, end,
     return device, c, device_dims
 
 
+def iter_silo_feature(shapes, k, layer_type, device_dims, end, 
+        finish_dict, feature_color_finish, c, add_lines=False,
+        line_settings=[[0, 0, 0], 0.0020]):
+    """Generate a silo feature in pieces.
+
+    Streaming version of ``write_silo_feature``, see there for the
+    arguments. Use it as 
+    ``c, device_dims = yield from iter_silo_feature(...)``.
+
+    Returns:
+      iterator: Pieces of the feature string, the generator returns the
+      color counter and updated device_dims
+
+    """
+    feature, c, device_dims = build_silo_feature(shapes, k, layer_type, 
+            device_dims, end, finish_dict, feature_color_finish, c, 
+            add_lines, line_settings)
+    yield from feature.iter_pov()
+
+    return c, device_dims
+
+
 def create_device_layer(shapes, device_dims, end, thickness,
         finish_dict, feature_color_finish, c, add_lines=False,
         line_settings=[[0, 0, 0], 0.0020]):
@@ -1110,6 +1329,101 @@ def create_device_layer(shapes, device_dims, end, thickness,
       tuple: a string describing the silo, the color counter, and
       updated device_dims
 
+    """
+    device_layer, c, device_dims = build_device_layer(shapes, device_dims, 
+            end, thickness, finish_dict, feature_color_finish, c, 
+            add_lines, line_settings)
+
+    # Close union
+    return str(device_layer) + f"}}\n\t", c, device_dims
+
+
+def build_device_layer(shapes, device_dims, end, thickness,
+        finish_dict, feature_color_finish, c, add_lines=False,
+        line_settings=[[0, 0, 0], 0.0020]):
+    """Build the features of a single layer of a device.
+
+    Scene node version of ``create_device_layer``, see there for the
+    arguments. Only the features are returned; the caller puts them in
+    a union (which ``create_device_layer`` closes).
+
+    Returns:
+      tuple: the features of the layer (Group), the color counter, and
+      updated device_dims
+
+    """
+    from povray_scene import Group
+
+    layer_type = layer_feature_types(shapes)
+
+    # Write device layers
+    device_layer = Group()
+    for k in range(len(layer_type)):
+
+        if c == len(feature_color_finish):
+            c = 0
+
+        feature, c, device_dims = build_layer_feature(shapes, k, 
+                layer_type, device_dims, end, finish_dict, 
+                feature_color_finish, c, add_lines, line_settings)
+        if feature is not None:
+            device_layer.append(feature)
+
+    # End of device layer (update thickness)
+    device_dims = update_device_dims(device_dims, 0, 0, thickness)
+
+    return device_layer, c, device_dims
+
+
+def iter_device_layer(shapes, device_dims, end, thickness,
+        finish_dict, feature_color_finish, c, add_lines=False,
+        line_settings=[[0, 0, 0], 0.0020]):
+    """Generate a single layer of a device in pieces.
+
+    Streaming version of ``create_device_layer``, see there for the
+    arguments; the pieces join to the same string. Every feature is 
+    built and written before the next one, so only one feature is ever
+    held in memory. The color counter and device dimensions are 
+    returned when the generator finishes, so use it with 
+    ``c, device_dims = yield from iter_device_layer(...)``.
+
+    Returns:
+      iterator: Pieces of the layer string, the generator returns the 
+      color counter and updated device_dims
+
+    """
+    layer_type = layer_feature_types(shapes)
+
+    for k in range(len(layer_type)):
+
+        if c == len(feature_color_finish):
+            c = 0
+
+        feature, c, device_dims = build_layer_feature(shapes, k, 
+                layer_type, device_dims, end, finish_dict, 
+                feature_color_finish, c, add_lines, line_settings)
+        if feature is not None:
+            yield from feature.iter_pov()
+
+    # End of device layer (update thickness and close union)
+    device_dims = update_device_dims(device_dims, 0, 0, thickness)
+    yield f"}}\n\t"
+
+    return c, device_dims
+
+
+def layer_feature_types(shapes):
+    """Determine the type of every feature in a device layer.
+
+    Holes are marked as "Vacuum" and the features they are cut out of
+    as "silo" (see ``check_for_false_silos``).
+
+    Args:
+      shapes (dict): The dictionary containing the shape information
+
+    Returns:
+      list: The type of every feature in the layer
+
     """
     from util import deep_access
 
@@ -1128,54 +1442,60 @@ def create_device_layer(shapes, device_dims, end, thickness,
     if has_silo == True:
         layer_type = check_for_false_silos(shapes, layer_type)
 
-    # Write device layers
-    device_layer = ""
-    for k in range(len(layer_type)):
-
-        if c == len(feature_color_finish):
-            c = 0
+    return layer_type
 
-        if layer_type[k] == "circle":
-            feature, c, device_dims = write_circle_feature(shapes, k, 
-                    device_dims, end, finish_dict, feature_color_finish, 
-                    c, add_lines, line_settings)
-            device_layer += feature
 
-        elif layer_type[k] == "silo":
-            feature, c, device_dims = write_silo_feature(shapes, k,
-                    layer_type, device_dims, end, finish_dict,
-                    feature_color_finish, c, add_lines, line_settings)
-            device_layer += feature
-
-        elif layer_type[k] == "ellipse":
-            feature, c, device_dims = write_ellipse_feature(shapes, k, 
-                    device_dims, end,  finish_dict, feature_color_finish, 
-                    c, add_lines, line_settings)
-            device_layer += feature
+def build_layer_feature(shapes, k, layer_type, device_dims, end, 
+        finish_dict, feature_color_finish, c, add_lines=False,
+        line_settings=[[0, 0, 0], 0.0020]):
+    """Build a single feature of a device layer, whatever its type.
 
-        elif layer_type[k] == "rectangle":
-            feature, c, device_dims = write_rectangle_feature(shapes, k, 
-                    device_dims, end, finish_dict, feature_color_finish, 
-                    c, add_lines, line_settings)
-            device_layer += feature
+    Picks the build_*_feature function from ``layer_type[k]``, see 
+    ``create_device_layer`` for the other arguments.
 
-        elif layer_type[k] == "polygon":
-            feature, c, device_dims = write_polygon_feature(shapes, k, 
-                    device_dims, end, finish_dict, feature_color_finish,
-                    c, add_lines, line_settings)
-            device_layer += feature
+    Args:
+      shapes (dict): The dictionary containing the shape information
+      k (int): Counter iterating though features
+      layer_type (list): Feature types from ``layer_feature_types``
 
-        elif layer_type[k] == "Vacuum":
-            k = k
+    Returns:
+      tuple: the feature (None for holes and unsupported types), the 
+      color counter, and updated device_dims
 
-        else:
-            print("\nWARNING: Invalid or unsupported layer specified.\n")
+    """
+    if layer_type[k] == "circle":
+        feature, c, device_dims = build_circle_feature(shapes, k, 
+                device_dims, end, finish_dict, feature_color_finish, 
+                c, add_lines, line_settings)
+
+    elif layer_type[k] == "silo":
+        feature, c, device_dims = build_silo_feature(shapes, k,
+                layer_type, device_dims, end, finish_dict,
+                feature_color_finish, c, add_lines, line_settings)
+
+    elif layer_type[k] == "ellipse":
+        feature, c, device_dims = build_ellipse_feature(shapes, k, 
+                device_dims, end,  finish_dict, feature_color_finish, 
+                c, add_lines, line_settings)
+
+    elif layer_type[k] == "rectangle":
+        feature, c, device_dims = build_rectangle_feature(shapes, k, 
+                device_dims, end, finish_dict, feature_color_finish, 
+                c, add_lines, line_settings)
+
+    elif layer_type[k] == "polygon":
+        feature, c, device_dims = build_polygon_feature(shapes, k, 
+                device_dims, end, finish_dict, feature_color_finish,
+                c, add_lines, line_settings)
+
+    elif layer_type[k] == "Vacuum":
+        feature = None
 
-    # End of device layer (update thickness and close union
-    device_dims = update_device_dims(device_dims, 0, 0, thickness)
-    device_layer += f"}}\n\t"
+    else:
+        print("\nWARNING: Invalid or unsupported layer specified.\n")
+        feature = None
 
-    return device_layer, c, device_dims
+    return feature, c, device_dims
 
 
 def create_device(device_dict, 
@@ -1247,9 +1567,42 @@ def create_device(device_dict,
       and updated coating dimensions
 
     """
-    from os import system
-    from copy import deepcopy
+    device, device_dims, coating_dims = build_device(device_dict, 
+            feature_color_finish, num_UC_x=num_UC_x, num_UC_y=num_UC_y, 
+            coating_layers=coating_layers, 
+            coating_color_dict=coating_color_dict, 
+            coating_ior_dict=coating_ior_dict, custom_finish=custom_finish, 
+            add_lines=add_lines, line_color=line_color, 
+            line_thickness=line_thickness)
+
+    return str(device), device_dims, coating_dims
+
+
+def build_device(device_dict, 
+    feature_color_finish,
+    num_UC_x=2,
+    num_UC_y=2,
+    coating_layers=[], 
+    coating_color_dict={"translucent":[1, 0, 0, 0, 0]}, 
+    coating_ior_dict={"translucent":1.0}, 
+    custom_finish="", 
+    add_lines=False,
+    line_color=[0, 0, 0],
+    line_thickness=0.0020):
+    """Build the device as a scene graph.
+
+    Scene node version of ``create_device``, see there for the 
+    arguments. The whole device is built before anything is written,
+    so it is serialized in a single pass (``str(device)`` or 
+    ``device.write(file)``).
+
+    Returns:
+      tuple: the device (Group), updated device dimensions, and updated
+      coating dimensions
+
+    """
     from util import deep_access
+    from povray_scene import Group, CSG, Declare, Object, Transform
 
     # Combine accent line color and thickness into a single variable
     # to simplify variable passing
@@ -1267,28 +1620,18 @@ def create_device(device_dict,
     # Track dimensions of the unit cell
     device_dims = [0, 0, 0] 
 
-    # Track coating layer thickness
-    coating_dims = [0, 0, 0]
-
     # Store device
-    device = ""
+    device = Group()
 
-    # Lattice vectors
-    lattice_dict = deep_access(device_dict, ['statepoint', 'lattice_vecs'])
-    lattice_vecs = list()
-    for v in ['a', 'b']:
-        tmp_vec = list()
-        for i in ['x', 'y']:
-            tmp_vec.append(deep_access(lattice_dict, [v, i]))
-        lattice_vecs.append(tmp_vec)
+    lattice_vecs = lattice_vectors(device_dict)
 
     # Zero layer
     # Currently no need to render anything from this layer
 
     #### ---- DEVICE UNIT CELL ---- ####
 
-    device += "#declare UnitCell = "
-    device += f"merge\n\t{{\n\t"
+    unit_cell = CSG("merge", closing=f"}}\n\n")
+    device.append(Declare("UnitCell", unit_cell))
 
     # Create all layers
     for i in range(number_of_layers):
@@ -1306,65 +1649,343 @@ def create_device(device_dict,
             end = [float(-1.0*device_dims[2]), 
                     float(-1.0*device_dims[2] - thickness)]
 
-            device += f"union\n\t{{\n\t"
+            layer_union = CSG("union")
+            unit_cell.append(layer_union)
 
             # Check for background material
-            bg_slab = ""
             #if background != "Vacuum":
             if background in coating_color_dict:
-                # Forcing elimination of internal boundaries
-                # (They appear if you use lattice_vecs 
-                # instead of temp_vecs)
-                temp_vecs = deepcopy(lattice_vecs)
-                for k in range(2):
-                    for l in range(2):
-                        temp_vecs[k][l] += 0.0002
-
-                # Make sure that coating color is rgbft.
-                #
-                # Override filter and transmit values to match the
-                # "translucent" finish settings if they are set to 0.
-                # This way the user can still specify custom filter
-                # and transmit values, but if they truly want an opaque
-                # coating, they can use something like 0.0000001.
-                coating_color = coating_color_dict[coating_layers[j][0]]
-                if len(coating_color) < 5:
-                    coating_color.append(0)
-                if coating_color[3] == 0:
-                    coating_color[3] = 0.50
-                if coating_color[4] == 0:
-                    coating_color[4] = 0.02
-    
-                coating_finish = coating_layers[j][0]
-
-                device += "// Layer background\n\t"
-                bg_slab, halfwidth = add_slab(temp_vecs, thickness, 
-                        device_dims, layer_type="background")
-                bg_slab = set_color_and_finish(bg_slab, 
-                        finish_dict=finish_dict,
-                        feature_color_finish=[coating_color, coating_finish])
-
-                device += bg_slab
+                layer_union.append(build_layer_background(background, 
+                        lattice_vecs, thickness, device_dims, 
+                        coating_color_dict, finish_dict))
 
                 # Prevent end caps from being overwritten by background layers
                 end[0] -= 0.00010
                 end[1] -= 0.00010
 
             # Create all features within a layer
-            ####### Need to pass finish_dict !! set_color_and_finish
-            layer, c, device_dims = create_device_layer(shapes, device_dims, 
+            layer, c, device_dims = build_device_layer(shapes, device_dims, 
                     end, thickness, finish_dict, feature_color_finish, c, 
                     add_lines, line_settings)
-            device += layer
+            layer_union.append(layer)
+
+    #### ---- REPLICATE UNIT CELL ---- ####
+
+    # Shift translation so that the original device is roughly in the center
+    cells = CSG("merge", opening=f"\n\t{{ \n\t", closing=f"}}\n\n")
+    device.append(cells)
+
+    for translate_x, translate_y in unit_cell_translations(lattice_vecs, 
+            num_UC_x, num_UC_y):
+        cells.append(Object("UnitCell", 
+                [Transform("translate", [translate_x, translate_y, 0])]))
+
+    #### ---- COATING AND SUBSTRATE ---- ####
+
+    slab_vecs, coating_dims = coating_slab_dims(lattice_vecs, num_UC_x, 
+            num_UC_y)
+    substrate_dims = [coating_dims[0], coating_dims[1], device_dims[2]]
+
+    # Add coatings on top of device
+    for j in range(len(coating_layers)):
+        coating, coating_dims = build_coating(slab_vecs, coating_layers[j], 
+                coating_dims, coating_color_dict, finish_dict)
+        cells.append(coating)
+
+    # Substrate
+    substrate, thickness_sub = build_substrate(device_dict, slab_vecs, 
+            substrate_dims, finish_dict)
+    device.append(substrate)
+
+    device_dims = update_device_dims(device_dims, 0, 0, thickness_sub)
+
+    # Cap how far out the camera will go when replicating unit cell
+    device_dims = update_device_dims(device_dims, 
+            (min(5, num_UC_x) * device_dims[0]), 
+            (min(5, num_UC_y) * device_dims[1]), 
+            device_dims[2])
+
+    return device, device_dims, coating_dims
+
+
+def iter_device(device_dict, 
+    feature_color_finish,
+    num_UC_x=2,
+    num_UC_y=2,
+    coating_layers=[], 
+    coating_color_dict={"translucent":[1, 0, 0, 0, 0]}, 
+    coating_ior_dict={"translucent":1.0}, 
+    custom_finish="", 
+    add_lines=False,
+    line_color=[0, 0, 0],
+    line_thickness=0.0020):
+    """Generate the device string in pieces.
+
+    Streaming version of ``create_device``, see there for the 
+    arguments; the pieces join to the same string. Every feature, 
+    unit cell copy, coating and the substrate is built just before it
+    is yielded, so the pieces can be written to a file (e.g. with 
+    ``write_device`` or ``write_pov_file``) while the rest of the
+    device is still being built, and the full device string never has
+    to exist in memory.
+
+    The device and coating dimensions are only known once the last 
+    piece has been generated. The generator returns them, so use it as
+    ``device_dims, coating_dims = yield from iter_device(...)``, or 
+    use ``write_device``. Since ``write_header_and_camera`` needs them
+    to guess the camera, the header can only be written ahead of the 
+    device when the camera and light locations are given.
+
+    Returns:
+      iterator: Pieces of the device string, the generator returns the
+      updated device dimensions and updated coating dimensions
+
+    """
+    from util import deep_access
+    from povray_scene import Object, Transform
+
+    # Combine accent line color and thickness into a single variable
+    # to simplify variable passing
+    line_settings=[line_color, line_thickness]
+
+    finish_dict = create_finish_dict(custom_finish=custom_finish, 
+                       coating_ior_dict=coating_ior_dict)
+
+    number_of_layers = deep_access(device_dict, ['statepoint', 'num_layers'])
+
+    # Counter for incrementing through colors
+    c = 0
+
+    # Track dimensions of the unit cell
+    device_dims = [0, 0, 0] 
+
+    lattice_vecs = lattice_vectors(device_dict)
+
+    #### ---- DEVICE UNIT CELL ---- ####
+
+    yield "#declare UnitCell = "
+    yield f"merge\n\t{{\n\t"
+
+    for i in range(number_of_layers):
+
+        shape_type = deep_access(device_dict, 
+                ['statepoint', 'dev_layers', str(i)]).get('shapes')
+        if shape_type is not None:
+            shapes = deep_access(device_dict, 
+                    ['statepoint', 'dev_layers', str(i), 'shapes'])
+            background = deep_access(device_dict, 
+                    ['statepoint', 'dev_layers', str(i), 'background'])
+            thickness = deep_access(device_dict, 
+                    ['statepoint', 'dev_layers', str(i), 'thickness'])
+            # end = [top, bottom]
+            end = [float(-1.0*device_dims[2]), 
+                    float(-1.0*device_dims[2] - thickness)]
+
+            yield f"union\n\t{{\n\t"
+
+            if background in coating_color_dict:
+                yield from build_layer_background(background, lattice_vecs, 
+                        thickness, device_dims, coating_color_dict, 
+                        finish_dict).iter_pov()
+
+                # Prevent end caps from being overwritten by background layers
+                end[0] -= 0.00010
+                end[1] -= 0.00010
+
+            # Also closes the union
+            c, device_dims = yield from iter_device_layer(shapes, 
+                    device_dims, end, thickness, finish_dict, 
+                    feature_color_finish, c, add_lines, line_settings)
 
     # End unit cell merge
-    device += f"}}\n\n"
+    yield f"}}\n\n"
 
     #### ---- REPLICATE UNIT CELL ---- ####
 
-    # Shift translation so that the original device is roughly in the center
-    device += f"merge\n\t{{ \n\t"
+    yield f"merge\n\t{{ \n\t"
+
+    for translate_x, translate_y in unit_cell_translations(lattice_vecs, 
+            num_UC_x, num_UC_y):
+        yield from Object("UnitCell", 
+                [Transform("translate", [translate_x, translate_y, 0])]
+                ).iter_pov()
+
+    #### ---- COATING AND SUBSTRATE ---- ####
+
+    slab_vecs, coating_dims = coating_slab_dims(lattice_vecs, num_UC_x, 
+            num_UC_y)
+    substrate_dims = [coating_dims[0], coating_dims[1], device_dims[2]]
+
+    for j in range(len(coating_layers)):
+        coating, coating_dims = build_coating(slab_vecs, coating_layers[j], 
+                coating_dims, coating_color_dict, finish_dict)
+        yield from coating.iter_pov()
+
+    # End device and coating merge
+    yield f"}}\n\n"
+
+    substrate, thickness_sub = build_substrate(device_dict, slab_vecs, 
+            substrate_dims, finish_dict)
+    yield from substrate.iter_pov()
+
+    device_dims = update_device_dims(device_dims, 0, 0, thickness_sub)
+
+    # Cap how far out the camera will go when replicating unit cell
+    device_dims = update_device_dims(device_dims, 
+            (min(5, num_UC_x) * device_dims[0]), 
+            (min(5, num_UC_y) * device_dims[1]), 
+            device_dims[2])
+
+    return device_dims, coating_dims
+
+
+def write_device(output, device_dict, 
+    feature_color_finish,
+    num_UC_x=2,
+    num_UC_y=2,
+    coating_layers=[], 
+    coating_color_dict={"translucent":[1, 0, 0, 0, 0]}, 
+    coating_ior_dict={"translucent":1.0}, 
+    custom_finish="", 
+    add_lines=False,
+    line_color=[0, 0, 0],
+    line_thickness=0.0020):
+    """Write the device to an open file while it is being built.
+
+    Writes the pieces from ``iter_device`` as they are generated, see
+    ``create_device`` for the other arguments.
+
+    Args:
+      output (file): Open file (or any object with a write method)
+
+    Returns:
+      tuple: updated device dimensions and updated coating dimensions
+
+    """
+    chunks = iter_device(device_dict, feature_color_finish, 
+            num_UC_x=num_UC_x, num_UC_y=num_UC_y, 
+            coating_layers=coating_layers, 
+            coating_color_dict=coating_color_dict, 
+            coating_ior_dict=coating_ior_dict, custom_finish=custom_finish, 
+            add_lines=add_lines, line_color=line_color, 
+            line_thickness=line_thickness)
+
+    while True:
+        try:
+            output.write(next(chunks))
+        except StopIteration as stop:
+            device_dims, coating_dims = stop.value
+            return device_dims, coating_dims
+
+
+def lattice_vectors(device_dict):
+    """Read the lattice vectors of a device.
+
+    Args:
+      device_dict (dict): Dictionary entry from a json file
+
+    Returns:
+      list: The lattice vectors as [[a_x, a_y], [b_x, b_y]]
+
+    """
+    from util import deep_access
+
+    lattice_dict = deep_access(device_dict, ['statepoint', 'lattice_vecs'])
+    lattice_vecs = list()
+    for v in ['a', 'b']:
+        tmp_vec = list()
+        for i in ['x', 'y']:
+            tmp_vec.append(deep_access(lattice_dict, [v, i]))
+        lattice_vecs.append(tmp_vec)
+
+    return lattice_vecs
+
+
+def build_layer_background(background, lattice_vecs, thickness, 
+        device_dims, coating_color_dict, finish_dict):
+    """Build the background material of a device layer.
+
+    The background uses the color and finish of the coating with the 
+    same name.
+
+    Args:
+      background (str): Background material, a key of 
+          ``coating_color_dict``
+      lattice_vecs (list): Lattice vectors of the unit cell
+      thickness (float): Thickness of the layer
+      device_dims (list): Dimensions of the unit cell so far
+      coating_color_dict (dict): Dictionary containing color 
+          definitions as RGBFT for each coating material
+      finish_dict (dict): Dictionary containing all relevant finishes
+
+    Returns:
+      Group: The background slab with color and finish
+
+    """
+    from copy import deepcopy
+    from povray_scene import Group, Textured
+
+    # Forcing elimination of internal boundaries
+    # (They appear if you use lattice_vecs 
+    # instead of temp_vecs)
+    temp_vecs = deepcopy(lattice_vecs)
+    for k in range(2):
+        for l in range(2):
+            temp_vecs[k][l] += 0.0002
+
+    bg_slab, halfwidth = build_slab(temp_vecs, thickness, 
+            device_dims, layer_type="background")
+
+    return Group(["// Layer background\n\t", Textured(bg_slab, 
+            build_coating_texture(coating_color_dict[background], 
+                background, finish_dict))])
 
+
+def build_coating_texture(coating_color, coating_finish, finish_dict):
+    """Build the color and finish of a coating or background layer.
+
+    Args:
+      coating_color (list): Coating color, updated in place to rgbft
+      coating_finish (str): Finish name (the coating name)
+      finish_dict (dict): Dictionary containing all relevant finishes
+
+    Returns:
+      Texture: The pigment and finish
+
+    """
+    # Make sure that coating color is rgbft.
+    #
+    # Override filter and transmit values to match the
+    # "translucent" finish settings if they are set to 0.
+    # This way the user can still specify custom filter and
+    # transmit values, but if they truly want an opaque 
+    # coating, they can use something like 0.0000001.
+    while len(coating_color) < 5:
+        coating_color.append(0)
+    if coating_color[3] == 0:
+        coating_color[3] = 0.50
+    if coating_color[4] == 0:
+        coating_color[4] = 0.02
+
+    return build_texture(finish_dict=finish_dict,
+            feature_color_finish=[coating_color, coating_finish])
+
+
+def unit_cell_translations(lattice_vecs, num_UC_x, num_UC_y):
+    """Return where to place every copy of the unit cell.
+
+    The translations are shifted so that the original device is
+    roughly in the center.
+
+    Args:
+      lattice_vecs (list): Lattice vectors of the unit cell
+      num_UC_x (int): Number of unit cells in the x direction
+      num_UC_y (int): Number of unit cells in the y direction
+
+    Returns:
+      list: The x-,y-translations of the unit cells
+
+    """
     adj_x = int(0.5 * (num_UC_x - (1 + (num_UC_x - 1) % 2)))
     adj_y = int(0.5 * (num_UC_y - (1 + (num_UC_y - 1) % 2)))
     # Explanation: 
@@ -1372,16 +1993,35 @@ def create_device(device_dict,
     # Uses modulo to subtract again if odd number
     # Sends half of the remaining rows backward
 
+    translations = []
     for i in range(num_UC_x):
         for j in range(num_UC_y):
             translate_x = ((i-adj_x)*lattice_vecs[0][0]
                            - (j-adj_y)*lattice_vecs[1][0])
             translate_y = ((j-adj_y)*lattice_vecs[1][1]
                            - (i-adj_x)*lattice_vecs[0][1]) 
-            device += (f"object {{ UnitCell translate "
-                    + f"<{translate_x}, {translate_y}, 0> }}\n\t")
+            translations.append([translate_x, translate_y])
+
+    return translations
 
-    #### ---- COATING AND SUBSTRATE ---- ####
+
+def coating_slab_dims(lattice_vecs, num_UC_x, num_UC_y):
+    """Return the size and offset of the coatings and substrate.
+
+    Args:
+      lattice_vecs (list): Lattice vectors of the unit cell
+      num_UC_x (int): Number of unit cells in the x direction
+      num_UC_y (int): Number of unit cells in the y direction
+
+    Returns:
+      tuple: lattice vectors spanning all unit cells, and the initial 
+      coating dimensions
+
+    """
+    from copy import deepcopy
+
+    # Track coating layer thickness
+    coating_dims = [0, 0, 0]
 
     # NOTE: substrate and coatings use prism instead of box because
     # lattice isn't necessarily rectangular
@@ -1401,68 +2041,70 @@ def create_device(device_dict,
         coating_dims[1] += 0.5 * lattice_vecs[1][1]
         coating_dims[1] -= 0.5 * lattice_vecs[0][1]
 
-    substrate_dims = [coating_dims[0], coating_dims[1], device_dims[2]]
     coating_dims = update_device_dims(coating_dims, 
             coating_dims[0], coating_dims[1], 0)
 
-    # Add coatings on top of device
-    if coating_layers != []:
-        for j in range(len(coating_layers)):
-            device += "// Coating layer {j+1}\n\t"
-            coating, halfwidth = add_slab(temp_vecs, coating_layers[j][1], 
-                    coating_dims, layer_type="coating")
-
-            # Make sure that coating color is rgbft.
-            #
-            # Override filter and transmit values to match the
-            # "translucent" finish settings if they are set to 0.
-            # This way the user can still specify custom filter and
-            # transmit values, but if they truly want an opaque 
-            # coating, they can use something like 0.0000001.
-            coating_color = coating_color_dict[coating_layers[j][0]]
-            while len(coating_color) < 5:
-                coating_color.append(0)
-            if coating_color[3] == 0:
-                coating_color[3] = 0.50
-            if coating_color[4] == 0:
-                coating_color[4] = 0.02
-
-            coating_finish = coating_layers[j][0]
-
-            coating = set_color_and_finish(coating, finish_dict=finish_dict,
-                        feature_color_finish=[coating_color, coating_finish])
-            device += coating
-
-            coating_dims = update_device_dims(
-                    coating_dims, 0, 0, coating_layers[j][1])
+    return temp_vecs, coating_dims
 
-    # End device and coating merge
-    device += f"}}\n\n"
 
-    # Substrate
-    device += "// Substrate\n\t"
-    thickness_sub = max(1, deep_access(
-        device_dict, ['statepoint', 'sub_layer', 'thickness']))
+def build_coating(slab_vecs, coating_layer, coating_dims, 
+        coating_color_dict, finish_dict):
+    """Build a single coating layer on top of the device.
 
-    substrate, halfwidth = add_slab(
-            temp_vecs, thickness_sub, substrate_dims, layer_type="substrate")
-    device += substrate
+    Args:
+      slab_vecs (list): Lattice vectors spanning all unit cells
+      coating_layer (list): Material and thickness of the coating
+      coating_dims (list): Coating dimensions so far
+      coating_color_dict (dict): Dictionary containing color 
+          definitions as RGBFT for each coating material
+      finish_dict (dict): Dictionary containing all relevant finishes
 
-    device = set_color_and_finish(device, finish_dict=finish_dict,
-            feature_color_finish=[[0.15, 0.15, 0.15, 0, 0], "dull"])
+    Returns:
+      tuple: the coating (Group) and updated coating dimensions
 
-    halfwidth = [(0.5 * (lattice_vecs[0][0] + lattice_vecs[1][0])), 
-            (0.5 * (lattice_vecs[0][1] + lattice_vecs[1][1]))]
+    """
+    from povray_scene import Group, Textured
 
-    device_dims = update_device_dims(device_dims, 0, 0, thickness_sub)
+    coating, halfwidth = build_slab(slab_vecs, coating_layer[1], 
+            coating_dims, layer_type="coating")
+    coating = Group(["// Coating layer {j+1}\n\t", Textured(coating, 
+            build_coating_texture(coating_color_dict[coating_layer[0]], 
+                coating_layer[0], finish_dict))])
 
-    # Cap how far out the camera will go when replicating unit cell
-    device_dims = update_device_dims(device_dims, 
-            (min(5, num_UC_x) * device_dims[0]), 
-            (min(5, num_UC_y) * device_dims[1]), 
-            device_dims[2])
+    coating_dims = update_device_dims(coating_dims, 0, 0, coating_layer[1])
 
-    return device, device_dims, coating_dims
+    return coating, coating_dims
+
+
+def build_substrate(device_dict, slab_vecs, substrate_dims, finish_dict):
+    """Build the substrate below the device.
+
+    The substrate will always be a dull, dark grey.
+
+    Args:
+      device_dict (dict): Dictionary entry from a json file
+      slab_vecs (list): Lattice vectors spanning all unit cells
+      substrate_dims (list): Position of the substrate
+      finish_dict (dict): Dictionary containing all relevant finishes
+
+    Returns:
+      tuple: the substrate (Group) and its thickness
+
+    """
+    from util import deep_access
+    from povray_scene import Group, Textured
+
+    thickness_sub = max(1, deep_access(
+        device_dict, ['statepoint', 'sub_layer', 'thickness']))
+
+    substrate, halfwidth = build_slab(
+            slab_vecs, thickness_sub, substrate_dims, layer_type="substrate")
+
+    substrate = Group(["// Substrate\n\t", Textured(substrate, 
+            build_texture(finish_dict=finish_dict,
+                feature_color_finish=[[0.15, 0.15, 0.15, 0, 0], "dull"]))])
+
+    return substrate, thickness_sub
 
 
 def isosurface_unit_cell(mesh, 
@@ -1509,10 +2151,31 @@ def isosurface_unit_cell(mesh,
     Returns:
       str: Unit cell string specifically for use with isosurfaces
 
+    """
+    return str(build_isosurface_unit_cell(mesh, device_dict, n, 
+            cut_at=cut_at, use_slice_UC=use_slice_UC, 
+            subtract_box=subtract_box))
+
+
+def build_isosurface_unit_cell(mesh, 
+        device_dict, 
+        n, 
+        cut_at=[[0.5, 1], [0.5, 1], [0, 1]],
+        use_slice_UC=True, 
+        subtract_box=True):
+    """Build the unit cell for use with isosurfaces as a scene graph.
+
+    Scene node version of ``isosurface_unit_cell``, see there for the
+    arguments. The mesh may be a string or a scene node.
+
+    Returns:
+      Group: The mesh followed by the unit cell and substrate
+
     """
     from util import deep_access
-    from povray_iso import slice_isosurface
-    from povray_shapes import create_device_layer
+    from povray_iso import create_slice_prism
+    from povray_scene import Group, CSG, Declare, Object, Transform
+    from povray_scene import Textured
 
     # Create the finish dictionary only using "dull"
     finish_dict = {'dull': ''}
@@ -1525,9 +2188,6 @@ def isosurface_unit_cell(mesh,
     device_dims = [0, 0, 0]
     # Track coating layer thickness
     coating_dims = [0, 0, 0]
-    # Store device
-    device = "// Unit cell"
-
     # Lattice vectors
     lattice_dict = deep_access(device_dict, ['statepoint', 'lattice_vecs'])
     lattice_vecs = list()
@@ -1539,8 +2199,8 @@ def isosurface_unit_cell(mesh,
 
     # Begin unit cell merge
     # Necessary if multiple layers or multiple features per layer
-    device = "\n\n#declare UnitCell = "
-    device += f"merge {{\n\t"
+    unit_cell = CSG("merge", opening=f" {{\n\t", closing=f"}}\n\n")
+    device = Group(["\n\n", Declare("UnitCell", unit_cell)])
 
     # Create all layers
     feature_color_finish=[[[0.25, 0.25, 0.25, 0, 0], "dull"]]
@@ -1559,16 +2219,11 @@ def isosurface_unit_cell(mesh,
             end = [float(-1.0 * device_dims[2]), 
                     float(-1.0 * device_dims[2] - thickness)]
 
-            device += f"union\n\t{{\n\t"
-
             # Create all features within a layer
-            layer, c, device_dims = create_device_layer(shapes, device_dims, 
+            layer, c, device_dims = build_device_layer(shapes, device_dims, 
                     end, thickness, finish_dict, feature_color_finish, c, 
                     add_lines=False)
-            device += layer
-
-    # End unit cell merge
-    device += f"}}\n\n"
+            unit_cell.append(CSG("union", [layer]))
 
     # Scale unit cell up to match field dimensions
     scaling_factor = n[0] / lattice_vecs[0][0]
@@ -1577,15 +2232,18 @@ def isosurface_unit_cell(mesh,
     translate_y = 0.5 * (device_dims[1] + n[1])
     translate_z = n[2] - device_dims[2]
 
-    device += f"object {{ UnitCell "
-    device += "\n\tscale <{0}, {0}, {0}> ".format(scaling_factor)
-    device += f"\n\ttranslate <{translate_x}, {translate_y}, {translate_z}> "
-    device += f"\n\t}}\n\n"
+    device.append(Object("UnitCell", 
+            [Transform("scale", 3*[scaling_factor]), 
+            Transform("translate", [translate_x, translate_y, translate_z])],
+            inline=False))
 
     # Can also subtract out pieces of the unit cell, 
+    # (same intersection as slice_isosurface)
     if use_slice_UC == True:
-        device = slice_isosurface(device, n, cut_at=cut_at, 
-                                  subtract_box = subtract_box)
+        slice_string = create_slice_prism(n, cut_at=cut_at, 
+                subtract_box=subtract_box)
+        device = CSG("intersection", [device, slice_string], 
+                opening=f" {{", closing=f"\n}}\n\n\t")
 
     # Add substrate
     feature_color_finish=[[[0.025, 0.025, 0.025, 0, 0], "dull"]]
@@ -1598,17 +2256,14 @@ def isosurface_unit_cell(mesh,
         if lattice_vecs[i][1] != 0:
             lattice_vecs[i][1] = n[1] * lattice_y / lattice_vecs[i][1]
 
-    (substrate, garbage) = add_slab(lattice_vecs, thickness=n[2]/3.5,
+    (substrate, garbage) = build_slab(lattice_vecs, thickness=n[2]/3.5,
             device_dims=n, layer_type="isosurface")
 
-    substrate = set_color_and_finish(substrate, finish_dict=finish_dict,
-            feature_color_finish=[[0.025, 0.025, 0.025, 0, 0], "dull"])
+    substrate = Textured(substrate, build_texture(finish_dict=finish_dict,
+            feature_color_finish=[[0.025, 0.025, 0.025, 0, 0], "dull"]))
 
     # Append unit cell to mesh object
-    mesh += device
-    mesh += substrate 
-
-    return mesh
+    return Group([mesh, device, substrate])
 
 
 def create_finish_dict(custom_finish=[], coating_ior_dict=None):
@@ -1809,7 +2464,27 @@ def set_color_and_finish(dev_string, finish_dict = None,
       string: Updated device string containing color and finish settings
 
     """
-    import os
+    from povray_scene import Raw, Textured
+
+    return str(Textured(Raw(dev_string), build_texture(
+            finish_dict=finish_dict, 
+            feature_color_finish=feature_color_finish)))
+
+
+def build_texture(finish_dict = None,
+        feature_color_finish=[[0, 0.6667, 0.667, 0, 0], "dull"]):
+    """Build the color and finish of an object.
+
+    Scene node version of ``set_color_and_finish``, see there for the
+    arguments and for how the color and finish are chosen. The color
+    list is updated in place exactly as in ``set_color_and_finish``; 
+    the texture keeps a copy of it.
+
+    Returns:
+      Texture: The pigment and finish
+
+    """
+    from povray_scene import Texture
 
     # Extract color
     color = feature_color_finish[0]
@@ -1844,11 +2519,8 @@ def set_color_and_finish(dev_string, finish_dict = None,
         print("         Changing finish key to 'dull' and proceeding!")
         use_finish = "dull"
 
-    # Use a color from the include files
-    if use_colors_inc:
-        dev_string += (f"pigment {{ {color} }}\n\t\t")
     # Use a color NOT from the include files
-    else:
+    if not use_colors_inc:
         # Make sure that color is in rgbft format (5 entries). Lists
         # that are too short (<3) or too long (>5) should have been
         # caught by the exception above.
@@ -1878,19 +2550,12 @@ def set_color_and_finish(dev_string, finish_dict = None,
             elif use_finish == "irid":
                 color[3] = 0.7
 
-        dev_string += (f"pigment {{ color rgbft "
-                + f"<{color[0]}, {color[1]}, {color[2]}, {color[3]}, {color[4]}>"
-                + f" }}\n\t\t")
+        color = tuple(color)
 
     # Add finish from include files
     if use_finish_inc:
-        dev_string += (f"finish {{ {use_finish} }}\n\t\t")
+        return Texture(color, use_finish)
     # Add finish NOT from include
     else:
-        dev_string += finish_dict[use_finish]
-
-    # Close object
-    dev_string += f"}}\n\n\t"
-
-    return dev_string
+        return Texture(color, use_finish, finish_dict[use_finish])
 